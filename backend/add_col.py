@@ -3,16 +3,12 @@ from pathlib import Path
 env_path = Path(__file__).parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from app.db.database import engine
-from sqlalchemy import text
+from app.db.init_db import ADDED_COLUMNS, ADDED_INDEXES, migrate_columns, migrate_indexes
 
+# Same migration init_database() runs on startup; handy against a live database.
 try:
-    with engine.connect() as conn:
-        conn.execute(text("ALTER TABLE group_members ADD COLUMN last_read_at TIMESTAMP"))
-        conn.commit()
-        print("Successfully added last_read_at to group_members")
+    migrate_columns()
+    migrate_indexes()
+    print(f"Schema up to date ({len(ADDED_COLUMNS)} added columns, {len(ADDED_INDEXES)} added indexes checked)")
 except Exception as e:
-    if 'already exists' in str(e).lower() or 'duplicate column name' in str(e).lower():
-        print("Column already exists, ignoring.")
-    else:
-        print("Error:", e)
+    print("Error:", e)
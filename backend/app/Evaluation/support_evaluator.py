@@ -2,13 +2,15 @@
 import json
 import os
 
+from app.utils.completion_cache import cache_lookup, cache_store
+from app.utils.key_pool import get_key_pool
+from app.utils.LLM_agent_client import get_groq_client
+
 def evaluate_support(user_query: str, agent_responses: list, final_answer: str, generic_metrics: dict) -> dict:
     """
     Support Mode — Primary Strength: Depth and Sequential Enrichment
     Calculates: Support Score = 0.40×ICS + 0.35×ExplanationCompleteness + 0.25×Coherence − RedundancyPenalty
     """
-    import groq
-    client = groq.Groq(api_key=os.getenv("consensus_test_1"))
     agents_text = "\n\n".join(f"[{r.get('agent_name', 'Agent')}]: {r.get('content', '')}" for r in agent_responses)
 
     prompt = f"""You are a strict AI evaluation judge scoring a Support/Tutorial Mode synthesis.
@@ -33,47 +35,27 @@ Respond exactly with a valid JSON object matching this schema (replace the examp
   "RedundancyPenalty": <Float between 0.0 and 2.0>
 }}
 """
-    try:
-        resp = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "system", "content": "You are a stringent JSON-only judge."}, {"role": "user", "content": prompt}],
-            temperature=0.0
-        )
-    except groq.APIStatusError as e:
-        if e.status_code == 429:
-            print("  [>] Rate Limit on consensus_test_1. Falling back to consensus_test_2...")
-            client = groq.Groq(api_key=os.getenv("consensus_test_2"))
-            try:
-                resp = client.chat.completions.create(
+    messages = [{"role": "system", "content": "You are a stringent JSON-only judge."}, {"role": "user", "content": prompt}]
+
+    # Temperature-0 judge calls are served from the completion cache on reruns
+    raw, cache_key = cache_lookup("evaluator", "llama-3.3-70b-versatile", messages, 0.0, None)
+    if raw is None:
+        # consensus_test_1, _2, _3 ... — a 429 fails over to the next key automatically
+        try:
+            resp = get_key_pool("evaluation").call(
+                lambda key: get_groq_client(key.api_key).chat.completions.create(
                     model="llama-3.3-70b-versatile",
-                    messages=[{"role": "system", "content": "You are a stringent JSON-only judge."}, {"role": "user", "content": prompt}],
+                    messages=messages,
                     temperature=0.0
                 )
-            except groq.APIStatusError as e2:
-                if e2.status_code == 429:
-                    print("  [>] Rate Limit on consensus_test_2. Falling back to consensus_test_3...")
-                    client = groq.Groq(api_key=os.getenv("consensus_test_3"))
-                    try:
-                        resp = client.chat.completions.create(
-                            model="llama-3.3-70b-versatile",
-                            messages=[{"role": "system", "content": "You are a stringent JSON-only judge."}, {"role": "user", "content": prompt}],
-                            temperature=0.0
-                        )
-                    except Exception as e3:
-                        print(f"Support Evaluator failed on 3rd fallback key: {e3}")
-                        return {}
-                else:
-                    return {}
-            except Exception as e2:
-                print(f"Support Evaluator failed on 2nd fallback key: {e2}")
-                return {}
-        else:
+            )
+        except Exception as e:
+            print(f"Support Evaluator failed on every evaluation key: {e}")
             return {}
-    except Exception as e:
-        return {}
+        raw = resp.choices[0].message.content.strip()
+        cache_store(cache_key, "llama-3.3-70b-versatile", raw)
         
     try:
-        raw = resp.choices[0].message.content.strip()
         if raw.startswith("```"): raw = raw.split("```")[1]
         if raw.startswith("json"): raw = raw[4:]
         data = json.loads(raw.strip())
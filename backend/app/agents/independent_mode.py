@@ -1,6 +1,9 @@
 # backend/app/agents/independent_mode.py
 
-from app.utils.LLM_agent_client import LLMAgentClient
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.utils.LLM_agent_client import LLMAgentClient, bind_agent_stream
+from app.agents.prompts import build_messages
 
 
 CHAT_RULES = """
@@ -21,51 +24,73 @@ class IndependentMode:
     def __init__(self):
         self.client = LLMAgentClient()
 
-    def _build_messages(self, system_suffix: str, user_query: str, context: str = ""):
-        context_block = ""
-        if context:
-            context_block = f"\n\nPrevious conversation context:\n{context}\n\nNow answer this new query:"
-        
-        return [
-            {"role": "system", "content": CHAT_RULES + system_suffix},
-            {"role": "user", "content": f"{context_block}\n{user_query}"},
-        ]
+    def _build_messages(self, label: str, role: str, user_query: str, context: str = ""):
+        body = f"Now answer this new query:\n{user_query}" if context else user_query
+        return build_messages(CHAT_RULES, context, label, role, body)
 
-    def agent_1(self, user_query: str, context: str = "") -> dict:
+    def agent_1(self, user_query: str, context: str = "", stream_callback=None, cancel_token=None) -> dict:
         messages = self._build_messages(
-            "\nRole: Agent 1. Give the first helpful answer.",
+            "independent/agent1", "Role: Agent 1. Give the first helpful answer.",
             user_query, context
         )
-        content = self.client.get_completion("agent1", messages, temperature=0.6, max_tokens=1024)
+        content = self.client.get_completion(
+            "agent1", messages, temperature=0.6, max_tokens=1024, stream_callback=stream_callback,
+            cancel_token=cancel_token,
+        )
         return {"agent_name": "Agent 1", "content": content, "mode": "independent"}
 
-    def agent_2(self, user_query: str, context: str = "") -> dict:
+    def agent_2(self, user_query: str, context: str = "", stream_callback=None, cancel_token=None) -> dict:
         messages = self._build_messages(
-            "\nRole: Agent 2. Give a different angle or nuance.",
+            "independent/agent2", "Role: Agent 2. Give a different angle or nuance.",
             user_query, context
         )
-        content = self.client.get_completion("agent2", messages, temperature=0.7, max_tokens=1500)
+        content = self.client.get_completion(
+            "agent2", messages, temperature=0.7, max_tokens=1500, stream_callback=stream_callback,
+            cancel_token=cancel_token,
+        )
         return {"agent_name": "Agent 2", "content": content, "mode": "independent"}
 
-    def agent_3(self, user_query: str, context: str = "") -> dict:
+    def agent_3(self, user_query: str, context: str = "", stream_callback=None, cancel_token=None) -> dict:
         messages = self._build_messages(
-            "\nRole: Agent 3. Add a perspective others may miss.",
+            "independent/agent3", "Role: Agent 3. Add a perspective others may miss.",
             user_query, context
         )
-        content = self.client.get_completion("agent3", messages, temperature=0.7, max_tokens=1024)
+        content = self.client.get_completion(
+            "agent3", messages, temperature=0.7, max_tokens=1024, stream_callback=stream_callback,
+            cancel_token=cancel_token,
+        )
         return {"agent_name": "Agent 3", "content": content, "mode": "independent"}
     #run
-    def run(self, user_query: str, context: str = "", status_callback=None) -> dict:
+    def run(self, user_query: str, context: str = "", status_callback=None, agent_stream_callback=None, cancel_token=None) -> dict:
+        """
+        None of the three agents reads another's output, so all three requests
+        are sent at once. Latency is roughly that of the slowest agent.
+        `responses` always stays in Agent 1 → 2 → 3 order regardless of which
+        agent finishes first.
+        `agent_stream_callback(agent_name, delta)` receives each agent's tokens
+        as they arrive. A cancelled `cancel_token` aborts all three requests.
+        """
         print("Running Independent Mode...")
-        results = []
-        
-        if status_callback: status_callback("Agent 1 is generating a primary angle...")
-        results.append(self.agent_1(user_query, context))
-        
-        if status_callback: status_callback("Agent 2 is formulating an alternative viewpoint...")
-        results.append(self.agent_2(user_query, context))
-        
-        if status_callback: status_callback("Agent 3 is searching for missed nuances...")
-        results.append(self.agent_3(user_query, context))
-        
+
+        agents = [
+            (self.agent_1, "Agent 1", "Agent 1 has shared a primary angle."),
+            (self.agent_2, "Agent 2", "Agent 2 has shared an alternative viewpoint."),
+            (self.agent_3, "Agent 3", "Agent 3 has added missed nuances."),
+        ]
+
+        if status_callback: status_callback("Agents 1, 2 and 3 are generating perspectives in parallel...")
+
+        results = [None] * len(agents)
+        with ThreadPoolExecutor(max_workers=len(agents), thread_name_prefix="independent-agent") as pool:
+            futures = {
+                pool.submit(
+                    agent_fn, user_query, context, bind_agent_stream(agent_stream_callback, agent_name), cancel_token
+                ): (index, done_msg)
+                for index, (agent_fn, agent_name, done_msg) in enumerate(agents)
+            }
+            for future in as_completed(futures):
+                index, done_msg = futures[future]
+                results[index] = future.result()
+                if status_callback: status_callback(done_msg)
+
         return {"mode": "independent", "responses": results}
@@ -1,6 +1,23 @@
 # backend/app/agents/opposition_mode.py
 
-from app.utils.LLM_agent_client import LLMAgentClient
+import os
+import time
+import difflib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.LLM_agent_client import LLMAgentClient, bind_agent_stream
+from app.utils.rate_limiter import estimate_tokens, estimate_text_tokens
+from app.utils.cancellation import check_cancelled
+from app.agents.prompts import build_messages
+
+# ── Debate engine config ─────────────────────────────────────────────────────────
+MAX_ROUNDS               = 5
+CONVERGENCE_THRESHOLD    = 0.9    # generator answers this similar → debate has converged
+SPECULATIVE_INVESTIGATOR = True   # fact-check the generator while the critic is still writing
+DEBATE_MAX_SECONDS       = float(os.getenv("DEBATE_MAX_SECONDS", "60"))
+DEBATE_MAX_TOKENS        = int(os.getenv("DEBATE_MAX_TOKENS", "12000"))
+# ────────────────────────────────────────────────────────────────────────────────
 
 
 CHAT_RULES = """
@@ -16,111 +33,118 @@ Rules:
 """
 
 
+class DebateBudget:
+    """
+    Wall-clock + token budget for one debate. Shared by every agent call of that run,
+    so it also carries the run's cancel token.
+    """
+
+    def __init__(self, max_seconds: float = DEBATE_MAX_SECONDS, max_tokens: int = DEBATE_MAX_TOKENS, cancel_token=None):
+        self.max_seconds  = max_seconds
+        self.max_tokens   = max_tokens
+        self.cancel_token = cancel_token
+        self.started_at  = time.monotonic()
+        self.tokens_used = 0
+        self._lock       = threading.Lock()
+
+    def charge(self, messages: list, output: str):
+        """
+        Counts the call's new turn and its output only. The system prefix (rules +
+        room context) is identical on every call of the debate, so counting it
+        each time would spend the whole budget on context in round 1.
+        """
+        turn = [m for m in messages if m.get("role") != "system"]
+        with self._lock:
+            self.tokens_used += estimate_tokens(turn) + estimate_text_tokens(output)
+
+    def exhausted(self) -> str:
+        """Returns the reason the budget ran out, or "" while there is budget left."""
+        if time.monotonic() - self.started_at >= self.max_seconds:
+            return f"time budget of {self.max_seconds:.0f}s used"
+        if self.tokens_used >= self.max_tokens:
+            return f"token budget of {self.max_tokens} used"
+        return ""
+
+
+def _similarity(a: str, b: str) -> float:
+    """Word-level similarity of two generator answers (0.0 – 1.0)."""
+    return difflib.SequenceMatcher(None, a.lower().split(), b.lower().split()).ratio()
+
+
 class OppositionMode:
     def __init__(self):
         self.client = LLMAgentClient()
 
-    def generator_agent(self, user_query: str, context: str = "") -> str:
-        context_block = ""
-        if context:
-            context_block = f"\n\nPrevious conversation context:\n{context}\n\nNow answer:"
-        messages = [
-            {
-                "role": "system",
-                "content": CHAT_RULES
-                + "\nRole: Agent 1 (Generator). Give an initial short but valuable answer with most important details."
-            },
-            {"role": "user", "content": f"{context_block}\n{user_query}"},
-        ]
-        return self.client.get_completion("agent1", messages, temperature=0.7, max_tokens=120)
-
-    def critic_agent(self, user_query: str, generator_text: str, context: str = "") -> str:
-        context_block = ""
-        if context:
-            context_block = f"\nPrevious conversation context:\n{context}\n"
-        messages = [
-            {
-                "role": "system",
-                "content": CHAT_RULES
-                + "\nRole: Agent 2 (Critic). Attack the Generator's logic and highlight flaws or omissions in their answer briefly."
-            },
-            {
-                "role": "user",
-                "content": f"""{context_block}
-User Query: {user_query}
+    def _complete(self, budget, model_key: str, messages: list, temperature: float, max_tokens: int, stream_callback=None) -> str:
+        content = self.client.get_completion(
+            model_key, messages, temperature=temperature, max_tokens=max_tokens, stream_callback=stream_callback,
+            cancel_token=budget.cancel_token if budget is not None else None,
+        )
+        if budget is not None:
+            budget.charge(messages, content)
+        return content
+
+    def generator_agent(self, user_query: str, context: str = "", budget: DebateBudget = None, stream_callback=None) -> str:
+        messages = build_messages(
+            CHAT_RULES, context, "opposition/generator",
+            "Role: Agent 1 (Generator). Give an initial short but valuable answer with most important details.",
+            f"Now answer:\n{user_query}" if context else user_query,
+        )
+        return self._complete(budget, "agent1", messages, temperature=0.7, max_tokens=120, stream_callback=stream_callback)
+
+    def critic_agent(self, user_query: str, generator_text: str, context: str = "", budget: DebateBudget = None, stream_callback=None) -> str:
+        messages = build_messages(
+            CHAT_RULES, context, "opposition/critic",
+            "Role: Agent 2 (Critic). Attack the Generator's logic and highlight flaws or omissions in their answer briefly.",
+            f"""User Query: {user_query}
 
 Defendant said:
 {generator_text}
 
-Reply with short attack or disagreement.
-""",
-            },
-        ]
-        return self.client.get_completion("agent2", messages, temperature=0.4, max_tokens=90)
-
-    def investigator_agent(self, user_query: str, gen: str, critic: str, context: str = "") -> str:
-        context_block = ""
-        if context:
-            context_block = f"\nPrevious conversation context:\n{context}\n"
-        messages = [
-            {
-                "role": "system",
-                "content": CHAT_RULES
-                + """
-Role: Agent 3 (Investigator / Fact-Checker).
+Reply with short attack or disagreement.""",
+        )
+        return self._complete(budget, "agent2", messages, temperature=0.4, max_tokens=90, stream_callback=stream_callback)
+
+    def investigator_agent(self, user_query: str, gen: str, critic: str = None, context: str = "", budget: DebateBudget = None, stream_callback=None) -> str:
+        """
+        With `critic=None` the investigator fact-checks the Generator alone, so it
+        can run speculatively at the same time as the Critic.
+        """
+        critic_block = f"\nCritic:\n{critic}\n" if critic is not None else ""
+        messages = build_messages(
+            CHAT_RULES, context, "opposition/investigator",
+            f"""Role: Agent 3 (Investigator / Fact-Checker).
 Your job:
 - Strict fact-checking of dates, names, logic, and claims.
-- Read Generator and Critic.
+- Read {"Generator and Critic" if critic is not None else "the Generator's answer"}.
 - Output a concrete Fact-Check Report.
-- Do NOT issue a final verdict.
-"""
-            },
-            {
-                "role": "user",
-                "content": f"""{context_block}
-User Query: {user_query}
+- Do NOT issue a final verdict.""",
+            f"""User Query: {user_query}
 
 Generator:
 {gen}
+{critic_block}
+Give a strictly factual investigation report.""",
+        )
+        return self._complete(budget, "agent3", messages, temperature=0.3, max_tokens=110, stream_callback=stream_callback)
 
-Critic:
-{critic}
-
-Give a strictly factual investigation report.
-""",
-            },
-        ]
-        return self.client.get_completion("agent3", messages, temperature=0.3, max_tokens=110)
-
-    def judge_agent(self, user_query: str, gen: str, critic: str, investigation: str, round_no: int, context: str = "") -> str:
-        context_block = ""
-        if context:
-            context_block = f"\nPrevious conversation context:\n{context}\n"
-            
+    def judge_agent(self, user_query: str, gen: str, critic: str, investigation: str, round_no: int, context: str = "", budget: DebateBudget = None, stream_callback=None) -> str:
         if round_no == 1:
             round_instruction = f"This is Round 1. If the user query is extremely simple or easily verifiable, you may declare 'VERDICT REACHED' immediately. However, if the query is EVEN SLIGHTLY complex, nuanced, or requires strategic trade-offs, you MUST NOT reach a verdict yet. You MUST explicitly state 'CONTINUE DEBATE', issue an interim judgment on the current arguments, and demand that the Critic/Generator dive deeper."
-        elif round_no < 5:
+        elif round_no < MAX_ROUNDS:
             round_instruction = f"This is Round {round_no}. If the underlying truth is clear, you MUST declare 'VERDICT REACHED' immediately. Do NOT artificially prolong the debate. Only if it is highly complex should you instruct further debate."
         else:
-            round_instruction = f"This is Round {round_no} (max 5). You MUST say: VERDICT REACHED."
+            round_instruction = f"This is Round {round_no} (max {MAX_ROUNDS}). You MUST say: VERDICT REACHED."
             
-        messages = [
-            {
-                "role": "system",
-                "content": CHAT_RULES
-                + f"""
-Role: Agent 4 (Chief Judge).
+        messages = build_messages(
+            CHAT_RULES, context, "opposition/judge",
+            f"""Role: Agent 4 (Chief Judge).
 Your job:
 - Read Generator, Critic, and Investigator.
 - Decide who is accurate.
 - Issue a binding VERDICT for the Generator to follow.
-{round_instruction}
-"""
-            },
-            {
-                "role": "user",
-                "content": f"""{context_block}
-User Query: {user_query}
+{round_instruction}""",
+            f"""User Query: {user_query}
 
 Generator:
 {gen}
@@ -131,84 +155,131 @@ Critic:
 Investigator Fact-Check:
 {investigation}
 
-Give your judge verdict for this round.
-""",
-            },
-        ]
-        return self.client.get_completion("agent4", messages, temperature=0.3, max_tokens=120)
-
-    def generator_update(self, user_query: str, judge_verdict: str, context: str = "") -> str:
-        context_block = ""
-        if context:
-            context_block = f"\nPrevious conversation context:\n{context}\n"
-        messages = [
-            {
-                "role": "system",
-                "content": CHAT_RULES
-                + "\nRole: Agent 1 (Generator). Update your answer strictly based on the Chief Judge's verdict."
-            },
-            {
-                "role": "user",
-                "content": f"""{context_block}
-User Query: {user_query}
+Give your judge verdict for this round.""",
+        )
+        return self._complete(budget, "agent4", messages, temperature=0.3, max_tokens=120, stream_callback=stream_callback)
+
+    def generator_update(self, user_query: str, judge_verdict: str, context: str = "", budget: DebateBudget = None, stream_callback=None) -> str:
+        messages = build_messages(
+            CHAT_RULES, context, "opposition/generator_update",
+            "Role: Agent 1 (Generator). Update your answer strictly based on the Chief Judge's verdict.",
+            f"""User Query: {user_query}
 
 Chief Judge Verdict:
 {judge_verdict}
 
-Now rewrite your answer.
-""",
-            },
-        ]
-        return self.client.get_completion("agent1", messages, temperature=0.6, max_tokens=100)
+Now rewrite your answer.""",
+        )
+        return self._complete(budget, "agent1", messages, temperature=0.6, max_tokens=100, stream_callback=stream_callback)
 
-    def run(self, user_query: str, context: str = "", status_callback=None) -> dict:
+    def run(self, user_query: str, context: str = "", status_callback=None, budget: DebateBudget = None, agent_stream_callback=None, cancel_token=None) -> dict:
+        """
+        Courtroom debate with three latency cuts over the plain round loop:
+        - the Investigator fact-checks the Generator in parallel with the Critic
+        - the debate ends early once successive Generator answers converge
+        - the whole debate stops when its wall-clock / token budget is spent
+        Every agent turn is streamed to `agent_stream_callback(agent_name, delta)`
+        under the same name it gets in `responses`.
+        A cancelled `cancel_token` stops the debate mid-turn or between rounds.
+        """
         print("Running Opposition Mode Debate (Courtroom Model)...")
+        budget = budget or DebateBudget(cancel_token=cancel_token)
+        if budget.cancel_token is None:
+            budget.cancel_token = cancel_token
         responses = []
 
         if status_callback: status_callback("Generator is formulating an initial response...")
-        generator_text = self.generator_agent(user_query, context)
+        generator_text = self.generator_agent(
+            user_query, context, budget, bind_agent_stream(agent_stream_callback, "Generator (Agent 1)")
+        )
         responses.append({
             "agent_name": "Generator (Agent 1)",
             "content": generator_text,
             "mode": "opposition"
         })
 
-        for round_no in range(1, 6):
-            if status_callback: status_callback(f"Round {round_no}: Critic is evaluating logic...")
-            critic_text = self.critic_agent(user_query, generator_text, context)
-            responses.append({
-                "agent_name": f"Critic (Agent 2) Round {round_no}",
-                "content": critic_text,
-                "mode": "opposition"
-            })
-
-            if status_callback: status_callback(f"Round {round_no}: Investigator is fact-checking...")
-            investigation_text = self.investigator_agent(user_query, generator_text, critic_text, context)
-            responses.append({
-                "agent_name": f"Investigator (Agent 3) Round {round_no}",
-                "content": investigation_text,
-                "mode": "opposition"
-            })
-
-            if status_callback: status_callback(f"Round {round_no}: Chief Judge is rendering judgment...")
-            judge_text = self.judge_agent(user_query, generator_text, critic_text, investigation_text, round_no, context)
-            responses.append({
-                "agent_name": f"Chief Judge (Agent 4) Round {round_no}",
-                "content": judge_text,
-                "mode": "opposition"
-            })
-
-            if "verdict reached" in judge_text.lower():
-                break
-
-            if status_callback: status_callback(f"Round {round_no}: Generator is revising response...")
-            generator_text = self.generator_update(user_query, judge_text, context)
-            responses.append({
-                "agent_name": f"Generator Update Round {round_no}",
-                "content": generator_text,
-                "mode": "opposition"
-            })
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="debate-speculative") as pool:
+            for round_no in range(1, MAX_ROUNDS + 1):
+                check_cancelled(budget.cancel_token)
+                reason = budget.exhausted()
+                if reason:
+                    print(f"⏱️ Debate stopped before round {round_no}: {reason}.")
+                    break
+
+                if SPECULATIVE_INVESTIGATOR:
+                    if status_callback: status_callback(f"Round {round_no}: Critic and Investigator are examining the answer...")
+                    investigation_future = pool.submit(
+                        self.investigator_agent, user_query, generator_text, None, context, budget,
+                        bind_agent_stream(agent_stream_callback, f"Investigator (Agent 3) Round {round_no}"),
+                    )
+                    critic_text = self.critic_agent(
+                        user_query, generator_text, context, budget,
+                        bind_agent_stream(agent_stream_callback, f"Critic (Agent 2) Round {round_no}"),
+                    )
+                    investigation_text = investigation_future.result()
+                else:
+                    if status_callback: status_callback(f"Round {round_no}: Critic is evaluating logic...")
+                    critic_text = self.critic_agent(
+                        user_query, generator_text, context, budget,
+                        bind_agent_stream(agent_stream_callback, f"Critic (Agent 2) Round {round_no}"),
+                    )
+                    if status_callback: status_callback(f"Round {round_no}: Investigator is fact-checking...")
+                    investigation_text = self.investigator_agent(
+                        user_query, generator_text, critic_text, context, budget,
+                        bind_agent_stream(agent_stream_callback, f"Investigator (Agent 3) Round {round_no}"),
+                    )
+
+                responses.append({
+                    "agent_name": f"Critic (Agent 2) Round {round_no}",
+                    "content": critic_text,
+                    "mode": "opposition"
+                })
+                responses.append({
+                    "agent_name": f"Investigator (Agent 3) Round {round_no}",
+                    "content": investigation_text,
+                    "mode": "opposition"
+                })
+
+                if status_callback: status_callback(f"Round {round_no}: Chief Judge is rendering judgment...")
+                judge_text = self.judge_agent(
+                    user_query, generator_text, critic_text, investigation_text, round_no, context, budget,
+                    bind_agent_stream(agent_stream_callback, f"Chief Judge (Agent 4) Round {round_no}"),
+                )
+                responses.append({
+                    "agent_name": f"Chief Judge (Agent 4) Round {round_no}",
+                    "content": judge_text,
+                    "mode": "opposition"
+                })
+
+                if "verdict reached" in judge_text.lower():
+                    break
+                check_cancelled(budget.cancel_token)
+
+                reason = budget.exhausted()
+                if reason:
+                    print(f"⏱️ Debate stopped after round {round_no} judgment: {reason}.")
+                    break
+
+                if status_callback: status_callback(f"Round {round_no}: Generator is revising response...")
+                previous_text  = generator_text
+                generator_text = self.generator_update(
+                    user_query, judge_text, context, budget,
+                    bind_agent_stream(agent_stream_callback, f"Generator Update Round {round_no}"),
+                )
+                responses.append({
+                    "agent_name": f"Generator Update Round {round_no}",
+                    "content": generator_text,
+                    "mode": "opposition"
+                })
+
+                # Convergence: the revision barely changed the answer → another
+                # critic/investigator/judge round would only restate the same verdict
+                similarity = _similarity(previous_text, generator_text)
+                if similarity >= CONVERGENCE_THRESHOLD:
+                    print(f"🤝 Debate converged after round {round_no} (similarity {similarity:.2f}).")
+                    break
 
+        print(f"📊 Debate used ~{budget.tokens_used} tokens in {time.monotonic() - budget.started_at:.1f}s.")
         return {
             "mode": "opposition",
             "responses": responses
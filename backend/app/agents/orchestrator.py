@@ -2,11 +2,79 @@
 from app.agents.opposition_mode import OppositionMode
 from app.agents.support_mode import SupportMode
 from app.agents.independent_mode import IndependentMode
-from app.utils.intent_classifier import IntentClassifier
-from app.utils.LLM_agent_client import LLMAgentClient
+from app.utils.intent_classifier import IntentClassifier, context_fingerprint, normalize_query
+from app.utils.LLM_agent_client import LLMAgentClient, is_failed_completion
 from app.utils.Evaluator import evaluate_synthesis
+from app.agents.prompts import build_messages
+from app.utils.cancellation import OrchestrationCancelled, check_cancelled
 import os
 
+
+# Routing decisions are memoized against the messages just before the query, so a
+# retry or duplicate send (which only appends the same message again) reuses them
+ROUTE_FINGERPRINT_MESSAGES = 6
+
+SYNTHESIS_SYSTEM = "You are the smartest AI in a multi-agent system. You synthesize agent discussions into the single best possible final answer, adapting your length, tone, and format to exactly match what the question needs. You independently verify every fact before including it. You are the final authority on accuracy — not a summarizer of agent opinions."
+
+SYNTHESIS_CONTEXT_HEADER = "[Conversation Context — use ONLY if directly relevant to this specific query]:"
+
+SYNTHESIS_RULES = """━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+You are the FINAL AI in a multi-agent group chat. You are the smartest agent.
+Your job is to give the BEST possible final answer.
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+STRICT INTELLIGENCE RULES:
+1. MATCH YOUR RESPONSE LENGTH TO THE QUESTION.
+   - Simple question → short, direct answer.
+   - Deep technical question → full detailed answer with code/examples.
+   - Essay request → full essay.
+   - "Okay" / "thanks" / greeting → this should NOT reach you. If it does, respond in 1 line.
+
+2. NEVER SUMMARIZE THE AGENT DISCUSSION unless there was a real debate/correction worth noting.
+   - If agents agreed → just give the answer, don't mention they agreed.
+   - If agents debated and corrected each other → briefly mention the correction, then give the right answer.
+   - NEVER start with "The agents discussed..." or "Agent 1 said..." — users don't care.
+
+3. CONTEXT USAGE — BE SMART:
+   - Use conversation context ONLY if it genuinely helps answer this specific query.
+   - If the user asks something completely new, IGNORE previous context entirely.
+   - NEVER recap or summarize previous exchanges just because context exists.
+   - Do NOT mention "based on our previous conversation" unless it's truly necessary.
+
+4. FORMATTING:
+   - Use headers/sections ONLY for long multi-part answers.
+   - Use code blocks for ALL code — never inline plain text code.
+   - Use bullet points only when listing genuinely distinct items.
+   - No unnecessary padding, preamble, or filler phrases.
+
+5. TONE: Sound like ChatGPT or Claude — confident, natural, intelligent. Not corporate, not robotic.
+
+6. VERIFICATION — READ ALL AGENT RESPONSES BEFORE WRITING ANYTHING:
+   - Before forming your answer, mentally cross-check every factual claim across all agents.
+   - If Agent 1 says X and Agent 2 says Y on the same fact, determine which is correct based
+     on your own knowledge. State the correct one. Do not average or hedge between two wrong options.
+   - If all agents agree on something that is factually wrong, correct it. You are not bound
+     by agent consensus — you are bound by accuracy.
+   - Never repeat a claim just because an agent said it. You must independently validate it.
+
+7. HALLUCINATION PREVENTION:
+   - Only state facts you are confident are true. If uncertain, say so explicitly.
+   - Do NOT add extra details, statistics, names, dates, or examples that were not in the
+     agent responses AND that you cannot verify with high confidence.
+   - If agents provided a specific number, date, or name — double-check it mentally before
+     including it. If it feels wrong, flag it or omit it rather than repeat it blindly.
+   - Prefer saying less with high confidence over saying more with low confidence.
+
+8. YOUR ANSWER MUST BE STRICTLY BETTER THAN EVERY INDIVIDUAL AGENT RESPONSE:
+   - Read all three agent responses. Your answer must be more accurate, more complete,
+     and better structured than any single one of them.
+   - Pick the best elements from each agent and combine them — never just copy one agent.
+   - If one agent gave a great explanation but missed a key point another agent caught,
+     your answer must include both.
+   - If all agents gave a weak or incomplete answer, use your own knowledge to fill the gap.
+     You are the final authority — not a reporter of what agents said.
+"""
+
 class Orchestrator:
     def __init__(self):
         self.intent_classifier = IntentClassifier()
@@ -15,13 +83,59 @@ class Orchestrator:
         self.independent_mode = IndependentMode()
         self.consensus_client = LLMAgentClient()
     
+    def _history_before(self, user_query: str, conversation_history: list) -> list:
+        """History without the trailing copies of the message being routed."""
+        history = list(conversation_history or [])
+        query   = normalize_query(user_query)
+        while (history and history[-1].get("role") == "user"
+               and normalize_query(history[-1].get("content", "")) == query):
+            history.pop()
+        return history
+
+    def _route_fingerprint(self, user_query: str, conversation_history: list) -> str:
+        history = self._history_before(user_query, conversation_history)
+        return context_fingerprint(self._build_context_str(history[-ROUTE_FINGERPRINT_MESSAGES:]))
+
+    def _follows_ai(self, user_query: str, conversation_history: list) -> bool:
+        """True when the previous turn was an AI answer (the summary entry doesn't count)."""
+        history = self._history_before(user_query, conversation_history)
+        return bool(history) and (history[-1].get("role") == "assistant"
+                                   and history[-1].get("name") != "Context Summary")
+
+    def route(self, user_query: str, conversation_history: list = None) -> dict:
+        """
+        Combined gatekeeper + mode decision: {"invoke", "mode", "confidence", "source"}.
+        Pass decision["mode"] as execute_query(mode_override=...) to skip re-classifying.
+        """
+        context_str = self._build_context_str(conversation_history)
+        return self.intent_classifier.route(
+            user_query, context_str, self._route_fingerprint(user_query, conversation_history),
+            self._follows_ai(user_query, conversation_history),
+        )
+
+    async def route_async(self, user_query: str, conversation_history: list = None) -> dict:
+        """Async routing — awaited directly by the websocket handler, no worker thread."""
+        context_str = self._build_context_str(conversation_history)
+        return await self.intent_classifier.route_async(
+            user_query, context_str, self._route_fingerprint(user_query, conversation_history),
+            self._follows_ai(user_query, conversation_history),
+        )
+
     def check_if_ai_needed(self, user_query: str, conversation_history: list = None) -> bool:
         """Fast gatekeeper check to prevent orchestrating idle chat."""
-        context_str = self._build_context_str(conversation_history)
-        return self.intent_classifier.should_invoke_ai(user_query, context_str)
+        return self.route(user_query, conversation_history)["invoke"]
 
-    def execute_query(self, user_query: str, conversation_history: list = None, mode_override: str = None, status_callback=None, stream_callback=None) -> dict:
-        """Main orchestration logic with conversation context"""
+    async def check_if_ai_needed_async(self, user_query: str, conversation_history: list = None) -> bool:
+        """Async gatekeeper check — awaited directly by the websocket handler, no worker thread."""
+        return (await self.route_async(user_query, conversation_history))["invoke"]
+
+    def execute_query(self, user_query: str, conversation_history: list = None, mode_override: str = None, status_callback=None, stream_callback=None, agent_stream_callback=None, cancel_token=None) -> dict:
+        """
+        Main orchestration logic with conversation context.
+        `agent_stream_callback(agent_name, delta)` receives every mode agent's
+        tokens live; `stream_callback(delta)` receives the synthesis tokens.
+        Raises OrchestrationCancelled as soon as `cancel_token` is cancelled.
+        """
         
         context_str = self._build_context_str(conversation_history)
         
@@ -35,17 +149,19 @@ class Orchestrator:
             print(f"Mode selected: {mode}")
         
         # Step 2: Execute appropriate mode
+        check_cancelled(cancel_token)
         if mode == "opposition":
-            result = self.opposition_mode.run(user_query, context_str, status_callback)
+            result = self.opposition_mode.run(user_query, context_str, status_callback, agent_stream_callback=agent_stream_callback, cancel_token=cancel_token)
         elif mode == "support":
-            result = self.support_mode.run(user_query, context_str, status_callback)
+            result = self.support_mode.run(user_query, context_str, status_callback, agent_stream_callback=agent_stream_callback, cancel_token=cancel_token)
         else:
-            result = self.independent_mode.run(user_query, context_str, status_callback)
+            result = self.independent_mode.run(user_query, context_str, status_callback, agent_stream_callback=agent_stream_callback, cancel_token=cancel_token)
         
         # Step 3: Consensus synthesis
+        check_cancelled(cancel_token)
         if status_callback: status_callback("Synthesizing final consensus...")
         print("Synthesizing consensus...")
-        final_answer = self.synthesize_consensus(user_query, result, context_str, mode, stream_callback=stream_callback)
+        final_answer = self.synthesize_consensus(user_query, result, context_str, mode, stream_callback=stream_callback, cancel_token=cancel_token)
         print("Complete!")
         
         # Step 4: Evaluate synthesis quality — prints scorecard to terminal
@@ -81,12 +197,20 @@ class Orchestrator:
 
         return "\n".join(parts)
     
-    def synthesize_consensus(self, original_query: str, agent_results: dict, context_str: str = "", mode: str = "", stream_callback=None) -> str:
+    def synthesize_consensus(self, original_query: str, agent_results: dict, context_str: str = "", mode: str = "", stream_callback=None, cancel_token=None) -> str:
         """Synthesize final consensus from agent responses using streaming token dispatch."""
+        # Agents whose model failed after every retry and fallback return the client's
+        # failure text ("Error: ...", "⚠️ Agent did not respond ...") — never feed
+        # those into synthesis as if they were an answer
+        responses = [
+            r for r in agent_results.get("responses", [])
+            if not is_failed_completion(r["content"])
+        ] or agent_results.get("responses", [])
+
         # To avoid Groq TPM limit errors on free tiers, truncate long Opposition mode logs
         # We only pass the FINAL round (last 4 messages) to the synthesis agent
-        if mode == "opposition" and len(agent_results.get("responses", [])) > 5:
-            subset = agent_results["responses"][-4:]
+        if mode == "opposition" and len(responses) > 5:
+            subset = responses[-4:]
             responses_text = "(Debate was very long. Showing only the final resolved round:)\n\n" + "\n\n".join([
                 f"{r['agent_name']}: {r['content']}" 
                 for r in subset
@@ -94,103 +218,45 @@ class Orchestrator:
         else:
             responses_text = "\n\n".join([
                 f"{r['agent_name']}: {r['content']}" 
-                for r in agent_results["responses"]
+                for r in responses
             ])
         
-        context_section = ""
-        if context_str:
-            context_section = f"""[Conversation Context — use ONLY if directly relevant to this specific query]:
-{context_str}
-
-"""
-
         mode_hint = {
             "opposition": "Agents debated this. Resolve the debate, correct errors, give the verified answer.",
             "support":    "Agents explained this sequentially. Combine into one complete, well-structured answer.",
             "independent":"Agents gave independent perspectives. Synthesize into one coherent answer without repetition.",
         }.get(mode, "")
 
-        synthesis_prompt = f"""{context_section}User Query: {original_query}
+        synthesis_input = f"""User Query: {original_query}
 
 Agent Responses:
 {responses_text}
 
 {f"Mode hint: {mode_hint}" if mode_hint else ""}
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-You are the FINAL AI in a multi-agent group chat. You are the smartest agent.
-Your job is to give the BEST possible final answer.
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-STRICT INTELLIGENCE RULES:
-1. MATCH YOUR RESPONSE LENGTH TO THE QUESTION.
-   - Simple question → short, direct answer.
-   - Deep technical question → full detailed answer with code/examples.
-   - Essay request → full essay.
-   - "Okay" / "thanks" / greeting → this should NOT reach you. If it does, respond in 1 line.
-
-2. NEVER SUMMARIZE THE AGENT DISCUSSION unless there was a real debate/correction worth noting.
-   - If agents agreed → just give the answer, don't mention they agreed.
-   - If agents debated and corrected each other → briefly mention the correction, then give the right answer.
-   - NEVER start with "The agents discussed..." or "Agent 1 said..." — users don't care.
-
-3. CONTEXT USAGE — BE SMART:
-   - Use conversation context ONLY if it genuinely helps answer this specific query.
-   - If the user asks something completely new, IGNORE previous context entirely.
-   - NEVER recap or summarize previous exchanges just because context exists.
-   - Do NOT mention "based on our previous conversation" unless it's truly necessary.
-
-4. FORMATTING:
-   - Use headers/sections ONLY for long multi-part answers.
-   - Use code blocks for ALL code — never inline plain text code.
-   - Use bullet points only when listing genuinely distinct items.
-   - No unnecessary padding, preamble, or filler phrases.
-
-5. TONE: Sound like ChatGPT or Claude — confident, natural, intelligent. Not corporate, not robotic.
-
-6. VERIFICATION — READ ALL AGENT RESPONSES BEFORE WRITING ANYTHING:
-   - Before forming your answer, mentally cross-check every factual claim across all agents.
-   - If Agent 1 says X and Agent 2 says Y on the same fact, determine which is correct based
-     on your own knowledge. State the correct one. Do not average or hedge between two wrong options.
-   - If all agents agree on something that is factually wrong, correct it. You are not bound
-     by agent consensus — you are bound by accuracy.
-   - Never repeat a claim just because an agent said it. You must independently validate it.
-
-7. HALLUCINATION PREVENTION:
-   - Only state facts you are confident are true. If uncertain, say so explicitly.
-   - Do NOT add extra details, statistics, names, dates, or examples that were not in the
-     agent responses AND that you cannot verify with high confidence.
-   - If agents provided a specific number, date, or name — double-check it mentally before
-     including it. If it feels wrong, flag it or omit it rather than repeat it blindly.
-   - Prefer saying less with high confidence over saying more with low confidence.
-
-8. YOUR ANSWER MUST BE STRICTLY BETTER THAN EVERY INDIVIDUAL AGENT RESPONSE:
-   - Read all three agent responses. Your answer must be more accurate, more complete,
-     and better structured than any single one of them.
-   - Pick the best elements from each agent and combine them — never just copy one agent.
-   - If one agent gave a great explanation but missed a key point another agent caught,
-     your answer must include both.
-   - If all agents gave a weak or incomplete answer, use your own knowledge to fill the gap.
-     You are the final authority — not a reporter of what agents said.
-
 Now give the final answer:"""
 
         try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are the smartest AI in a multi-agent system. You synthesize agent discussions into the single best possible final answer, adapting your length, tone, and format to exactly match what the question needs. You independently verify every fact before including it. You are the final authority on accuracy — not a summarizer of agent opinions."
-                },
-                {"role": "user", "content": synthesis_prompt}
-            ]
+            # Stable prefix: system role + rules + conversation context; per-query inputs last
+            messages = build_messages(
+                SYNTHESIS_SYSTEM + "\n\n" + SYNTHESIS_RULES,
+                context_str,
+                "synthesis",
+                "",
+                synthesis_input,
+                context_header=SYNTHESIS_CONTEXT_HEADER,
+            )
 
             # agent5 = meta-llama/llama-4-scout-17b-16e-instruct (streaming internally, returns full string)
             return self.consensus_client.get_completion(
                 "agent5",
                 messages,
                 max_tokens=4096,
-                stream_callback=stream_callback
+                stream_callback=stream_callback,
+                cancel_token=cancel_token
             )
             
+        except OrchestrationCancelled:
+            raise
         except Exception as e:
             return f"Error in synthesis: {e}"
\ No newline at end of file
@@ -0,0 +1,67 @@
+# backend/app/agents/prompts.py
+"""
+Prompt Templates
+────────────────
+Every agent prompt in one orchestration is laid out the same way:
+
+  system  →  RULES + conversation context        (stable, byte-identical prefix)
+  user    →  role + mode-specific inputs + query  (changes per call, always last)
+
+The stable prefix is what providers can serve from their prompt cache, so a
+5-round debate pays for the conversation context once per model instead of
+re-sending it under a different wrapper on every call.
+
+Token counts (estimated, ~4 chars/token) are measured for every call and kept
+per prompt label; see prompt_stats().
+"""
+
+import threading
+from typing import Dict, List
+
+from app.utils.rate_limiter import estimate_text_tokens
+
+CONTEXT_HEADER = "Previous conversation context:"
+
+
+class PromptPrefix:
+    """System prefix shared by every call of one mode run / synthesis."""
+
+    def __init__(self, rules: str, context: str = "", context_header: str = CONTEXT_HEADER):
+        self.text   = rules.strip() + (f"\n\n{context_header}\n{context}" if context else "")
+        self.tokens = estimate_text_tokens(self.text)
+
+    def messages(self, label: str, role: str, body: str) -> List[Dict]:
+        """[system prefix, user suffix] with the role line first and the inputs after it."""
+        suffix = f"{role.strip()}\n\n{body.strip()}" if role else body.strip()
+        _record(label, self.tokens, estimate_text_tokens(suffix))
+        return [
+            {"role": "system", "content": self.text},
+            {"role": "user",   "content": suffix},
+        ]
+
+
+def build_messages(
+    rules: str, context: str, label: str, role: str, body: str, context_header: str = CONTEXT_HEADER
+) -> List[Dict]:
+    """Builds one call's messages; equal (rules, context) always give the same prefix bytes."""
+    return PromptPrefix(rules, context, context_header).messages(label, role, body)
+
+
+# ── Per-label token accounting ──────────────────────────────────────────────────
+
+_stats: Dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(label: str, prefix_tokens: int, suffix_tokens: int):
+    with _stats_lock:
+        entry = _stats.setdefault(label, {"calls": 0, "prefix_tokens": 0, "suffix_tokens": 0})
+        entry["calls"]         += 1
+        entry["prefix_tokens"] += prefix_tokens
+        entry["suffix_tokens"] += suffix_tokens
+    print(f"🧾 Prompt [{label}]: ~{prefix_tokens} prefix + ~{suffix_tokens} call tokens")
+
+
+def prompt_stats() -> Dict[str, dict]:
+    with _stats_lock:
+        return {label: dict(entry) for label, entry in _stats.items()}
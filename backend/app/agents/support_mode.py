@@ -1,6 +1,7 @@
 # backend/app/agents/support_mode.py
 
-from app.utils.LLM_agent_client import LLMAgentClient
+from app.utils.LLM_agent_client import LLMAgentClient, bind_agent_stream
+from app.agents.prompts import build_messages
 
 
 CHAT_RULES = """
@@ -19,67 +20,64 @@ class SupportMode:
     def __init__(self):
         self.client = LLMAgentClient()
 
-    def lead_agent(self, user_query: str, context: str = "") -> str:
-        context_block = ""
-        if context:
-            context_block = f"\n\nPrevious conversation context:\n{context}\n\nNow answer:"
-        messages = [
-            {"role": "system",
-             "content": CHAT_RULES + "\nRole: Agent 1. Give the main answer briefly."},
-            {"role": "user", "content": f"{context_block}\n{user_query}"},
-        ]
-        return self.client.get_completion("agent1", messages, temperature=0.6, max_tokens=1024)
+    def lead_agent(self, user_query: str, context: str = "", stream_callback=None, cancel_token=None) -> str:
+        messages = build_messages(
+            CHAT_RULES, context, "support/lead",
+            "Role: Agent 1. Give the main answer briefly.",
+            f"Now answer:\n{user_query}" if context else user_query,
+        )
+        return self.client.get_completion(
+            "agent1", messages, temperature=0.6, max_tokens=1024, stream_callback=stream_callback,
+            cancel_token=cancel_token,
+        )
 
-    def supplementer_agent(self, user_query: str, lead_response: str, context: str = "") -> str:
-        context_block = ""
-        if context:
-            context_block = f"\nPrevious conversation context:\n{context}\n"
-        messages = [
-            {"role": "system",
-             "content": CHAT_RULES + "\nRole: Agent 2. Add extra helpful nuance."},
-            {"role": "user",
-             "content": f"""{context_block}
-User query: {user_query}
+    def supplementer_agent(self, user_query: str, lead_response: str, context: str = "", stream_callback=None, cancel_token=None) -> str:
+        messages = build_messages(
+            CHAT_RULES, context, "support/supplementer",
+            "Role: Agent 2. Add extra helpful nuance.",
+            f"""User query: {user_query}
 
 Agent 1 said:
 {lead_response}
 
-Add extra points (no repetition).
-"""}
-        ]
-        return self.client.get_completion("agent2", messages, temperature=0.7, max_tokens=1500)
+Add extra points (no repetition).""",
+        )
+        return self.client.get_completion(
+            "agent2", messages, temperature=0.7, max_tokens=1500, stream_callback=stream_callback,
+            cancel_token=cancel_token,
+        )
 
-    def third_agent(self, user_query: str, previous: str, context: str = "") -> str:
-        context_block = ""
-        if context:
-            context_block = f"\nPrevious conversation context:\n{context}\n"
-        messages = [
-            {"role": "system",
-             "content": CHAT_RULES +
-                        "\nRole: Agent 3. Give a extra final points which others agents might have missed."},
-            {"role": "user",
-             "content": f"""{context_block}
-User query: {user_query}
+    def third_agent(self, user_query: str, previous: str, context: str = "", stream_callback=None, cancel_token=None) -> str:
+        messages = build_messages(
+            CHAT_RULES, context, "support/third",
+            "Role: Agent 3. Give a extra final points which others agents might have missed.",
+            f"""User query: {user_query}
 
 So far agents said:
 {previous}
 
-Add extra final useful points.
-"""}
-        ]
-        return self.client.get_completion("agent3", messages, temperature=0.7, max_tokens=1024)
+Add extra final useful points.""",
+        )
+        return self.client.get_completion(
+            "agent3", messages, temperature=0.7, max_tokens=1024, stream_callback=stream_callback,
+            cancel_token=cancel_token,
+        )
 
-    def run(self, user_query: str, context: str = "", status_callback=None) -> dict:
+    def run(self, user_query: str, context: str = "", status_callback=None, agent_stream_callback=None, cancel_token=None) -> dict:
         print("Running Support Mode...")
         
         if status_callback: status_callback("Agent 1 is outlining the core answer...")
-        lead = self.lead_agent(user_query, context)
+        lead = self.lead_agent(user_query, context, bind_agent_stream(agent_stream_callback, "Agent 1"), cancel_token)
         
         if status_callback: status_callback("Agent 2 is supplementing with extra nuance...")
-        supplement = self.supplementer_agent(user_query, lead, context)
+        supplement = self.supplementer_agent(
+            user_query, lead, context, bind_agent_stream(agent_stream_callback, "Agent 2"), cancel_token
+        )
         
         if status_callback: status_callback("Agent 3 is reviewing for final missing points...")
-        third = self.third_agent(user_query, lead + "\n" + supplement, context)
+        third = self.third_agent(
+            user_query, lead + "\n" + supplement, context, bind_agent_stream(agent_stream_callback, "Agent 3"), cancel_token
+        )
 
         return {
             "mode": "support",
@@ -14,6 +14,10 @@ from app.db.models import User
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 
+# Comma-separated emails allowed to read the operational /api/llm, /api/rooms
+# and /api/ws stats endpoints
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
@@ -40,3 +44,12 @@ def get_current_user(
 
     except JWTError:
         raise HTTPException(status_code=401, detail="Token invalid or expired")
+
+
+# -------------------------
+# ✅ Admin Dependency
+# -------------------------
+def get_admin_user(user: User = Depends(get_current_user)):
+    if (user.email or "").lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
@@ -1,13 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.db.database import get_db
 from app.db.models import Message, GroupMember
+from app.db.message_service import save_message, load_message_page, HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE
 from app.auth.dependencies import get_current_user
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
 
+def _require_member(db: Session, group_id: str, user):
+    member = db.query(GroupMember).filter_by(
+        group_id=group_id,
+        user_id=user.id
+    ).first()
+
+    if not member:
+        raise HTTPException(status_code=403, detail="Not a group member")
+
+
+def _message_json(m: Message) -> dict:
+    return {
+        "id": m.id,
+        "sender": m.sender_id,
+        "sender_name": m.sender_name,
+        "sender_type": m.sender_type,
+        "content": m.content,
+        "time": m.timestamp
+    }
+
+
 # ✅ Send Message
 @router.post("/send/{group_id}")
 def send_message(
@@ -17,42 +41,64 @@ def send_message(
     user=Depends(get_current_user)
 ):
     # Ensure user is member
-    member = db.query(GroupMember).filter_by(
-        group_id=group_id,
-        user_id=user.id
-    ).first()
+    _require_member(db, group_id, user)
 
-    if not member:
-        raise HTTPException(status_code=403, detail="Not a group member")
-
-    msg = Message(
+    save_message(
+        db=db,
         group_id=group_id,
         sender_id=user.id,
         sender_name=user.email,
         sender_type="user",
-        content=content
+        content=content,
     )
 
-    db.add(msg)
-    db.commit()
-
     return {"message": "Message sent"}
 
 
-# ✅ Get Chat History (Memory)
+# ✅ Get Chat History (Memory) — the whole history as a list, oldest first.
+# Kept in its original shape for existing clients; new clients should page
+# with /history/{group_id}/page. Breaking change: members only (was open to
+# any signed-in user).
 @router.get("/history/{group_id}")
 def chat_history(
     group_id: str,
     db: Session = Depends(get_db),
     user=Depends(get_current_user)
 ):
-    messages = db.query(Message).filter_by(group_id=group_id).order_by(Message.timestamp).all()
-
-    return [
-        {
-            "sender": m.sender_id,
-            "content": m.content,
-            "time": m.timestamp
-        }
-        for m in messages
-    ]
+    _require_member(db, group_id, user)
+
+    messages = (
+        db.query(Message)
+        .filter_by(group_id=group_id)
+        .order_by(Message.timestamp, Message.id)
+        .all()
+    )
+    return [_message_json(m) for m in messages]
+
+
+# ✅ Get Chat History Page — keyset pages, newest page first
+@router.get("/history/{group_id}/page")
+def chat_history_page(
+    group_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    _require_member(db, group_id, user)
+
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    try:
+        page = load_message_page(db, group_id, before=before, after=after, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "messages": [_message_json(m) for m in page["messages"]],
+        "before": page["before"],
+        "after": page["after"],
+        "has_more": page["has_more"],
+    }
@@ -1,9 +1,76 @@
 # app/db/init_db.py
+from sqlalchemy import inspect, text
+
 from app.db.database import engine
 from app.db.models import Base, User, Group, GroupMember, Message, ConversationSummary  # ← explicit imports
+from app.db.message_service import UNREAD_BACKFILL_SQL
+
+
+# Columns added after their table was first created. create_all() never alters
+# existing tables, so these are added in place (idempotent, see add_col.py).
+# (table, column, type, backfill statement or None)
+ADDED_COLUMNS = [
+    ("group_members", "last_read_at", "TIMESTAMP", None),
+    ("messages",      "token_count",  "INTEGER",
+     "UPDATE messages SET token_count = LENGTH(content) / 4 WHERE token_count IS NULL"),
+    ("group_members", "unread_count", "INTEGER DEFAULT 0", UNREAD_BACKFILL_SQL),
+]
+
+
+# Indexes added after their table was first created (create_all() only builds
+# indexes together with a new table). Keep in sync with the models'
+# __table_args__; test_query_plans.py checks the hot queries use them.
+# (index name, table, columns, unique, cleanup statements by dialect or None)
+ADDED_INDEXES = [
+    ("ix_messages_group_ts_id",     "messages",      "group_id, timestamp, id", False, None),
+    ("ux_group_members_group_user", "group_members", "group_id, user_id",       True, {
+        # a unique index cannot be built over duplicate memberships; keep the
+        # oldest row (SQLite rowid) / one row per pair elsewhere (no rowid there)
+        "sqlite":  "DELETE FROM group_members WHERE rowid NOT IN "
+                   "(SELECT MIN(rowid) FROM group_members GROUP BY group_id, user_id)",
+        "default": "DELETE FROM group_members WHERE id NOT IN "
+                   "(SELECT MIN(id) FROM group_members GROUP BY group_id, user_id)",
+    }),
+    ("ix_group_members_user_id",    "group_members", "user_id",                 False, None),
+]
+
+
+def migrate_columns():
+    inspector = inspect(engine)
+    for table, column, col_type, backfill in ADDED_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        if column in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}"))
+            print(f"✅ Added {table}.{column}")
+            if backfill:
+                updated = conn.execute(text(backfill)).rowcount
+                print(f"✅ Backfilled {updated} rows of {table}.{column}")
+
+
+def migrate_indexes():
+    inspector = inspect(engine)
+    for name, table, columns, unique, cleanup in ADDED_INDEXES:
+        if not inspector.has_table(table):
+            continue
+        if name in {ix["name"] for ix in inspector.get_indexes(table)}:
+            continue
+        with engine.begin() as conn:
+            if cleanup:
+                statement = cleanup.get(engine.dialect.name, cleanup["default"])
+                removed   = conn.execute(text(statement)).rowcount
+                if removed:
+                    print(f"✅ Removed {removed} duplicate rows from {table}")
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})"))
+        print(f"✅ Added index {name} on {table} ({columns})")
 
 
 def init_database():
     print("✅ Creating database tables...")
     Base.metadata.create_all(bind=engine)
-    print("✅ Database ready!")
\ No newline at end of file
+    migrate_columns()
+    migrate_indexes()
+    print("✅ Database ready!")
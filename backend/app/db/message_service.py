@@ -1,5 +1,13 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, text
 from sqlalchemy.orm import Session
-from app.db.models import Message
+from app.db.models import Message, GroupMember
+from app.db.room_cache import room_cache
+from app.utils.rate_limiter import estimate_text_tokens
 
 
 def save_message(
@@ -18,24 +26,154 @@ def save_message(
         sender_type=sender_type,
         content=content,
         extra_data=metadata,
+        token_count=estimate_text_tokens(content),
     )
 
     db.add(msg)
+    _increment_unread(db, group_id, sender_id)
     db.commit()
     db.refresh(msg)
 
+    # Write-through so the websocket path never re-reads the recent window
+    room_cache.record_message(msg)
+
     return msg
 
 
+# -------------------------------------------------
+# Materialized unread counters (GroupMember.unread_count)
+# -------------------------------------------------
+# Incremented in the same transaction as every message insert, reset by
+# mark_group_read. Counts messages after last_read_at that the member did not
+# send; members with no last_read_at are not counted (as before).
+
+UNREAD_COUNT_SQL = (
+    "SELECT COUNT(*) FROM messages m "
+    "WHERE m.group_id = group_members.group_id "
+    "AND m.timestamp > group_members.last_read_at "
+    "AND (m.sender_id IS NULL OR m.sender_id != group_members.user_id)"
+)
+UNREAD_BACKFILL_SQL = f"UPDATE group_members SET unread_count = ({UNREAD_COUNT_SQL})"
+
+
+def _increment_unread(db: Session, group_id: str, sender_id: Optional[str]):
+    query = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.last_read_at.isnot(None),
+    )
+    if sender_id:
+        query = query.filter(GroupMember.user_id != sender_id)
+    query.update(
+        {GroupMember.unread_count: func.coalesce(GroupMember.unread_count, 0) + 1},
+        synchronize_session=False,
+    )
+
+
+def reset_unread(db: Session, membership: GroupMember):
+    membership.last_read_at = datetime.utcnow()
+    membership.unread_count = 0
+
+
+def unread_counts(db: Session, group_id: str) -> Dict[str, int]:
+    """user_id → unread_count for every member of the group."""
+    rows = db.query(GroupMember.user_id, GroupMember.unread_count).filter(
+        GroupMember.group_id == group_id
+    ).all()
+    return {user_id: count or 0 for user_id, count in rows}
+
+
+def reconcile_unread_counts(db: Session) -> int:
+    """
+    Recomputes every counter from the messages table and repairs the ones that
+    drifted (e.g. a read racing an insert). Returns how many were repaired.
+    """
+    repaired = db.execute(text(
+        f"UPDATE group_members SET unread_count = ({UNREAD_COUNT_SQL}) "
+        f"WHERE COALESCE(unread_count, -1) != ({UNREAD_COUNT_SQL})"
+    )).rowcount
+    db.commit()
+    return repaired
+
+
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE  = 200
+
+
+# -------------------------------------------------
+# Keyset history cursors
+# -------------------------------------------------
+# A cursor names one message by its (timestamp, id) sort key, so pages stay
+# stable while new messages arrive and every page is one index range scan on
+# ix_messages_group_ts_id instead of an OFFSET or a full load.
+
+def encode_cursor(msg) -> str:
+    raw = json.dumps([msg.timestamp.isoformat(), msg.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError on anything that is not a cursor we issued."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, msg_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), str(msg_id)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+
+def load_message_page(
+    db: Session,
+    group_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+) -> dict:
+    """
+    One page of a group's history, oldest first.
+
+      before=cursor → the `limit` messages just older than the cursor
+      after=cursor  → the `limit` messages just newer than the cursor
+      neither       → the newest `limit` messages
+
+    Returns the page plus cursors for its oldest ("before") and newest
+    ("after") message and whether more messages exist in the paging direction.
+    """
+    limit = max(1, min(limit, MAX_HISTORY_PAGE))
+    query = db.query(Message).filter(Message.group_id == group_id)
+
+    if after:
+        ts, msg_id = decode_cursor(after)
+        query = query.filter(or_(
+            Message.timestamp > ts,
+            and_(Message.timestamp == ts, Message.id > msg_id),
+        ))
+        rows = query.order_by(Message.timestamp.asc(), Message.id.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        if before:
+            ts, msg_id = decode_cursor(before)
+            query = query.filter(or_(
+                Message.timestamp < ts,
+                and_(Message.timestamp == ts, Message.id < msg_id),
+            ))
+        rows = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+
+    return {
+        "messages": rows,
+        "before":   encode_cursor(rows[0]) if rows else before,
+        "after":    encode_cursor(rows[-1]) if rows else after,
+        "has_more": has_more,
+    }
+
+
 def load_recent_messages(
     db: Session,
     group_id: str,
-    limit: int = 50
+    limit: int = HISTORY_PAGE_SIZE
 ):
-    return (
-        db.query(Message)
-        .filter(Message.group_id == group_id)
-        .order_by(Message.timestamp.asc())
-        .limit(limit)
-        .all()
-    )
+    """Newest `limit` messages of the group, oldest first."""
+    return load_message_page(db, group_id, limit=limit)["messages"]
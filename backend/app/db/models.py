@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -70,10 +70,17 @@ class GroupMember(Base):
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     joined_at = Column(DateTime, default=datetime.utcnow)
     last_read_at = Column(DateTime, default=datetime.utcnow)
+    unread_count = Column(Integer, default=0)  # maintained by save_message / mark_group_read
 
     group = relationship("Group", back_populates="members")
     user = relationship("User", back_populates="memberships")
 
+    # Membership checks filter_by(group_id, user_id); "my groups" filters by user_id
+    __table_args__ = (
+        Index("ux_group_members_group_user", "group_id", "user_id", unique=True),
+        Index("ix_group_members_user_id", "user_id"),
+    )
+
 
 # -------------------------
 # MESSAGE TABLE
@@ -89,9 +96,15 @@ class Message(Base):
     content = Column(Text, nullable=False)
     extra_data = Column(Text, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    token_count = Column(Integer, nullable=True)  # estimated once on save, used for context budgeting
 
     group = relationship("Group", back_populates="messages")
 
+    # Keyset history pages: WHERE group_id = ? AND (timestamp, id) < cursor ORDER BY timestamp, id
+    __table_args__ = (
+        Index("ix_messages_group_ts_id", "group_id", "timestamp", "id"),
+    )
+
 
 # -------------------------
 # CONVERSATION SUMMARY TABLE  ← NEW
@@ -0,0 +1,199 @@
+# backend/app/db/room_cache.py
+"""
+Per-Room Context Cache
+──────────────────────
+In-memory, per-process cache of what every incoming websocket message needs
+to know about its room:
+
+  room  →  agents       (Group.agents, decoded)
+           summary      (ConversationSummary.summary_text)
+           messages     (ring buffer of the newest ROOM_CACHE_WINDOW messages)
+
+  • Loaded lazily, one query per field, the first time a room is used
+  • Write-through: save_message() appends to the ring buffer and the
+    summarizer pushes every new summary, so the steady state costs no queries
+  • Bounded: at most ROOM_CACHE_MAX_ROOMS rooms, least-recently-used evicted
+  • invalidate(room_id) whenever group state changes outside those paths
+    (group deleted, members changed, ...)
+
+Cached messages are detached snapshots, safe to read after the session closes.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.models import Group, Message, ConversationSummary
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+ROOM_CACHE_MAX_ROOMS = int(os.getenv("ROOM_CACHE_MAX_ROOMS", "256"))
+ROOM_CACHE_WINDOW    = 50     # newest messages kept per room (≥ context_builder.RECENT_WINDOW)
+# ────────────────────────────────────────────────────────────────────────────────
+
+_UNLOADED = object()
+
+
+class CachedMessage:
+    """Read-only copy of a Message row."""
+
+    __slots__ = (
+        "id", "group_id", "sender_id", "sender_name", "sender_type", "content", "extra_data", "timestamp", "token_count",
+    )
+
+    def __init__(self, msg: Message):
+        self.id          = msg.id
+        self.group_id    = msg.group_id
+        self.sender_id   = msg.sender_id
+        self.sender_name = msg.sender_name
+        self.sender_type = msg.sender_type
+        self.content     = msg.content
+        self.extra_data  = msg.extra_data
+        self.timestamp   = msg.timestamp
+        self.token_count = msg.token_count
+
+
+class RoomState:
+    def __init__(self, agents: List[str]):
+        self.agents   = agents
+        self.summary  = _UNLOADED
+        self.messages = None     # deque once loaded
+        self.writes   = 0        # messages recorded; a load that raced a write is discarded
+
+
+class RoomCache:
+    def __init__(self, max_rooms: int = ROOM_CACHE_MAX_ROOMS, window: int = ROOM_CACHE_WINDOW):
+        self.max_rooms = max_rooms
+        self.window    = window
+        self._rooms: "OrderedDict[str, RoomState]" = OrderedDict()
+        self._lock     = threading.Lock()
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    # -------------------------------------------------
+    # Lookup
+    # -------------------------------------------------
+    def _room(self, room_id: str) -> Optional[RoomState]:
+        """Must hold self._lock."""
+        room = self._rooms.get(room_id)
+        if room is not None:
+            self._rooms.move_to_end(room_id)
+        return room
+
+    def get_room(self, db: Session, room_id: str) -> Optional[RoomState]:
+        """The room's cached state, or None when the group does not exist."""
+        with self._lock:
+            room = self._room(room_id)
+            if room is not None:
+                self.hits += 1
+                return room
+            self.misses += 1
+
+        group = db.query(Group).filter(Group.id == room_id).first()
+        if group is None:
+            return None
+
+        with self._lock:
+            room = self._room(room_id)
+            if room is None:
+                room = RoomState(json.loads(group.agents) if group.agents else [])
+                self._rooms[room_id] = room
+                while len(self._rooms) > self.max_rooms:
+                    self._rooms.popitem(last=False)
+                    self.evictions += 1
+            return room
+
+    def get_agents(self, db: Session, room_id: str) -> Optional[List[str]]:
+        room = self.get_room(db, room_id)
+        return None if room is None else room.agents
+
+    def get_recent_messages(self, db: Session, room_id: str, limit: int) -> List:
+        """Newest `limit` messages of the room, oldest first."""
+        room = self.get_room(db, room_id)
+        if room is None or limit > self.window:
+            return _query_recent_messages(db, room_id, limit)
+
+        with self._lock:
+            if room.messages is not None:
+                return list(room.messages)[-limit:] if limit else []
+            writes = room.writes
+
+        loaded = deque(
+            (CachedMessage(m) for m in _query_recent_messages(db, room_id, self.window)),
+            maxlen=self.window,
+        )
+        with self._lock:
+            if room.messages is None and room.writes == writes:
+                room.messages = loaded
+            messages = room.messages if room.messages is not None else loaded
+            return list(messages)[-limit:] if limit else []
+
+    def get_summary(self, db: Session, room_id: str) -> str:
+        room = self.get_room(db, room_id)
+        if room is not None:
+            with self._lock:
+                if room.summary is not _UNLOADED:
+                    return room.summary
+
+        row = db.query(ConversationSummary).filter(ConversationSummary.group_id == room_id).first()
+        summary = row.summary_text if row and row.summary_text else ""
+        if room is not None:
+            with self._lock:
+                if room.summary is _UNLOADED:
+                    room.summary = summary
+        return summary
+
+    # -------------------------------------------------
+    # Write-through
+    # -------------------------------------------------
+    def record_message(self, msg: Message):
+        """Called by save_message after commit. Only rooms already in the cache are touched."""
+        with self._lock:
+            room = self._rooms.get(msg.group_id)
+            if room is not None:
+                room.writes += 1
+                if room.messages is not None:
+                    room.messages.append(CachedMessage(msg))
+
+    def record_summary(self, room_id: str, summary_text: str):
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is not None:
+                room.summary = summary_text or ""
+
+    def invalidate(self, room_id: str):
+        with self._lock:
+            self._rooms.pop(room_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rooms = len(self._rooms)
+        lookups = self.hits + self.misses
+        return {
+            "rooms":     rooms,
+            "max_rooms": self.max_rooms,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "hit_rate":  round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def _query_recent_messages(db: Session, room_id: str, limit: int) -> List[Message]:
+    msgs = (
+        db.query(Message)
+        .filter(Message.group_id == room_id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .limit(limit)
+        .all()
+    )
+    msgs.reverse()
+    return msgs
+
+
+# Process-wide cache shared by the websocket handler, context builder and routes
+room_cache = RoomCache()
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
 from pydantic import BaseModel
 from typing import List, Optional
 import uuid
@@ -7,6 +9,8 @@ from datetime import datetime
 import json
 from app.db.database import get_db
 from app.db.models import Group, GroupMember, User, Message, ConversationSummary
+from app.db.room_cache import room_cache
+from app.db.message_service import reset_unread
 from app.auth.dependencies import get_current_user
 
 
@@ -25,6 +29,68 @@ class AddMembersBody(BaseModel):
     member_emails: List[str]
 
 
+# IN-list size for bulk email / membership lookups (stays under SQLite's bind limit)
+INVITE_CHUNK_SIZE = 500
+
+
+def _chunks(items: List[str], size: int = INVITE_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _invite_members(db: Session, group_id: str, member_emails: List[str], skip_email: str = None):
+    """
+    Resolves all emails with one IN query, finds existing memberships with one
+    more, and bulk-inserts the new GroupMember rows. Does not commit, so the
+    caller's group changes and the invites land in one transaction.
+    Returns (added_members, failed_members) in the order the emails were given;
+    repeats of an email are reported as "Duplicate" after its first occurrence.
+    """
+    given  = [e for e in (e.strip().lower() for e in member_emails) if e != skip_email]
+    emails = list(dict.fromkeys(given))
+    if not emails:
+        return [], []
+
+    user_ids = {}
+    for chunk in _chunks(emails):
+        user_ids.update(
+            (email, user_id)
+            for user_id, email in db.query(User.id, User.email).filter(User.email.in_(chunk))
+        )
+
+    already = set()
+    for chunk in _chunks(list(user_ids.values())):
+        already.update(
+            user_id
+            for (user_id,) in db.query(GroupMember.user_id).filter(
+                GroupMember.group_id == group_id, GroupMember.user_id.in_(chunk)
+            )
+        )
+
+    added_members  = []
+    failed_members = []
+    seen = set()
+    for email in given:
+        user_id = user_ids.get(email)
+        if email in seen:
+            failed_members.append({"email": email, "reason": "Duplicate"})
+            continue
+        seen.add(email)
+        if not user_id:
+            failed_members.append({"email": email, "reason": "User not found"})
+        elif user_id in already:
+            failed_members.append({"email": email, "reason": "Already a member"})
+        else:
+            added_members.append({"email": email, "user_id": user_id})
+
+    if added_members:
+        db.execute(
+            insert(GroupMember),
+            [{"group_id": group_id, "user_id": m["user_id"]} for m in added_members],
+        )
+    return added_members, failed_members
+
+
 # ---------------------------------------------------
 # ✅ Create Group (Stored in DB)
 # ---------------------------------------------------
@@ -46,37 +112,16 @@ def create_group(
         created_at=datetime.utcnow(),
     )
 
+    # Group, creator membership and invites commit together
     db.add(group)
-    db.commit()
-    db.refresh(group)
+    db.add(GroupMember(group_id=group.id, user_id=user.id))
+    db.flush()
 
-    member = GroupMember(group_id=group.id, user_id=user.id)
-    db.add(member)
+    added_members, failed_members = _invite_members(
+        db, group.id, body.member_emails or [], skip_email=user.email.lower()
+    )
     db.commit()
 
-    added_members  = []
-    failed_members = []
-
-    if body.member_emails:
-        for email in body.member_emails:
-            email = email.strip().lower()
-            if email == user.email.lower():
-                continue
-            invited_user = db.query(User).filter(User.email == email).first()
-            if not invited_user:
-                failed_members.append({"email": email, "reason": "User not found"})
-                continue
-            existing_member = db.query(GroupMember).filter_by(
-                group_id=group.id, user_id=invited_user.id
-            ).first()
-            if existing_member:
-                failed_members.append({"email": email, "reason": "Already a member"})
-                continue
-            new_member = GroupMember(group_id=group.id, user_id=invited_user.id)
-            db.add(new_member)
-            added_members.append({"email": email, "user_id": invited_user.id})
-        db.commit()
-
     return {
         "success": True,
         "group": {
@@ -109,7 +154,13 @@ def join_group(
 
     member = GroupMember(group_id=group_id, user_id=user.id)
     db.add(member)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # a concurrent join won the (group_id, user_id) unique index
+        db.rollback()
+        return {"message": "Already a member"}
+    room_cache.invalidate(group_id)
 
     return {"message": "Joined group successfully"}
 
@@ -117,37 +168,51 @@ def join_group(
 # ---------------------------------------------------
 # ✅ List My Groups (User-Specific)
 # ---------------------------------------------------
+def load_my_groups(db: Session, user_id: str):
+    """
+    One round-trip for the whole sidebar: (Group, unread_count, last content,
+    last timestamp) per membership. Unread counts are the materialized
+    GroupMember.unread_count; the last message is a correlated subquery served
+    by ix_messages_group_ts_id, so the cost grows with the number of groups,
+    not with the number of messages.
+    """
+    last_message_id = (
+        select(Message.id)
+        .where(Message.group_id == Group.id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .limit(1)
+        .correlate(Group)
+        .scalar_subquery()
+    )
+    last_msg = aliased(Message)
+
+    return (
+        db.query(Group, GroupMember.unread_count, last_msg.content, last_msg.timestamp)
+        .join(GroupMember, GroupMember.group_id == Group.id)
+        .outerjoin(last_msg, last_msg.id == last_message_id)
+        .filter(GroupMember.user_id == user_id)
+        .all()
+    )
+
+
 @router.get("/my")
 def my_groups(
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    memberships = db.query(GroupMember).filter(GroupMember.user_id == user.id).all()
-    group_map = {m.group_id: m for m in memberships}
-    group_ids = list(group_map.keys())
-    groups = db.query(Group).filter(Group.id.in_(group_ids)).all()
-
     # Import helper for consistent UTC timestamps
     from app.main import serialize_dt
 
     results = []
-    for g in groups:
-        member = group_map[g.id]
-        last_msg = db.query(Message).filter(Message.group_id == g.id).order_by(Message.timestamp.desc()).first()
-        
-        unread_count = 0
-        if member.last_read_at and last_msg:
-            # Only count messages sent after exactly when the user last read this room
-            unread_count = db.query(Message).filter(Message.group_id == g.id, Message.timestamp > member.last_read_at).count()
-
+    for g, unread_count, last_content, last_time in load_my_groups(db, user.id):
         results.append({
             "id":     g.id,
             "name":   g.name,
             "avatar": "💬",
             "agents": json.loads(g.agents) if g.agents else [],
-            "last_message_content": last_msg.content if last_msg else "No messages yet",
-            "last_message_time": serialize_dt(last_msg.timestamp) if last_msg else serialize_dt(g.created_at),
-            "unread_count": unread_count
+            "last_message_content": last_content if last_time else "No messages yet",
+            "last_message_time": serialize_dt(last_time) if last_time else serialize_dt(g.created_at),
+            "unread_count": unread_count or 0
         })
 
     # Pre-sort on backend for efficiency
@@ -166,7 +231,7 @@ def mark_group_read(
 ):
     membership = db.query(GroupMember).filter_by(group_id=group_id, user_id=user.id).first()
     if membership:
-        membership.last_read_at = datetime.utcnow()
+        reset_unread(db, membership)
         db.commit()
     return {"success": True}
 
@@ -189,26 +254,14 @@ def add_members_to_group(
     if not is_member:
         raise HTTPException(status_code=403, detail="You are not a member of this group")
 
-    added_members  = []
-    failed_members = []
-
-    for email in body.member_emails:
-        email = email.strip().lower()
-        invited_user = db.query(User).filter(User.email == email).first()
-        if not invited_user:
-            failed_members.append({"email": email, "reason": "User not found"})
-            continue
-        existing_member = db.query(GroupMember).filter_by(
-            group_id=group_id, user_id=invited_user.id
-        ).first()
-        if existing_member:
-            failed_members.append({"email": email, "reason": "Already a member"})
-            continue
-        new_member = GroupMember(group_id=group_id, user_id=invited_user.id)
-        db.add(new_member)
-        added_members.append({"email": email, "user_id": invited_user.id})
-
-    db.commit()
+    added_members, failed_members = _invite_members(db, group_id, body.member_emails)
+    try:
+        db.commit()
+    except IntegrityError:
+        # someone else added one of these users in between; nothing was written
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Group membership changed, please retry")
+    room_cache.invalidate(group_id)
 
     return {
         "success":        True,
@@ -280,5 +333,6 @@ def delete_group(
     db.query(Group).filter(Group.id == group_id).delete()
 
     db.commit()
+    room_cache.invalidate(group_id)
 
     return {"success": True, "message": f"Group '{group.name}' deleted successfully"}
\ No newline at end of file
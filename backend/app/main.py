@@ -1,20 +1,23 @@
 # backend/app/main.py
 import asyncio
+import threading
 import httpx
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from jose import jwt, JWTError
 from app.db.init_db import init_database
 from app.db.database import SessionLocal
 
-from app.db.message_service import save_message, load_recent_messages
-from app.utils.context_builder import build_hybrid_context
+from app.db.message_service import save_message, load_message_page, unread_counts, reconcile_unread_counts
+from app.db.room_cache import room_cache
+from app.utils.context_builder import build_hybrid_context, summary_worker
 
 from app.auth.auth_routes import router as auth_router
 from app.groups.group_routes import router as group_router
 from app.chat.chat_routes import router as chat_router
 from app.auth.ws_auth import get_user_from_token
+from app.auth.dependencies import get_admin_user
 from app.models.schemas import (
     Group,
     QueryRequest,
@@ -24,6 +27,16 @@ from app.models.schemas import (
 )
 
 from app.agents.orchestrator import Orchestrator
+from app.utils.LLM_agent_client import close_shared_clients
+from app.utils.completion_cache import cache_stats
+from app.utils.rate_limiter import scheduler as rate_limit_scheduler
+from app.utils.key_pool import get_key_pool, key_pool_stats
+from app.utils.retry_policy import circuit_breaker_stats
+from app.agents.prompts import prompt_stats
+from app.utils.intent_classifier import classifier_stats
+from app.utils.room_scheduler import RoomScheduler, OrchestrationJob
+from app.utils.cancellation import OrchestrationCancelled
+from app.utils.room_inbox import RoomInboxes
 
 from typing import Dict, List
 import json
@@ -65,10 +78,36 @@ async def keep_alive():
             print(f"⚠️ Keep-alive failed: {e}")
         await asyncio.sleep(600)  # ping every 10 minutes
 
+# Unread counters are maintained incrementally; this repairs any drift
+UNREAD_RECONCILE_SECONDS = 3600
+
+
+def _reconcile_unread_once() -> int:
+    db = SessionLocal()
+    try:
+        return reconcile_unread_counts(db)
+    finally:
+        db.close()
+
+
+async def unread_reconciler():
+    while True:
+        await asyncio.sleep(UNREAD_RECONCILE_SECONDS)
+        try:
+            repaired = await asyncio.to_thread(_reconcile_unread_once)
+            if repaired:
+                print(f"🔧 Unread reconcile repaired {repaired} counters.")
+        except Exception as e:
+            print(f"⚠️ Unread reconcile failed: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     asyncio.create_task(keep_alive())
+    asyncio.create_task(unread_reconciler())
+    summary_worker.start()
     yield
+    await summary_worker.stop()
+    await close_shared_clients()
     
     
 app = FastAPI(title="Consensus", lifespan=lifespan)
@@ -108,49 +147,259 @@ AVAILABLE_AGENTS = [
 ]
 
 
+# Outbound frames produced by orchestrator worker threads are buffered per room
+# and flushed every OUTBOX_FLUSH_SECONDS, or sooner once OUTBOX_FLUSH_CHARS of
+# stream text are pending. Pending deltas of the same stream are merged.
+OUTBOX_FLUSH_SECONDS = 0.05
+OUTBOX_FLUSH_CHARS   = 64
+STREAM_FRAME_TYPES   = ("agent_stream", "consensus_stream")
+
+# Per-connection send queue: frames beyond SEND_QUEUE_SIZE, or a single send
+# slower than SEND_TIMEOUT_SECONDS, evict that client instead of stalling the room
+SEND_QUEUE_SIZE      = 256
+SEND_TIMEOUT_SECONDS = 10.0
+
+
+def encode_frame(message: dict) -> str:
+    # Same encoding as WebSocket.send_json, done once per frame instead of once per socket
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class RoomOutbox:
+    """
+    Thread-safe outbound buffer for one room.
+      • put() may be called from any thread (status + stream callbacks)
+      • pending agent_stream / consensus_stream deltas from the same source
+        are merged into one frame (parallel agents interleave per frame, each
+        agent's text stays in order; status frames are never jumped)
+      • frames are sent by the event loop in batches
+    Call `await flush()` once the producer is done.
+    """
+
+    def __init__(self, manager: "ConnectionManager", room_id: str, loop: asyncio.AbstractEventLoop):
+        self.manager    = manager
+        self.room_id    = room_id
+        self.loop       = loop
+        self._frames: List[dict] = []
+        self._chars     = 0
+        self._armed     = False
+        self._sending   = set()
+        self._lock      = threading.Lock()
+        self._send_lock = asyncio.Lock()
+
+    def put(self, message: dict):
+        with self._lock:
+            pending = self._pending_stream_frame(message) if message["type"] in STREAM_FRAME_TYPES else None
+            if pending is not None:
+                pending["content"] += message["content"]
+            else:
+                self._frames.append(dict(message))
+
+            if message["type"] in STREAM_FRAME_TYPES:
+                self._chars += len(message["content"])
+                flush_now = self._chars >= OUTBOX_FLUSH_CHARS
+            else:
+                flush_now = True     # status frames go out right away
+            arm = not flush_now and not self._armed
+            if arm:
+                self._armed = True
+
+        if flush_now:
+            self.loop.call_soon_threadsafe(self._schedule_send)
+        elif arm:
+            self.loop.call_soon_threadsafe(self.loop.call_later, OUTBOX_FLUSH_SECONDS, self._schedule_send)
+
+    def _pending_stream_frame(self, message: dict):
+        """Must hold self._lock. Unsent frame of the same stream, not separated by a status frame."""
+        for frame in reversed(self._frames):
+            if frame["type"] not in STREAM_FRAME_TYPES:
+                return None
+            if frame["type"] == message["type"] and frame.get("agent_name") == message.get("agent_name"):
+                return frame
+        return None
+
+    def _take(self) -> List[dict]:
+        with self._lock:
+            frames, self._frames = self._frames, []
+            self._chars = 0
+            self._armed = False
+        return frames
+
+    def _schedule_send(self):
+        frames = self._take()
+        if frames:
+            task = asyncio.ensure_future(self._send(frames))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, frames: List[dict]):
+        async with self._send_lock:
+            for frame in frames:
+                await self.manager.broadcast_text(encode_frame(frame), self.room_id)
+
+    async def flush(self):
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+        await self._send(self._take())
+
+
 class ConnectionManager:
+    """
+    Room fan-out. Every connection has a bounded send queue drained by its own
+    writer task, so one slow or dead client never delays the rest of the room:
+      • broadcast only enqueues (never awaits a socket)
+      • a send that takes longer than SEND_TIMEOUT_SECONDS, fails, or a queue
+        that overflows SEND_QUEUE_SIZE evicts that consumer
+      • evicted sockets are pruned from active_connections and closed
+    """
+
     def __init__(self):
         self.active_connections: Dict[str, List[Dict]] = {}
+        self.outboxes: Dict[str, RoomOutbox] = {}
+        self.frames_sent    = 0
+        self.frames_dropped = 0
+        self.evictions      = 0
 
-    async def connect(self, websocket: WebSocket, room_id: str, user_name: str):
+    async def connect(self, websocket: WebSocket, room_id: str, user_name: str, user_id: str = None):
         await websocket.accept()
         if room_id not in self.active_connections:
             self.active_connections[room_id] = []
-        self.active_connections[room_id].append(
-            {"websocket": websocket, "user_name": user_name}
-        )
+        connection = {
+            "websocket": websocket,
+            "user_name": user_name,
+            "user_id":   user_id,
+            "queue":     asyncio.Queue(maxsize=SEND_QUEUE_SIZE),
+            "dropped":   0,
+        }
+        connection["writer"] = asyncio.create_task(self._writer(connection, room_id))
+        self.active_connections[room_id].append(connection)
 
     def disconnect(self, websocket: WebSocket, room_id: str):
         if room_id in self.active_connections:
-            self.active_connections[room_id] = [
-                conn
-                for conn in self.active_connections[room_id]
-                if conn["websocket"] != websocket
-            ]
+            remaining = []
+            for conn in self.active_connections[room_id]:
+                if conn["websocket"] != websocket:
+                    remaining.append(conn)
+                elif conn["writer"] is not asyncio.current_task():
+                    conn["writer"].cancel()
+            self.active_connections[room_id] = remaining
+            if not remaining:
+                self.outboxes.pop(room_id, None)
+
+    def outbox(self, room_id: str) -> RoomOutbox:
+        """Returns the room's outbound buffer. Must be called from the event loop."""
+        if room_id not in self.outboxes:
+            self.outboxes[room_id] = RoomOutbox(self, room_id, asyncio.get_running_loop())
+        return self.outboxes[room_id]
 
     async def broadcast_to_room(self, message: dict, room_id: str):
+        await self.broadcast_text(encode_frame(message), room_id)
+
+    async def broadcast_text(self, text: str, room_id: str):
         if room_id not in self.active_connections:
             return
-        for connection in self.active_connections[room_id]:
+        for connection in list(self.active_connections[room_id]):
+            try:
+                connection["queue"].put_nowait(text)
+            except asyncio.QueueFull:
+                connection["dropped"] += 1
+                self.frames_dropped   += 1
+                self._evict(connection, room_id, f"send queue overflow ({SEND_QUEUE_SIZE} frames)")
+
+    async def send_to(self, websocket: WebSocket, message: dict, room_id: str):
+        """Queues a frame for one connection only, ordered with its room broadcasts."""
+        for connection in list(self.active_connections.get(room_id, [])):
+            if connection["websocket"] != websocket:
+                continue
             try:
-                await connection["websocket"].send_json(message)
-            except:
-                pass
+                connection["queue"].put_nowait(encode_frame(message))
+            except asyncio.QueueFull:
+                connection["dropped"] += 1
+                self.frames_dropped   += 1
+                self._evict(connection, room_id, f"send queue overflow ({SEND_QUEUE_SIZE} frames)")
+
+    async def notify_users(self, messages: Dict[str, dict], exclude_room: str = None):
+        """
+        Queues messages[user_id] on every open connection of that user, whichever
+        room it is viewing. Connections in exclude_room are skipped.
+        """
+        for room_id, connections in list(self.active_connections.items()):
+            if room_id == exclude_room:
+                continue
+            for connection in list(connections):
+                message = messages.get(connection["user_id"])
+                if message is None:
+                    continue
+                try:
+                    connection["queue"].put_nowait(encode_frame(message))
+                except asyncio.QueueFull:
+                    connection["dropped"] += 1
+                    self.frames_dropped   += 1
+                    self._evict(connection, room_id, f"send queue overflow ({SEND_QUEUE_SIZE} frames)")
+
+    async def _writer(self, connection: Dict, room_id: str):
+        websocket = connection["websocket"]
+        queue     = connection["queue"]
+        while True:
+            text = await queue.get()
+            try:
+                await asyncio.wait_for(websocket.send_text(text), timeout=SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self._evict(connection, room_id, f"send took longer than {SEND_TIMEOUT_SECONDS:.1f}s")
+                return
+            except Exception as e:
+                self._evict(connection, room_id, f"send failed: {e}")
+                return
+            self.frames_sent += 1
+
+    def _evict(self, connection: Dict, room_id: str, reason: str):
+        """Drops a consumer that cannot keep up. Its receive loop sees the close and cleans up."""
+        if connection not in self.active_connections.get(room_id, []):
+            return
+        print(f"🚫 Evicting {connection['user_name']} from room {room_id}: {reason}")
+        self.evictions += 1
+        self.frames_dropped += connection["queue"].qsize()
+        self.disconnect(connection["websocket"], room_id)
+        asyncio.ensure_future(self._close_quietly(connection["websocket"]))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)   # try again later
+        except Exception:
+            pass
 
     def get_room_users(self, room_id: str) -> List[str]:
         if room_id not in self.active_connections:
             return []
         return [conn["user_name"] for conn in self.active_connections[room_id]]
 
+    def stats(self) -> dict:
+        return {
+            "frames_sent":    self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "evictions":      self.evictions,
+            # Aggregates only: no user identities, even for admins
+            "rooms": {
+                room_id: {
+                    "connections":     len(connections),
+                    "max_queue_depth": max(conn["queue"].qsize() for conn in connections),
+                    "dropped":         sum(conn["dropped"] for conn in connections),
+                }
+                for room_id, connections in self.active_connections.items()
+                if connections
+            },
+        }
+
 
 manager = ConnectionManager()
 
 orchestrator = None
 
 try:
-    groq_key_1 = os.getenv("GROQ_API_KEY_1")
-    if groq_key_1:
-        print("GROQ API Key Loaded")
+    agent_keys = get_key_pool("agents")
+    if agent_keys.size:
+        print(f"GROQ API Keys Loaded ({agent_keys.size})")
         orchestrator = Orchestrator()
         print("Orchestrator Initialized Successfully")
     else:
@@ -190,6 +439,56 @@ def get_available_agents():
     return {"agents": AVAILABLE_AGENTS}
 
 
+@app.get("/api/llm/cache-stats", dependencies=[Depends(get_admin_user)])
+def get_llm_cache_stats():
+    return cache_stats()
+
+
+@app.get("/api/llm/rate-limits", dependencies=[Depends(get_admin_user)])
+def get_llm_rate_limits():
+    return rate_limit_scheduler.stats()
+
+
+@app.get("/api/llm/keys", dependencies=[Depends(get_admin_user)])
+def get_llm_key_stats():
+    return key_pool_stats()
+
+
+@app.get("/api/llm/circuits", dependencies=[Depends(get_admin_user)])
+def get_llm_circuit_stats():
+    return circuit_breaker_stats()
+
+
+@app.get("/api/llm/prompts", dependencies=[Depends(get_admin_user)])
+def get_llm_prompt_stats():
+    return prompt_stats()
+
+
+@app.get("/api/llm/classifier", dependencies=[Depends(get_admin_user)])
+def get_llm_classifier_stats():
+    return classifier_stats()
+
+
+@app.get("/api/rooms/queues", dependencies=[Depends(get_admin_user)])
+def get_room_queue_stats():
+    return {**orchestration_scheduler.stats(), "inbox": room_inboxes.stats()}
+
+
+@app.get("/api/llm/summaries", dependencies=[Depends(get_admin_user)])
+def get_summary_worker_stats():
+    return summary_worker.stats()
+
+
+@app.get("/api/rooms/cache-stats", dependencies=[Depends(get_admin_user)])
+def get_room_cache_stats():
+    return room_cache.stats()
+
+
+@app.get("/api/ws/stats", dependencies=[Depends(get_admin_user)])
+def get_websocket_stats():
+    return manager.stats()
+
+
 @app.post("/api/query", response_model=ConsensusOutput)
 async def process_query(request: QueryRequest):
     if not orchestrator:
@@ -221,6 +520,247 @@ def resolve_agent_id(agent_name: str) -> str | None:
 # WebSocket
 # ─────────────────────────────────────────────
 
+async def push_unread_updates(room_id: str, msg, counts: Dict[str, int]):
+    """Sidebar badges of the room's members connected elsewhere update without polling."""
+    frames = {
+        user_id: {
+            "type":                 "unread_update",
+            "group_id":             room_id,
+            "unread_count":         count,
+            "last_message_content": msg.content,
+            "last_message_time":    serialize_dt(msg.timestamp),
+        }
+        for user_id, count in counts.items()
+    }
+    await manager.notify_users(frames, exclude_room=room_id)
+
+
+def history_frame(msg) -> dict:
+    msg_data = {
+        "type":        msg.sender_type,
+        "sender_id":   msg.sender_id,
+        "sender_name": msg.sender_name,
+        "content":     msg.content,
+        "timestamp":   serialize_dt(msg.timestamp),
+        "historical":  True,
+    }
+    if msg.sender_type == "consensus" and msg.extra_data:
+        try:
+            meta = json.loads(msg.extra_data)
+            msg_data["mode_used"]       = meta.get("mode_used", "")
+            msg_data["agent_responses"] = meta.get("agent_responses", [])
+        except:
+            pass
+    return msg_data
+
+
+async def run_orchestration(job: OrchestrationJob):
+    """
+    Runs one queued orchestration for its room (see app/utils/room_scheduler.py).
+    job.cancel_token is threaded down to every LLM call; once it is cancelled the
+    room gets a "cancelled" frame and nothing is saved.
+    """
+    room_id = job.room_id
+
+    db = SessionLocal()
+    try:
+        hybrid_ctx = build_hybrid_context(db, room_id)
+    finally:
+        db.close()
+
+    conversation_history = hybrid_ctx["conversation_history"]
+    user_query           = job.query
+
+    mode = job.mode
+    if mode is None:
+        # Coalesced burst with mixed routes: route the combined question once
+        mode = (await orchestrator.route_async(user_query, conversation_history))["mode"] or "independent"
+
+    # Execute orchestrator with hybrid context.
+    # Status updates and streamed tokens are produced on a worker thread
+    # and go out through the room's batched outbox.
+    outbox = manager.outbox(room_id)
+
+    def status_callback(msg_text: str):
+        outbox.put({
+            "type":           "typing",
+            "sender_name":    "AI Agents",
+            "status_message": msg_text,
+            "timestamp":      get_utc_now_str(),
+        })
+
+    def stream_callback(token: str):
+        outbox.put({"type": "consensus_stream", "content": token})
+
+    def agent_stream_callback(agent_name: str, token: str):
+        outbox.put({"type": "agent_stream", "agent_name": agent_name, "content": token})
+
+    try:
+        result = await asyncio.to_thread(
+            orchestrator.execute_query,
+            user_query,
+            conversation_history=conversation_history,
+            mode_override=mode,
+            status_callback=status_callback,
+            stream_callback=stream_callback,
+            agent_stream_callback=agent_stream_callback,
+            cancel_token=job.cancel_token,
+        )
+    except OrchestrationCancelled as e:
+        await outbox.flush()
+        await manager.broadcast_to_room(
+            {
+                "type":         "cancelled",
+                "job_id":       job.id,
+                "reason":       e.reason,
+                "tokens_spent": job.cancel_token.tokens_spent,
+                "timestamp":    get_utc_now_str(),
+            },
+            room_id,
+        )
+        raise
+    finally:
+        await outbox.flush()
+
+    agent_responses = result["agent_responses"]
+    final_answer    = result["final_answer"]
+    mode_used       = result["mode_used"]
+
+    # Save consensus
+    metadata = json.dumps({"mode_used": mode_used, "agent_responses": agent_responses})
+    db = SessionLocal()
+    try:
+        saved  = save_message(
+            db=db,
+            group_id=room_id,
+            sender_id="consensus",
+            sender_name="AI Consensus",
+            sender_type="consensus",
+            content=final_answer.strip(),
+            metadata=metadata,
+        )
+        counts = unread_counts(db, room_id)
+    finally:
+        db.close()
+    await push_unread_updates(room_id, saved, counts)
+
+    # Broadcast consensus
+    await manager.broadcast_to_room(
+        {
+            "type":            "consensus",
+            "sender_name":     "AI Consensus",
+            "content":         final_answer.strip(),
+            "mode_used":       mode_used,
+            "agent_responses": agent_responses,
+            "timestamp":       get_utc_now_str(),
+        },
+        room_id,
+    )
+
+
+async def broadcast_queue_update(room_id: str, snapshot: dict):
+    await manager.broadcast_to_room({"type": "queue_update", **snapshot}, room_id)
+
+
+orchestration_scheduler = RoomScheduler(run_orchestration, on_change=broadcast_queue_update)
+
+
+async def process_user_message(room_id: str, item: dict):
+    """
+    Saves, broadcasts and routes one chat message, then queues its orchestration.
+    Runs on the room's inbox task (see app/utils/room_inbox.py), never on the
+    sender's receive loop. The message's arrival was registered with the
+    scheduler on receipt; it is settled here whether or not a job was submitted.
+    """
+    try:
+        await _save_route_and_submit(room_id, item)
+    finally:
+        orchestration_scheduler.settle(room_id, item["user_id"], item["received_at"])
+
+
+async def _save_route_and_submit(room_id: str, item: dict):
+    user_id      = item["user_id"]
+    user_email   = item["user_name"]
+    user_message = item["content"]
+
+    # Save user message
+    db = SessionLocal()
+    try:
+        saved  = save_message(
+            db=db,
+            group_id=room_id,
+            sender_id=user_id,
+            sender_name=user_email,
+            sender_type="user",
+            content=user_message,
+        )
+        counts = unread_counts(db, room_id)
+    finally:
+        db.close()
+    await push_unread_updates(room_id, saved, counts)
+
+    # Broadcast user message
+    await manager.broadcast_to_room(
+        {
+            "type":        "user",
+            "sender_id":   user_id,
+            "sender_name": user_email,
+            "content":     user_message,
+            "timestamp":   get_utc_now_str(),
+        },
+        room_id,
+    )
+
+    if not orchestrator:
+        return
+
+    # Fetch group agents (room cache, no query in the steady state)
+    db = SessionLocal()
+    try:
+        agents = room_cache.get_agents(db, room_id)
+    finally:
+        db.close()
+
+    if not agents:
+        return
+
+    # ── Check if AI is even needed before queueing an orchestration ──
+    db = SessionLocal()
+    try:
+        hybrid_ctx = build_hybrid_context(db, room_id)
+    finally:
+        db.close()
+
+    # One routing decision (gatekeeper + mode), native async, no worker thread
+    route = await orchestrator.route_async(user_message, hybrid_ctx["conversation_history"])
+
+    if not route["invoke"]:
+        print(f"🛑 Gatekeeper blocked AI invocation for user message: '{user_message}'")
+        return
+    print(f"🧭 Routed to {route['mode']} ({route['source']}, confidence {route['confidence']:.2f})")
+
+    if not manager.get_room_users(room_id):
+        return      # everyone left while this message was being routed
+
+    # Queued per room; a burst from this user joins their still-collecting job
+    job = await orchestration_scheduler.submit(
+        room_id, user_id, user_email, user_message, route["mode"], received_at=item["received_at"]
+    )
+    if job is None:
+        await manager.send_to(
+            item["websocket"],
+            {
+                "type":      "queue_full",
+                "content":   "The AI is busy with other questions in this room. Please try again shortly.",
+                "timestamp": get_utc_now_str(),
+            },
+            room_id,
+        )
+
+
+room_inboxes = RoomInboxes(process_user_message)
+
+
 @app.websocket("/api/ws/{room_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str):
     token = websocket.query_params.get("token")
@@ -234,34 +774,21 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
         return
 
     user_email = user.email
-    await manager.connect(websocket, room_id, user_email)
+    await manager.connect(websocket, room_id, user_email, user.id)
 
-    # ── Load previous messages on join ──
+    # ── Replay the newest page on join; older pages on {"type": "load_history"} ──
     db = SessionLocal()
     try:
-        recent_messages = load_recent_messages(db, room_id, limit=50)
-        for msg in recent_messages:
-            msg_data = {
-                "type":        msg.sender_type,
-                "sender_id":   msg.sender_id,
-                "sender_name": msg.sender_name,
-                "content":     msg.content,
-                "timestamp":   serialize_dt(msg.timestamp),
-                "historical":  True,
-            }
-            if msg.sender_type == "consensus" and msg.extra_data:
-                try:
-                    meta = json.loads(msg.extra_data)
-                    msg_data["mode_used"]       = meta.get("mode_used", "")
-                    msg_data["agent_responses"] = meta.get("agent_responses", [])
-                except:
-                    pass
-            try:
-                await websocket.send_json(msg_data)
-            except Exception:
-                return
+        page = load_message_page(db, room_id)
     finally:
         db.close()
+    for msg in page["messages"]:
+        await manager.send_to(websocket, history_frame(msg), room_id)
+    await manager.send_to(
+        websocket,
+        {"type": "history_cursor", "before": page["before"], "has_more": page["has_more"]},
+        room_id,
+    )
 
     # ── Broadcast join ──
     await manager.broadcast_to_room(
@@ -279,155 +806,83 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
             data         = await websocket.receive_text()
             message_data = json.loads(data)
 
-            user_message = message_data.get("message", "").strip()
-            if not user_message:
+            # Control frames are answered inline; only chat messages are queued
+            if message_data.get("type") == "ping":
+                await manager.send_to(websocket, {"type": "pong", "timestamp": get_utc_now_str()}, room_id)
                 continue
 
-            # Save user message
-            db = SessionLocal()
-            try:
-                save_message(
-                    db=db,
-                    group_id=room_id,
-                    sender_id=user.id,
-                    sender_name=user_email,
-                    sender_type="user",
-                    content=user_message,
-                )
-            finally:
-                db.close()
-
-            # Broadcast user message
-            await manager.broadcast_to_room(
-                {
-                    "type":        "user",
-                    "sender_id":   user.id,
-                    "sender_name": user_email,
-                    "content":     user_message,
-                    "timestamp":   get_utc_now_str(),
-                },
-                room_id,
-            )
-
-            if not orchestrator:
+            if message_data.get("type") == "cancel_queued":
+                await orchestration_scheduler.cancel(room_id, message_data.get("job_id"), user.id)
                 continue
 
-            # Fetch group
-            db = SessionLocal()
-            try:
-                from app.db.models import Group as GroupModel
-                group_obj = db.query(GroupModel).filter(GroupModel.id == room_id).first()
-            finally:
-                db.close()
-
-            if not group_obj:
+            if message_data.get("type") == "stop":
+                # Only the sender's own jobs: one when a job_id is given, otherwise all of theirs
+                reason = f"stopped by {user_email}"
+                if message_data.get("job_id"):
+                    await orchestration_scheduler.cancel(room_id, message_data["job_id"], user.id, reason=reason)
+                else:
+                    await orchestration_scheduler.cancel_room(room_id, reason=reason, user_id=user.id)
                 continue
 
-            agents = json.loads(group_obj.agents) if group_obj.agents else []
-            if not agents:
+            if message_data.get("type") == "load_history":
+                db = SessionLocal()
+                try:
+                    page = load_message_page(db, room_id, before=message_data.get("before"))
+                except ValueError:
+                    # Bad cursor: answer with an empty last page so the client stops loading
+                    page = {"messages": [], "before": None, "has_more": False}
+                finally:
+                    db.close()
+                await manager.send_to(
+                    websocket,
+                    {
+                        "type":     "history_page",
+                        "messages": [history_frame(m) for m in page["messages"]],
+                        "before":   page["before"],
+                        "has_more": page["has_more"],
+                    },
+                    room_id,
+                )
                 continue
 
-            # ── Check if AI is even needed before showing typing indicator ──
-            db = SessionLocal()
-            try:
-                hybrid_ctx = build_hybrid_context(db, room_id)
-            finally:
-                db.close()
-
-            conversation_history = hybrid_ctx["conversation_history"]
-
-            # Fast gatekeeper check against human chatter
-            is_needed = await asyncio.to_thread(
-                orchestrator.check_if_ai_needed,
-                user_message,
-                conversation_history
-            )
-            
-            if not is_needed:
-                print(f"🛑 Gatekeeper blocked AI invocation for user message: '{user_message}'")
+            user_message = message_data.get("message", "").strip()
+            if not user_message:
                 continue
 
-            # Execute orchestrator with hybrid context
-            loop = asyncio.get_running_loop()
-            
-            def status_callback(msg_text: str):
-                try:
-                    # Generic status callback uses 'type': 'typing' 
-                    # We check if it's the stream event flag!
-                    # Wait, orchestrator execute_query passes status_callback to stream_callback
-                    # Let's route standard statuses vs raw stream chunks based on content
-                    payload = {
-                        "type":          "typing",
-                        "sender_name":   "AI Agents",
-                        "status_message": msg_text,
-                        "timestamp":     get_utc_now_str(),
-                    }
-                    asyncio.run_coroutine_threadsafe(
-                        manager.broadcast_to_room(payload, room_id), loop
-                    )
-                except Exception:
-                    pass
-
-            def stream_callback(token: str):
-                try:
-                    payload = {
-                        "type": "consensus_stream",
-                        "content": token
-                    }
-                    asyncio.run_coroutine_threadsafe(
-                        manager.broadcast_to_room(payload, room_id), loop
-                    )
-                except Exception:
-                    pass
-
-            result = await asyncio.to_thread(
-                orchestrator.execute_query,
-                user_message,
-                conversation_history=conversation_history,
-                status_callback=status_callback,
-                stream_callback=stream_callback
-            )
-
-            agent_responses = result["agent_responses"]
-            final_answer    = result["final_answer"]
-            mode_used       = result["mode_used"]
-
-            # Save consensus
-            metadata = json.dumps({"mode_used": mode_used, "agent_responses": agent_responses})
-            db = SessionLocal()
-            try:
-                save_message(
-                    db=db,
-                    group_id=room_id,
-                    sender_id="consensus",
-                    sender_name="AI Consensus",
-                    sender_type="consensus",
-                    content=final_answer.strip(),
-                    metadata=metadata,
+            # Processed by the room's inbox task; this loop goes straight back to receiving.
+            # The coalescing window starts now, not when routing finishes.
+            received_at = orchestration_scheduler.arrived(room_id, user.id)
+            accepted = room_inboxes.put(room_id, {
+                "websocket":   websocket,
+                "user_id":     user.id,
+                "user_name":   user_email,
+                "content":     user_message,
+                "received_at": received_at,
+            })
+            if not accepted:
+                orchestration_scheduler.settle(room_id, user.id, received_at)
+                await manager.send_to(
+                    websocket,
+                    {
+                        "type":      "inbox_full",
+                        "content":   "Too many messages are waiting in this room. Please slow down.",
+                        "timestamp": get_utc_now_str(),
+                    },
+                    room_id,
                 )
-            finally:
-                db.close()
-
-            # Broadcast consensus
-            await manager.broadcast_to_room(
-                {
-                    "type":            "consensus",
-                    "sender_name":     "AI Consensus",
-                    "content":         final_answer.strip(),
-                    "mode_used":       mode_used,
-                    "agent_responses": agent_responses,
-                    "timestamp":       get_utc_now_str(),
-                },
-                room_id,
-            )
-
-    except WebSocketDisconnect:
+
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: receive on a socket that was already closed (e.g. evicted)
         manager.disconnect(websocket, room_id)
+        online_users = manager.get_room_users(room_id)
+        if not online_users:
+            # Nobody is left to read the answer
+            await orchestration_scheduler.cancel_room(room_id, reason="last viewer left")
         await manager.broadcast_to_room(
             {
                 "type":         "user_left",
                 "user_name":    user_email,
-                "online_users": manager.get_room_users(room_id),
+                "online_users": online_users,
             },
             room_id,
         )
@@ -1,54 +1,254 @@
 # backend/app/utils/LLM_agent_client.py
 
 import os
-from groq import Groq
+import threading
+import httpx
+from groq import Groq, AsyncGroq
 from typing import Dict, List
 
+from app.utils.completion_cache import cache_lookup, cache_store
+from app.utils.rate_limiter import scheduler, estimate_tokens, estimate_text_tokens, retry_after_seconds
+from app.utils.cancellation import OrchestrationCancelled, check_cancelled, cancellable_sleep
+from app.utils.key_pool import get_key_pool
+from app.utils.retry_policy import (
+    DEFAULT_RETRY_POLICY, CircuitOpenError, classify_error, get_circuit_breaker, record_error,
+)
+
+
+# -------------------------------------------------
+# Agent Configuration (All Groq)
+# -------------------------------------------------
+AGENT_MODELS = {
+    "agent1": {
+        "provider": "groq",
+        "model": "openai/gpt-oss-120b",
+        "fallback": "agent3",       # used when retries are exhausted or the circuit is open
+        "context_window": 131072,   # tokens; context_builder budgets prompts against this + TPM
+    },
+    "agent2": {
+        "provider": "groq",
+        "model": "llama-3.1-8b-instant",
+        "fallback": "agent3",
+        "context_window": 131072,
+    },
+    "agent3": {
+        "provider": "groq",
+        "model": "llama-3.3-70b-versatile",
+        "fallback": "agent1",
+        "context_window": 131072,
+    },
+    "agent4": {
+        "provider": "groq",
+        "model": "llama-3.3-70b-versatile",
+        "fallback": "agent1",
+        "context_window": 131072,
+    },
+    "agent5": {
+        "provider": "groq",
+        "model": "meta-llama/llama-4-scout-17b-16e-instruct",
+        "streaming": True,          # agent5 uses streaming for synthesis
+        "temperature": 0.6,
+        "top_p": 0.95,
+        "fallback": "agent4",
+        "context_window": 131072,
+    },
+}
+
+
+# Every failed call returns a string starting with one of these instead of raising
+FAILED_RESPONSE_PREFIXES = ("Error:", "⚠️ Agent did not respond properly")
+
+
+def is_failed_completion(result: str) -> bool:
+    """True for the client's failure returns (blank, "Error: ...", "⚠️ Agent did not respond ...")."""
+    return not result or not result.strip() or result.startswith(FAILED_RESPONSE_PREFIXES)
+
+
+# Non-streaming agents called with a stream_callback get the first retry's
+# token boost up front, since a streamed reply is not retried once it started
+STREAM_TOKEN_BOOST = 400
+
+
+# -------------------------------------------------
+# Streamed Usage Settlement
+# -------------------------------------------------
+# A streamed response reports no usage up front, so its TPM reservation
+# (prompt + max_tokens) is settled once the stream ends, is closed or fails:
+# with Groq's x_groq usage from the final chunk when present, otherwise with
+# an estimate of the prompt plus the text actually received.
+def _chunk_usage(chunk):
+    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def _chunk_text(chunk) -> str:
+    choices = getattr(chunk, "choices", None)
+    return (choices[0].delta.content or "") if choices else ""
+
+
+class _StreamSettlement:
+    def __init__(self, model_name: str, reserved: int, messages: List[Dict], scope: str):
+        self.model_name = model_name
+        self.reserved   = reserved
+        self.messages   = messages
+        self.scope      = scope
+        self.text       = []
+        self.usage      = None
+        self.settled    = False
+
+    def observe(self, chunk):
+        self.text.append(_chunk_text(chunk))
+        self.usage = _chunk_usage(chunk) or self.usage
+
+    def settle(self):
+        if self.settled:
+            return
+        self.settled = True
+        actual = self.usage or estimate_tokens(self.messages, 0) + estimate_text_tokens("".join(self.text))
+        scheduler.record_usage(self.model_name, self.reserved, actual, scope=self.scope)
+
+
+class _SettledStream:
+    """Iterates a Groq stream and settles its reservation when it ends."""
+
+    def __init__(self, stream, settlement: _StreamSettlement):
+        self._stream    = stream
+        self.settlement = settlement
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                self.settlement.observe(chunk)
+                yield chunk
+        finally:
+            self.settlement.settle()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self.settlement.settle()
+
+
+# -------------------------------------------------
+# Process-wide HTTP Connection Pool
+# -------------------------------------------------
+# Every mode class, the orchestrator, the context builder and the intent
+# classifier used to build their own Groq client, each with its own TLS pool.
+# All Groq clients now share one keep-alive pool (one sync, one async).
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("GROQ_HTTP_MAX_CONNECTIONS", "50")),
+    max_keepalive_connections=int(os.getenv("GROQ_HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=60.0,
+)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+_pool_lock = threading.Lock()
+_shared_http_client = None
+_shared_async_http_client = None
+_groq_clients: Dict[str, Groq] = {}
+_async_groq_clients: Dict[str, AsyncGroq] = {}
+
+
+def get_groq_client(api_key: str) -> Groq:
+    """Returns the process-wide sync Groq client for `api_key`."""
+    global _shared_http_client
+    with _pool_lock:
+        if _shared_http_client is None:
+            _shared_http_client = httpx.Client(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+        if api_key not in _groq_clients:
+            # max_retries=0: retries are owned by RetryPolicy, not the SDK
+            _groq_clients[api_key] = Groq(api_key=api_key, http_client=_shared_http_client, max_retries=0)
+        return _groq_clients[api_key]
+
+
+def get_async_groq_client(api_key: str) -> AsyncGroq:
+    """Returns the process-wide async Groq client for `api_key`."""
+    global _shared_async_http_client
+    with _pool_lock:
+        if _shared_async_http_client is None:
+            _shared_async_http_client = httpx.AsyncClient(limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+        if api_key not in _async_groq_clients:
+            _async_groq_clients[api_key] = AsyncGroq(
+                api_key=api_key, http_client=_shared_async_http_client, max_retries=0
+            )
+        return _async_groq_clients[api_key]
+
+
+async def close_shared_clients():
+    """Closes both shared pools. Called once on application shutdown."""
+    global _shared_http_client, _shared_async_http_client
+    with _pool_lock:
+        sync_client, async_client = _shared_http_client, _shared_async_http_client
+        _shared_http_client = None
+        _shared_async_http_client = None
+        _groq_clients.clear()
+        _async_groq_clients.clear()
+    if sync_client is not None:
+        sync_client.close()
+    if async_client is not None:
+        await async_client.aclose()
+
+
+def bind_agent_stream(agent_stream_callback, agent_name: str):
+    """
+    Turns a mode-level `agent_stream_callback(agent_name, delta)` into the
+    plain `stream_callback(delta)` that get_completion expects.
+    """
+    if agent_stream_callback is None:
+        return None
+    return lambda delta: agent_stream_callback(agent_name, delta)
+
 
 class LLMAgentClient:
     def __init__(self):
         # -----------------------------
-        # Load Groq API Key
+        # Load Groq API Keys (GROQ_API_KEY_1, GROQ_API_KEY_2, ...)
         # -----------------------------
-        self.groq_api_key = os.getenv("GROQ_API_KEY_1")
+        self.key_pool = get_key_pool("agents")
 
-        if not self.groq_api_key:
+        if not self.key_pool.size:
             raise ValueError("❌ GROQ_API_KEY_1 is missing in environment variables!")
 
         # -----------------------------
-        # Initialize Groq Client
+        # Agent Configuration (All Groq)
         # -----------------------------
-        self.groq_client = Groq(api_key=self.groq_api_key)
+        self.models = AGENT_MODELS
 
         # -----------------------------
-        # Agent Configuration (All Groq)
+        # Retry Policy (backoff + per-model circuit breaker)
         # -----------------------------
-        self.models = {
-            "agent1": {
-                "provider": "groq",
-                "model": "openai/gpt-oss-120b",
-            },
-            "agent2": {
-                "provider": "groq",
-                "model": "llama-3.1-8b-instant",
-            },
-            "agent3": {
-                "provider": "groq",
-                "model": "llama-3.3-70b-versatile",
-            },
-            "agent4": {
-                "provider": "groq",
-                "model": "llama-3.3-70b-versatile",
-            },
-            "agent5": {
-                "provider": "groq",
-                "model": "meta-llama/llama-4-scout-17b-16e-instruct",
-                "streaming": True,          # agent5 uses streaming for synthesis
-                "temperature": 0.6,
-                "top_p": 0.95,
-            },
-        }
+        self.retry_policy = DEFAULT_RETRY_POLICY
 
+    # -------------------------------------------------
+    # Single Groq request (key pool + rate limiter)
+    # -------------------------------------------------
+    def _create(self, model_name: str, reserved: int, priority: int = None, **kwargs):
+        """
+        Sends one chat completion on the least-loaded key of the pool.
+        A 429 cools that key down and fails over to the next one.
+        """
+        def _request(key):
+            scheduler.acquire(model_name, reserved, priority, scope=key.label)
+            completion = get_groq_client(key.api_key).chat.completions.create(model=model_name, **kwargs)
+            if kwargs.get("stream"):
+                return _SettledStream(
+                    completion, _StreamSettlement(model_name, reserved, kwargs.get("messages", []), key.label)
+                )
+            usage = getattr(completion, "usage", None)
+            scheduler.record_usage(model_name, reserved, getattr(usage, "total_tokens", None), scope=key.label)
+            return completion
+
+        return self.key_pool.call(
+            _request,
+            on_rate_limit=lambda key, e: scheduler.penalize(model_name, retry_after_seconds(e), scope=key.label),
+        )
+
+    def _fallback_key(self, model_key: str, allow_fallback: bool):
+        fallback = self.models[model_key].get("fallback") if allow_fallback else None
+        if fallback:
+            print(f"↪️ {model_key} unavailable — falling back to {fallback}")
+        return fallback
 
     # -------------------------------------------------
     # Main Completion Function (Non-Streaming Agents)
@@ -59,17 +259,30 @@ class LLMAgentClient:
         messages: List[Dict],
         temperature: float = 0.7,
         max_tokens: int = 400,
-        stream_callback=None
+        stream_callback=None,
+        cache_kind: str = "agent",
+        priority: int = None,
+        allow_fallback: bool = True,
+        cancel_token=None
     ) -> str:
         """
         Calls Groq chat completion safely.
-        Routes agent4 to the streaming handler automatically.
+        Routes agent5 to the streaming handler automatically. Any other agent
+        is streamed too when a `stream_callback` is given, so its tokens can be
+        shown while it is still writing.
 
         Features:
-        - Retries up to 4 times
-        - Fixes blank model replies
-        - Token boost on retries
-        - Clean + scalable retry logic
+        - Exponential backoff with jitter (see app/utils/retry_policy.py)
+          · transport errors, 429s and 5xx are retried, other errors fail fast
+          · blank model replies are retried with a token boost
+        - Per-model circuit breaker; when it is open or retries run out the
+          call falls back once to the model's configured "fallback" key
+        - Opt-in completion cache (policy chosen by `cache_kind`,
+          see app/utils/completion_cache.py)
+        - Per-model RPM/TPM scheduling; `priority` puts interactive calls
+          ahead of background ones (see app/utils/rate_limiter.py)
+        - Cooperative cancellation via `cancel_token` (see app/utils/cancellation.py):
+          raises OrchestrationCancelled instead of returning an answer
         """
 
         # -----------------------------
@@ -77,116 +290,238 @@ class LLMAgentClient:
         # -----------------------------
         if model_key not in self.models:
             return f"Error: Unknown model key '{model_key}'"
+        check_cancelled(cancel_token)
 
         # -----------------------------
         # Route streaming models to streaming handler
         # -----------------------------
         if self.models[model_key].get("streaming"):
-            return self.get_streaming_completion(model_key, messages, max_tokens, stream_callback)
+            return self.get_streaming_completion(
+                model_key, messages, max_tokens, stream_callback, priority, allow_fallback,
+                cancel_token=cancel_token,
+            )
 
         model_name = self.models[model_key]["model"]
 
+        # -----------------------------
+        # Completion cache (opt-in)
+        # -----------------------------
+        cached, cache_key = cache_lookup(cache_kind, model_name, messages, temperature, max_tokens)
+        if cached is not None:
+            if stream_callback:
+                stream_callback(cached)
+            return cached
+
+        # -----------------------------
+        # Live token streaming (per-agent stream to the websocket)
+        # -----------------------------
+        if stream_callback:
+            answered_by = []
+            content = self.get_streaming_completion(
+                model_key, messages, max_tokens + STREAM_TOKEN_BOOST, stream_callback, priority, allow_fallback,
+                temperature=temperature, cancel_token=cancel_token, answered_by=answered_by,
+            )
+            # A fallback model's answer must not be served later as this model's
+            if answered_by == [model_key]:
+                cache_store(cache_key, model_name, content)
+            return content
+
         # -----------------------------
         # Internal helper for Groq call
         # -----------------------------
         def _call_model(token_boost: int = 0):
-            return self.groq_client.chat.completions.create(
-                model=model_name,
+            check_cancelled(cancel_token)
+            completion = self._create(
+                model_name,
+                estimate_tokens(messages, max_tokens + token_boost),
+                priority,
                 messages=messages,
                 temperature=temperature,
                 max_completion_tokens=max_tokens + token_boost,
                 top_p=1,
                 stream=False,
             )
+            if cancel_token is not None:
+                usage = getattr(completion, "usage", None)
+                cancel_token.charge(getattr(usage, "total_tokens", None) or estimate_tokens(messages, 0))
+            # A cancel that arrived during the request discards its answer
+            check_cancelled(cancel_token)
+            return completion
+
+        policy  = self.retry_policy
+        breaker = get_circuit_breaker(model_name)
 
         try:
             print(f"🔄 Requesting {model_key} ({model_name}) via Groq...")
 
             # -----------------------------------------
-            # Retry Attempts (4 total)
+            # Retry Attempts (policy.max_attempts total)
             # -----------------------------------------
             token_boosts = [400, 500, 600, 700]
 
-            for attempt, boost in enumerate(token_boosts, start=1):
-
-                completion = _call_model(token_boost=boost)
+            for attempt in range(1, policy.max_attempts + 1):
+                boost = token_boosts[min(attempt, len(token_boosts)) - 1]
+                check_cancelled(cancel_token)
+                breaker.check()
+
+                try:
+                    completion = _call_model(token_boost=boost)
+                except OrchestrationCancelled:
+                    raise
+                except Exception as e:
+                    kind = classify_error(e)
+                    record_error(breaker, kind)
+                    if not policy.should_retry(kind, attempt):
+                        raise
+                    delay = policy.backoff(attempt, e)
+                    print(f"⚠️ {model_key} {kind} error on attempt {attempt}: {e}. Retrying in {delay:.1f}s...")
+                    cancellable_sleep(delay, cancel_token)
+                    continue
+
+                breaker.record_success()
                 content = completion.choices[0].message.content
 
                 # ✅ If valid response, return immediately
                 if content and content.strip():
                     print(f"✅ {model_key} succeeded on attempt {attempt}")
+                    cache_store(cache_key, model_name, content.strip())
                     return content.strip()
 
-                # ⚠️ Blank response → retry
+                # ⚠️ Blank response → retry with backoff
                 print(
                     f"⚠️ {model_key} returned blank output on attempt {attempt}. Retrying..."
                 )
+                if attempt < policy.max_attempts:
+                    cancellable_sleep(policy.backoff(attempt), cancel_token)
 
             # -----------------------------------------
             # Final fallback if all attempts fail
             # -----------------------------------------
-            print(f"❌ {model_key} failed after 4 attempts (blank output).")
-            return "⚠️ Agent did not respond properly after 4 attempts. Please try again."
+            print(f"❌ {model_key} failed after {policy.max_attempts} attempts (blank output).")
+            fallback = self._fallback_key(model_key, allow_fallback)
+            if fallback:
+                return self.get_completion(
+                    fallback, messages, temperature, max_tokens, stream_callback, cache_kind, priority,
+                    allow_fallback=False, cancel_token=cancel_token,
+                )
+            return f"⚠️ Agent did not respond properly after {policy.max_attempts} attempts. Please try again."
 
+        except OrchestrationCancelled:
+            raise
         except Exception as e:
             error_msg = f"Error with {model_key} ({model_name}): {str(e)}"
             print(f"❌ {error_msg}")
+            fallback = self._fallback_key(model_key, allow_fallback)
+            if fallback:
+                return self.get_completion(
+                    fallback, messages, temperature, max_tokens, stream_callback, cache_kind, priority,
+                    allow_fallback=False, cancel_token=cancel_token,
+                )
             return f"Error: {error_msg}"
 
     # -------------------------------------------------
-    # Streaming Completion Function (agent4 / Qwen)
+    # Streaming Completion Function (agent5 / synthesis)
     # -------------------------------------------------
     def get_streaming_completion(
         self,
         model_key: str,
         messages: List[Dict],
         max_tokens: int = 4096,
-        stream_callback=None
+        stream_callback=None,
+        priority: int = None,
+        allow_fallback: bool = True,
+        temperature: float = None,
+        cancel_token=None,
+        answered_by: list = None
     ) -> str:
         """
-        Handles streaming completions for agent4 (qwen/qwen3-32b).
+        Handles streaming completions (agent5 synthesis, and any agent called
+        with a stream_callback). `temperature` overrides the model's configured
+        streaming temperature.
         Collects all streamed chunks and returns the full response as a string.
+        Failed requests are retried per the retry policy only while nothing has
+        been streamed yet; the fallback model is used under the same condition.
+        A cancelled `cancel_token` closes the stream at the next chunk.
+        `answered_by`, when given, gets the key of the model that produced the
+        returned answer appended to it (the fallback's key after a fallback).
         """
 
         model_config = self.models[model_key]
         model_name = model_config["model"]
+        policy  = self.retry_policy
+        breaker = get_circuit_breaker(model_name)
+        full_response = ""
 
         try:
             print(f"🔄 Requesting {model_key} ({model_name}) via Groq [streaming]...")
 
             kwargs = {
-                "model": model_name,
                 "messages": messages,
-                "temperature": model_config.get("temperature", 0.6),
+                "temperature": temperature if temperature is not None else model_config.get("temperature", 0.6),
                 "max_completion_tokens": max_tokens,
-                "top_p": model_config.get("top_p", 0.95),
+                "top_p": model_config.get("top_p", 0.95 if model_config.get("streaming") else 1),
                 "stream": True,
                 "stop": None,
             }
             if "reasoning_effort" in model_config:
                 kwargs["reasoning_effort"] = model_config["reasoning_effort"]
 
-            completion = self.groq_client.chat.completions.create(**kwargs)
-
-            # Collect all streamed chunks into a single string AND dispatch to callback
-            full_response = ""
-            for chunk in completion:
-                delta = chunk.choices[0].delta.content
-                if delta:
-                    full_response += delta
-                    if stream_callback:
-                        stream_callback(delta)
+            for attempt in range(1, policy.max_attempts + 1):
+                check_cancelled(cancel_token)   # before check(): a cancel must not use up a half-open probe
+                breaker.check()
+                try:
+                    completion = self._create(model_name, estimate_tokens(messages, max_tokens), priority, **kwargs)
+
+                    # Collect all streamed chunks into a single string AND dispatch to callback
+                    try:
+                        for chunk in completion:
+                            if cancel_token is not None and cancel_token.cancelled:
+                                completion.close()   # drop the connection, stop generating
+                                print(f"🛑 {model_key} stream aborted after {len(full_response)} chars")
+                                cancel_token.raise_if_cancelled()
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                full_response += delta
+                                if stream_callback:
+                                    stream_callback(delta)
+                    finally:
+                        if cancel_token is not None:
+                            cancel_token.charge(estimate_tokens(messages, 0) + estimate_text_tokens(full_response))
+                except OrchestrationCancelled:
+                    raise
+                except Exception as e:
+                    kind = classify_error(e)
+                    record_error(breaker, kind)
+                    if full_response or not policy.should_retry(kind, attempt):
+                        raise
+                    delay = policy.backoff(attempt, e)
+                    print(f"⚠️ {model_key} {kind} error on attempt {attempt}: {e}. Retrying in {delay:.1f}s...")
+                    cancellable_sleep(delay, cancel_token)
+                    continue
+
+                breaker.record_success()
+                break
 
             if full_response and full_response.strip():
                 print(f"✅ {model_key} streaming completed successfully.")
+                if answered_by is not None:
+                    answered_by.append(model_key)
                 return full_response.strip()
 
             print(f"❌ {model_key} returned blank streaming output.")
             return "⚠️ Agent did not respond properly. Please try again."
 
+        except OrchestrationCancelled:
+            raise
         except Exception as e:
             error_msg = f"Error with {model_key} ({model_name}): {str(e)}"
             print(f"❌ {error_msg}")
+            fallback = None if full_response else self._fallback_key(model_key, allow_fallback)
+            if fallback:
+                return self.get_streaming_completion(
+                    fallback, messages, max_tokens, stream_callback, priority, allow_fallback=False,
+                    temperature=temperature, cancel_token=cancel_token, answered_by=answered_by,
+                )
             return f"Error: {error_msg}"
 
     # -------------------------------------------------
@@ -209,4 +544,5 @@ class LLMAgentClient:
             return "Error" not in result
 
         except:
-            return False
\ No newline at end of file
+            return False
+
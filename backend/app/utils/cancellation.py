@@ -0,0 +1,75 @@
+# backend/app/utils/cancellation.py
+"""
+Cooperative Cancellation
+────────────────────────
+One CancelToken per orchestration, passed down explicitly:
+
+  main.run_orchestration → Orchestrator.execute_query → mode.run → agents
+                         → LLMAgentClient.get_completion / get_streaming_completion
+
+  • cancel(reason) may be called from any thread (usually the event loop)
+  • the client checks the token before every request, between retries, and
+    on every streamed chunk — a streaming response is closed mid-way
+  • a cancelled call raises OrchestrationCancelled, which every layer lets
+    through (it is never turned into an "Error: ..." string or a fallback)
+  • tokens spent before the cancel are charged to the token so they can be
+    reported / logged
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class OrchestrationCancelled(Exception):
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    def __init__(self):
+        self._event      = threading.Event()
+        self._lock       = threading.Lock()
+        self.reason: Optional[str] = None
+        self.tokens_spent = 0
+        self.calls        = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Returns False when the token was already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            return True
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OrchestrationCancelled(self.reason)
+
+    def sleep(self, seconds: float):
+        """time.sleep that wakes up (and raises) as soon as the token is cancelled."""
+        if self._event.wait(seconds):
+            raise OrchestrationCancelled(self.reason)
+
+    def charge(self, tokens: int):
+        with self._lock:
+            self.tokens_spent += max(0, int(tokens or 0))
+            self.calls        += 1
+
+
+def check_cancelled(cancel_token: Optional[CancelToken]):
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
+
+def cancellable_sleep(seconds: float, cancel_token: Optional[CancelToken]):
+    if cancel_token is None:
+        time.sleep(seconds)
+    else:
+        cancel_token.sleep(seconds)
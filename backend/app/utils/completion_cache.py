@@ -0,0 +1,217 @@
+# backend/app/utils/completion_cache.py
+"""
+Completion Cache
+────────────────
+Content-addressed, persistent cache for Groq chat completions.
+
+  key   = sha256 of (model, messages, temperature, max_tokens, extra params)
+  store = SQLite file (stdlib sqlite3, independent of the app database)
+
+  • TTL          : entries older than LLM_CACHE_TTL_SECONDS are ignored + purged
+  • Size bound   : at most LLM_CACHE_MAX_ENTRIES rows, least-recently-used evicted
+  • Counters     : hits / misses / stores / evictions via stats()
+
+The cache is OPT-IN: nothing is read or written unless LLM_CACHE_ENABLED=1.
+
+Which calls are cached is decided per call kind (see CACHE_POLICIES):
+  "classifier" → gatekeeper + mode classification (temperature 0, always cached)
+  "evaluator"  → LLM-as-judge scoring in app/Evaluation (always cached)
+  "summary"    → context summaries (never cached, input is always new)
+  "agent"      → mode agents + synthesis (cached only when temperature == 0)
+
+Override per kind with e.g. LLM_CACHE_POLICIES="agent=always,summary=never"
+(useful for evaluation_suite.py reruns).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+CACHE_ENABLED     = os.getenv("LLM_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+CACHE_PATH        = os.getenv("LLM_CACHE_PATH", str(Path(__file__).parent.parent.parent / "llm_cache.db"))
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# True → always cache, False → never cache, None → cache only deterministic calls
+CACHE_POLICIES = {
+    "classifier": True,
+    "evaluator":  True,
+    "summary":    False,
+    "agent":      None,
+}
+# ────────────────────────────────────────────────────────────────────────────────
+
+_POLICY_VALUES = {"always": True, "never": False, "deterministic": None}
+
+for _item in filter(None, os.getenv("LLM_CACHE_POLICIES", "").split(",")):
+    _kind, _, _value = _item.partition("=")
+    if _value.strip().lower() in _POLICY_VALUES:
+        CACHE_POLICIES[_kind.strip()] = _POLICY_VALUES[_value.strip().lower()]
+
+
+class CompletionCache:
+    def __init__(self, path: str, ttl_seconds: int = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path        = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                   key         TEXT PRIMARY KEY,
+                   model       TEXT NOT NULL,
+                   content     TEXT NOT NULL,
+                   created_at  REAL NOT NULL,
+                   accessed_at REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_completions_accessed ON completions (accessed_at)")
+        self._conn.commit()
+
+        self.hits      = 0
+        self.misses    = 0
+        self.stores    = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int], **extra) -> str:
+        """Stable hash of everything that influences the completion."""
+        payload = json.dumps(
+            {
+                "model":       model,
+                "messages":    messages,
+                "temperature": temperature,
+                "max_tokens":  max_tokens,
+                "extra":       extra,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, model: str, content: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, content, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            self.stores += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drop expired rows, then least-recently-used rows beyond max_entries."""
+        expired = self._conn.execute(
+            "DELETE FROM completions WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+
+        overflow = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0] - self.max_entries
+        lru = 0
+        if overflow > 0:
+            lru = self._conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            ).rowcount
+
+        self.evictions += expired + lru
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "enabled":   True,
+            "entries":   entries,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "hit_rate":  round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores":    self.stores,
+            "evictions": self.evictions,
+        }
+
+
+# ── Process-wide instance ───────────────────────────────────────────────────────
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Returns the shared cache, or None when caching is disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompletionCache(CACHE_PATH)
+            print(f"💾 Completion cache enabled at {CACHE_PATH}")
+        return _cache
+
+
+def should_cache(kind: str, temperature: float) -> bool:
+    policy = CACHE_POLICIES.get(kind)
+    if policy is None:
+        return temperature == 0
+    return policy
+
+
+def cache_lookup(kind: str, model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int], **extra):
+    """
+    Returns (cached_content, key).
+    cached_content is None on a miss; key is None when this call must not be cached.
+    """
+    cache = get_completion_cache()
+    if cache is None or not should_cache(kind, temperature):
+        return None, None
+    key = CompletionCache.make_key(model, messages, temperature, max_tokens, **extra)
+    content = cache.get(key)
+    if content is not None:
+        print(f"💾 Cache hit [{kind}] for {model}")
+    return content, key
+
+
+def cache_store(key: Optional[str], model: str, content: str):
+    """Stores a successful completion. No-op for uncached calls and error strings."""
+    cache = get_completion_cache()
+    if cache is None or key is None:
+        return
+    if not content or content.startswith("Error") or content.startswith("⚠️"):
+        return
+    cache.set(key, model, content)
+
+
+def cache_stats() -> dict:
+    cache = get_completion_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
@@ -8,28 +8,64 @@ Hybrid Context Memory
 Final context fed to AI:
   ┌──────────────────────────────────────────┐
   │  SUMMARY (compressed older history)      │
-  │  + RECENT 15 verbatim messages           │
+  │  + up to RECENT 15 verbatim messages     │
   └──────────────────────────────────────────┘
 
-Summary regenerates every SUMMARY_TRIGGER new messages beyond the recent window.
+Both parts share one token budget derived from the tightest model the context
+is sent to (context window and TPM limit from LLMAgentClient.models). Newest
+messages are kept first; oversized messages are elided in the middle, so a
+pasted code block cannot push the prompt past a model's limit.
+
+Summary is updated incrementally: once SUMMARY_TRIGGER messages beyond the
+recent window have arrived since ConversationSummary.last_message_id, only
+those messages (keyset query on timestamp, id) are folded into the existing
+summary. Prompt size is bounded by MAX_SUMMARY_TOKENS + the previous summary,
+so summarization cost does not grow with group age.
+
+Summarization never runs on the request path: build_hybrid_context only asks
+the background SummaryWorker to check the group and returns right away with
+the latest stored summary. Requests for a group already waiting in the queue
+are deduplicated.
 """
 
 import uuid
 import re
+import asyncio
+import threading
 from datetime import datetime
+from typing import Optional
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
 from app.db.models import Message as MessageModel, ConversationSummary
-from app.utils.LLM_agent_client import LLMAgentClient
+from app.db.room_cache import room_cache
+from app.utils.LLM_agent_client import LLMAgentClient, AGENT_MODELS, is_failed_completion
+from app.utils.rate_limiter import (
+    PRIORITY_BACKGROUND, MODEL_LIMITS, DEFAULT_LIMITS, CHARS_PER_TOKEN, estimate_text_tokens,
+)
 
 # ── Config ──────────────────────────────────────────────────────────────────────
-RECENT_WINDOW       = 15     # verbatim messages always shown to AI
+RECENT_WINDOW       = 15     # max verbatim messages shown to AI (the token budget may keep fewer)
 SUMMARY_TRIGGER     = 10     # generate a new summary after every N summarizable messages
-MAX_SUMMARY_CHARS   = 6000   # max characters of conversation text sent for summarization
-                             # ~4 chars/token → ~1500 tokens of content
-                             # leaves room for prompt overhead within Qwen's 6000 TPM limit
+MAX_SUMMARY_TOKENS  = 1500   # max tokens of new conversation text folded in per update
+                             # leaves room for prompt overhead within the 6000 TPM limit
+CONTEXT_BUDGET_SHARE = 0.4   # share of the tightest model's per-request limit given to context
+MAX_MESSAGE_SHARE    = 0.5   # one message may use at most this share of the context budget
+LINE_OVERHEAD_TOKENS = 4     # "sender: " prefix + newline per context line
+MAX_DELTA_MESSAGES  = 50     # max messages folded in per update; a backlog catches up over several
 # ────────────────────────────────────────────────────────────────────────────────
 
-_llm_client = LLMAgentClient()
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+
+def _get_llm_client() -> LLMAgentClient:
+    """Built on first summary, so importing this module needs no API keys."""
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            _llm_client = LLMAgentClient()
+        return _llm_client
 
 # Fallback model order for summarization
 # agent5 (Llama Scout) or agent4 (Llama 70B)
@@ -38,89 +74,263 @@ _SUMMARY_MODEL_FALLBACK = ["agent5", "agent4", "agent1"]
 
 # ── Public API ───────────────────────────────────────────────────────────────────
 
-def build_hybrid_context(db: Session, group_id: str) -> dict:
+def build_hybrid_context(db: Session, group_id: str, model_keys: list = None) -> dict:
     """
+    `model_keys` are the agents the context will be sent to (default: all).
+
     Returns:
         {
             "conversation_history": [...],   # list of dicts for orchestrator
             "context_str":          "...",   # formatted string for prompt injection
+            "context_tokens":       int,     # estimated tokens of the context
         }
     """
-    # 1. Maybe regenerate summary
-    _maybe_update_summary(db, group_id)
+    # 1. Maybe regenerate summary (background worker, never blocks this call)
+    if not summary_worker.request(group_id):
+        _maybe_update_summary(db, group_id)   # no worker running (scripts) → inline
 
-    # 2. Fetch recent verbatim messages
-    recent_msgs = _get_recent_messages(db, group_id, limit=RECENT_WINDOW)
+    # 2. Fetch recent verbatim messages (room cache, no query in the steady state)
+    recent_msgs = room_cache.get_recent_messages(db, group_id, limit=RECENT_WINDOW)
 
-    # 3. Fetch stored summary
-    summary_row = db.query(ConversationSummary).filter(
-        ConversationSummary.group_id == group_id
-    ).first()
+    # 3. Fetch stored summary (room cache)
+    summary_text = room_cache.get_summary(db, group_id)
 
-    # 4. Build conversation_history list for orchestrator
+    # 4. Fit summary + newest messages into the token budget
+    budget = context_token_budget(model_keys)
+    summary_text, recent_lines, used = _fit_to_budget(summary_text, recent_msgs, budget)
+
+    # 5. Build conversation_history list for orchestrator
     conversation_history = []
 
-    if summary_row and summary_row.summary_text:
+    if summary_text:
         conversation_history.append({
             "role":    "assistant",
             "name":    "Context Summary",
-            "content": f"[Summary of earlier conversation]: {summary_row.summary_text}"
+            "content": f"[Summary of earlier conversation]: {summary_text}"
         })
 
-    for msg in recent_msgs:
+    for msg, content in recent_lines:
         if msg.sender_type == "user":
             conversation_history.append({
                 "role":    "user",
                 "name":    msg.sender_name,
-                "content": msg.content
+                "content": content
             })
         elif msg.sender_type == "consensus":
             conversation_history.append({
                 "role":    "assistant",
                 "name":    "AI Consensus",
-                "content": msg.content
+                "content": content
             })
 
-    # 5. Build context_str for direct prompt injection
+    # 6. Build context_str for direct prompt injection
     parts = []
-    if summary_row and summary_row.summary_text:
-        parts.append(f"[Earlier Conversation Summary]:\n{summary_row.summary_text}")
-    if recent_msgs:
+    if summary_text:
+        parts.append(f"[Earlier Conversation Summary]:\n{summary_text}")
+    if recent_lines:
         parts.append("[Recent Messages]:")
-        for msg in recent_msgs:
-            parts.append(f"{msg.sender_name}: {msg.content}")
+        for msg, content in recent_lines:
+            parts.append(f"{msg.sender_name}: {content}")
     context_str = "\n".join(parts)
 
     return {
         "conversation_history": conversation_history,
         "context_str":          context_str,
+        "context_tokens":       used,
     }
 
 
+def context_token_budget(model_keys: list = None) -> int:
+    """
+    Tokens of context every model in `model_keys` can take in one request:
+    CONTEXT_BUDGET_SHARE of min(context window, TPM limit) of the tightest model.
+    """
+    budgets = []
+    for model_key in model_keys or AGENT_MODELS:
+        config = AGENT_MODELS[model_key]
+        tpm    = MODEL_LIMITS.get(config["model"], DEFAULT_LIMITS)["tpm"]
+        limit  = min(config.get("context_window", tpm), tpm)
+        budgets.append(int(limit * CONTEXT_BUDGET_SHARE))
+    return min(budgets)
+
+
+# ── Background Worker ────────────────────────────────────────────────────────────
+
+class SummaryWorker:
+    """
+    Single asyncio task that runs _maybe_update_summary off the request path.
+      • request() is thread-safe and returns immediately
+      • a group already waiting in the queue is not queued twice
+      • each job runs in a worker thread with its own DB session
+    """
+
+    def __init__(self):
+        self._loop    = None
+        self._queue   = None
+        self._task    = None
+        self._pending = set()
+        self._lock    = threading.Lock()
+        self.completed = 0
+        self.deduped   = 0
+        self.failed    = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Starts the worker on the running event loop (called from the app lifespan)."""
+        if self.running:
+            return
+        self._loop  = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task  = asyncio.create_task(self._run())
+        print("🧠 Summary worker started.")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request(self, group_id: str) -> bool:
+        """Queues a summary check for `group_id`. Returns False when the worker is not running."""
+        if not self.running:
+            return False
+        with self._lock:
+            if group_id in self._pending:
+                self.deduped += 1
+                return True
+            self._pending.add(group_id)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, group_id)
+        return True
+
+    async def _run(self):
+        while True:
+            group_id = await self._queue.get()
+            with self._lock:
+                # Released before the job runs: messages arriving meanwhile queue a new check
+                self._pending.discard(group_id)
+            try:
+                await asyncio.to_thread(self._update, group_id)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️  Background summary for group {group_id[:8]} failed: {e}")
+
+    @staticmethod
+    def _update(group_id: str):
+        db = SessionLocal()
+        try:
+            _maybe_update_summary(db, group_id)
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = len(self._pending)
+        return {
+            "running":   self.running,
+            "queued":    queued,
+            "completed": self.completed,
+            "deduped":   self.deduped,
+            "failed":    self.failed,
+        }
+
+
+summary_worker = SummaryWorker()
+
+
 # ── Internal Helpers ─────────────────────────────────────────────────────────────
 
-def _get_recent_messages(db: Session, group_id: str, limit: int):
-    msgs = (
-        db.query(MessageModel)
-        .filter(MessageModel.group_id == group_id)
-        .order_by(MessageModel.timestamp.desc())
-        .limit(limit)
-        .all()
-    )
-    msgs.reverse()
-    return msgs
+def _message_tokens(msg) -> int:
+    """Token count cached on the row at save time; estimated for rows saved before that."""
+    if msg.token_count is not None:
+        return msg.token_count
+    return estimate_text_tokens(msg.content)
 
 
-def _get_total_message_count(db: Session, group_id: str) -> int:
-    return (
-        db.query(MessageModel)
-        .filter(
-            MessageModel.group_id == group_id,
-            MessageModel.sender_type.in_(["user", "consensus"])
-        )
-        .count()
+def _elide(text: str, max_tokens: int) -> str:
+    """Keeps the head and tail of `text` within ~max_tokens, marking what was cut."""
+    keep = max(max_tokens, 1) * CHARS_PER_TOKEN
+    if len(text) <= keep:
+        return text
+    head, tail = text[: keep * 2 // 3], text[-(keep // 3):] if keep >= 3 else ""
+    elided     = estimate_text_tokens(text) - max_tokens
+    return f"{head}\n[... ~{elided} tokens elided ...]\n{tail}"
+
+
+def _fit_to_budget(summary_text: str, recent_msgs: list, budget: int):
+    """
+    Returns (summary_text, [(msg, content), ...] oldest first, tokens used).
+    The summary gets at most half the budget, then the newest messages are
+    added until the budget runs out. The newest message is always kept.
+    """
+    summary_tokens = estimate_text_tokens(summary_text)
+    if summary_tokens > budget // 2:
+        summary_text   = _elide(summary_text, budget // 2)
+        summary_tokens = budget // 2
+
+    remaining   = budget - summary_tokens
+    message_cap = int(budget * MAX_MESSAGE_SHARE)
+    lines, elided = [], 0
+
+    for msg in reversed(recent_msgs):
+        content = msg.content
+        tokens  = _message_tokens(msg)
+        if tokens > message_cap:
+            content, tokens = _elide(content, message_cap), message_cap
+            elided += 1
+        tokens += LINE_OVERHEAD_TOKENS
+        if tokens > remaining:
+            if lines:
+                break
+            content = _elide(content, max(remaining - LINE_OVERHEAD_TOKENS, 1))
+            tokens  = remaining
+            elided += 1
+        lines.append((msg, content))
+        remaining -= tokens
+
+    lines.reverse()
+    used = budget - remaining
+    print(f"🧮 Context: ~{used}/{budget} tokens — summary ~{summary_tokens}, "
+          f"{len(lines)}/{len(recent_msgs)} recent messages ({elided} elided)")
+    return summary_text, lines, used
+
+
+def _messages_after_query(db: Session, group_id: str, last_message_id: str):
+    """Summarizable messages strictly after `last_message_id`, keyset on (timestamp, id)."""
+    query = db.query(MessageModel).filter(
+        MessageModel.group_id == group_id,
+        MessageModel.sender_type.in_(["user", "consensus"])
     )
 
+    anchor = db.get(MessageModel, last_message_id) if last_message_id else None
+    if anchor is not None:
+        query = query.filter(or_(
+            MessageModel.timestamp > anchor.timestamp,
+            and_(MessageModel.timestamp == anchor.timestamp, MessageModel.id > anchor.id),
+        ))
+    return query
+
+
+def _get_messages_after(db: Session, group_id: str, last_message_id: str, limit: int):
+    """
+    Keyset page of summarizable messages strictly after `last_message_id`,
+    oldest first. Ordered by (timestamp, id) so equal timestamps stay stable.
+    """
+    query = _messages_after_query(db, group_id, last_message_id)
+    return query.order_by(MessageModel.timestamp.asc(), MessageModel.id.asc()).limit(limit).all()
+
+
+def _count_messages_after(db: Session, group_id: str, last_message_id: str, limit: int) -> int:
+    """Same messages as _get_messages_after, counted up to `limit` by id only (no content loaded)."""
+    query = _messages_after_query(db, group_id, last_message_id)
+    return query.with_entities(MessageModel.id).limit(limit).count()
+
 
 def _truncate_to_char_limit(text: str, limit: int) -> str:
     """
@@ -144,73 +354,59 @@ def _truncate_to_char_limit(text: str, limit: int) -> str:
 def _maybe_update_summary(db: Session, group_id: str):
     """
     Trigger condition:
-        messages not yet summarized (excluding recent window) >= SUMMARY_TRIGGER
+        messages after last_message_id (excluding recent window) >= SUMMARY_TRIGGER
+    Checked with an id-only count first; message content is only read once
+    the trigger fires, and then only that delta, never the whole history.
     """
-    total = _get_total_message_count(db, group_id)
-
-    summary_row      = db.query(ConversationSummary).filter(
+    summary_row = db.query(ConversationSummary).filter(
         ConversationSummary.group_id == group_id
     ).first()
 
-    messages_covered = summary_row.messages_covered if summary_row else 0
-    unsummarized     = total - messages_covered
-    summarizable     = unsummarized - RECENT_WINDOW   # never summarize the recent window
+    last_message_id = summary_row.last_message_id if summary_row else None
 
-    print(f"📊 [{group_id[:8]}] total={total} covered={messages_covered} "
-          f"unsummarized={unsummarized} summarizable={summarizable} trigger={SUMMARY_TRIGGER}")
+    # never summarize the recent window
+    new_count = _count_messages_after(db, group_id, last_message_id, SUMMARY_TRIGGER + RECENT_WINDOW)
+    print(f"📊 [{group_id[:8]}] new since summary={new_count} "
+          f"summarizable={max(0, new_count - RECENT_WINDOW)} trigger={SUMMARY_TRIGGER}")
 
-    if summarizable < SUMMARY_TRIGGER:
+    if new_count < SUMMARY_TRIGGER + RECENT_WINDOW:
         print(f"⏭️  Summary not triggered yet "
-              f"(need {SUMMARY_TRIGGER - summarizable} more messages).")
+              f"(need {SUMMARY_TRIGGER + RECENT_WINDOW - new_count} more messages).")
         return
 
-    print(f"📝 Triggering summary for group {group_id[:8]} ...")
-
-    # Fetch all messages except the recent window
-    all_msgs = (
-        db.query(MessageModel)
-        .filter(
-            MessageModel.group_id == group_id,
-            MessageModel.sender_type.in_(["user", "consensus"])
-        )
-        .order_by(MessageModel.timestamp.asc())
-        .all()
-    )
+    delta_msgs   = _get_messages_after(db, group_id, last_message_id, MAX_DELTA_MESSAGES + RECENT_WINDOW)
+    summarizable = delta_msgs[:-RECENT_WINDOW]
 
-    msgs_to_summarize = (
-        all_msgs[:-RECENT_WINDOW] if len(all_msgs) > RECENT_WINDOW else all_msgs
-    )
-
-    if not msgs_to_summarize:
-        print("⚠️  No messages to summarize.")
-        return
+    print(f"📝 Triggering summary for group {group_id[:8]} ...")
 
-    convo_text = "\n".join([
-        f"{m.sender_name}: {m.content}"
-        for m in msgs_to_summarize
-    ])
+    # Bound the prompt: fold in messages oldest-first until MAX_SUMMARY_TOKENS.
+    # Whatever does not fit stays after last_message_id for the next update.
+    msgs_to_summarize, lines, used_tokens = [], [], 0
+    for m in summarizable:
+        tokens = _message_tokens(m) + LINE_OVERHEAD_TOKENS
+        if msgs_to_summarize and used_tokens + tokens > MAX_SUMMARY_TOKENS:
+            break
+        lines.append(f"{m.sender_name}: {m.content}")
+        msgs_to_summarize.append(m)
+        used_tokens += tokens
 
-    # ── Truncation removed: Llama-4-Scout has a high token limit ────────────
-    # original_chars = len(convo_text)
-    # convo_text     = _truncate_to_char_limit(convo_text, MAX_SUMMARY_CHARS)
-    # if len(convo_text) < original_chars:
-    #     print(f"✂️  Conversation truncated: {original_chars} → {len(convo_text)} chars "
-    #           f"to stay within token limit.")
+    convo_text = _truncate_to_char_limit("\n".join(lines), MAX_SUMMARY_TOKENS * CHARS_PER_TOKEN)
 
     existing_summary = summary_row.summary_text if summary_row else ""
     new_summary      = _generate_summary(convo_text, existing_summary)
 
-    if not new_summary or "Error" in new_summary:
-        print(f"⚠️  Summary generation failed: {new_summary}")
+    if new_summary is None:
+        print("⚠️  Summary generation failed: all summary models failed.")
         return
 
     # Upsert
     if summary_row:
         summary_row.summary_text      = new_summary
-        summary_row.messages_covered  = len(msgs_to_summarize)
+        summary_row.messages_covered  = (summary_row.messages_covered or 0) + len(msgs_to_summarize)
         summary_row.last_message_id   = msgs_to_summarize[-1].id
         summary_row.updated_at        = datetime.utcnow()
-        print(f"✅ Summary updated — now covers {len(msgs_to_summarize)} messages.")
+        print(f"✅ Summary updated — folded in {len(msgs_to_summarize)} messages, "
+              f"now covers {summary_row.messages_covered}.")
     else:
         db.add(ConversationSummary(
             id               = str(uuid.uuid4()),
@@ -222,12 +418,14 @@ def _maybe_update_summary(db: Session, group_id: str):
         print(f"✅ Summary created — covers {len(msgs_to_summarize)} messages.")
 
     db.commit()
+    room_cache.record_summary(group_id, new_summary)
 
 
-def _generate_summary(conversation_text: str, existing_summary: str = "") -> str:
+def _generate_summary(conversation_text: str, existing_summary: str = "") -> Optional[str]:
     """
     Call LLM to produce a compressed context summary.
     Tries models in fallback order if one hits rate limits or fails.
+    Returns None when every model failed.
     """
 
     prior_section = ""
@@ -261,13 +459,16 @@ Be dense and factual. No filler. Write in third-person narrative style."""
     # Try each model in fallback order
     for model_key in _SUMMARY_MODEL_FALLBACK:
         print(f"📝 Attempting summary with {model_key}...")
-        result = _llm_client.get_completion(model_key, messages, max_tokens=600)
+        result = _get_llm_client().get_completion(
+            model_key, messages, max_tokens=600, cache_kind="summary", priority=PRIORITY_BACKGROUND
+        )
 
-        # Success: no error and no rate limit message
-        if result and "Error" not in result and "rate_limit_exceeded" not in result:
+        # The client signals failure by its return prefix; the summary text itself
+        # may well mention errors or rate limits
+        if not is_failed_completion(result):
             print(f"✅ Summary generated using {model_key}.")
             return result
 
         print(f"⚠️  {model_key} failed for summary, trying next fallback...")
 
-    return "Error: All summary models failed."
\ No newline at end of file
+    return None
\ No newline at end of file
@@ -1,28 +1,46 @@
 # backend/app/utils/intent_classifier.py
-from groq import Groq
+import hashlib
+import json
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Optional
 
-class IntentClassifier:
-    def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.model = "llama-3.3-70b-versatile"
-    
-    def should_invoke_ai(self, user_query: str, context: str = "") -> bool:
-        """
-        Acts as a zero-latency Gatekeeper.
-        Analyzes the human group chat message to decide if AI orchestration is needed.
-        """
-        # Fast-lane Regex bypass to save API tokens
-        _q = user_query.strip().lower()
-        if len(_q) < 3:
-            return False
-            
-        # Hardcoded action keywords that instantly trigger AI response without wasting tokens on 8B Gatekeeper
-        action_keywords = ["@ai", "@agent", "ai?", "debate", "explain", "compare", "write", "list", "summarize"]
-        if any(_q.startswith(kw) for kw in action_keywords):
-            return True
+from app.utils.LLM_agent_client import get_groq_client, get_async_groq_client
+from app.utils.completion_cache import cache_lookup, cache_store
+from app.utils.key_pool import get_key_pool
+from app.utils.local_classifier import LocalClassifier, mode_examples, quoted_examples
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+# Local classifier decides when at least this confident; otherwise the LLM is asked
+LOCAL_GATE_THRESHOLD = float(os.getenv("LOCAL_GATE_THRESHOLD", "0.9"))
+LOCAL_MODE_THRESHOLD = float(os.getenv("LOCAL_MODE_THRESHOLD", "0.8"))
+# A wrong local NO silently ignores the message, so NO needs more confidence than YES.
+# Short messages ("yes", "go ahead") and replies to the AI depend on the chat
+# context, which the local models never see; those always go to the LLM
+LOCAL_GATE_NO_THRESHOLD = float(os.getenv("LOCAL_GATE_NO_THRESHOLD", "0.98"))
+LOCAL_MIN_WORDS      = 4
+# Online learning trains the local models on raw chat text labelled by the LLM,
+# so it is opt-in and capped per process (replaying the decision log needs it too)
+ONLINE_LEARNING_ENABLED = os.getenv("CLASSIFIER_ONLINE_LEARNING", "0").lower() in ("1", "true", "yes")
+ONLINE_LEARNING_MAX  = int(os.getenv("CLASSIFIER_ONLINE_LEARNING_MAX", "2000"))
+DECISION_LOG_PATH    = os.getenv(
+    "CLASSIFIER_DECISION_LOG", str(Path(__file__).parent.parent.parent / "classifier_decisions.jsonl")
+)
+DECISION_LOG_REPLAY  = 5000   # newest LLM decisions replayed into the local models at startup
+# The log stores raw chat text, so it is opt-in; it keeps only LLM-labelled
+# decisions and is compacted to the newest DECISION_LOG_REPLAY entries once it
+# grows DECISION_LOG_SLACK past that
+DECISION_LOG_ENABLED = os.getenv("CLASSIFIER_LOG_QUERIES", "0").lower() in ("1", "true", "yes")
+DECISION_LOG_SLACK   = 500
+ROUTE_MEMO_SIZE      = 1024   # routing decisions memoized per (normalized query, context fingerprint)
+# ────────────────────────────────────────────────────────────────────────────────
 
-        system_prompt = """You are an invisible AI eavesdropper monitoring a human group chat.
+VALID_MODES = ["independent", "support", "opposition"]
+
+GATEKEEPER_PROMPT = """You are an invisible AI eavesdropper monitoring a human group chat.
 Your ONLY job is to decide if the AI pipeline needs to run for the latest message.
 
 STRICT RULES
@@ -42,35 +60,7 @@ Reply "NO" if:
 
 Return EXACTLY ONE WORD: either YES or NO. Nothing else."""
 
-        try:
-            context_prefix = f"Recent Chat History:\n{context}\n\n" if context else ""
-
-            # We use an ultra-fast model or our default fast model for this gatekeeper
-            response = self.client.chat.completions.create(
-                model=self.model, # using versatile model due to 8b rate limits
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"{context_prefix}Decide if this LAST message needs AI generation: '{user_query}'"}
-                ],
-                temperature=0.0,
-                max_tokens=5
-            )
-            
-            answer = response.choices[0].message.content.strip().upper()
-            return "YES" in answer
-        except Exception as e:
-            print(f"❌ Gatekeeper Error: {e}")
-            return True  # If gatekeeper fails, default to YES so we don't accidentally ignore real queries
-
-    def classify(self, user_query: str, context: str = "") -> str:
-        """
-        Classifies user intent into one of three multi-agent orchestration modes:
-        - independent (Comparison Mode): Parallel diverse perspectives
-        - support (Supplement Mode): Sequential verification and enrichment
-        - opposition (Debate Mode): Adversarial fact-checking and critique
-        """
-        
-        system_prompt = """You are the Intent Classification Engine for the Multi-Agent AI Collaboration Platform.
+CLASSIFIER_PROMPT = """You are the Intent Classification Engine for the Multi-Agent AI Collaboration Platform.
 Your task is to analyze user queries and route them to the optimal multi-agent orchestration mode.
 
 ## THREE ORCHESTRATION MODES:
@@ -226,26 +216,487 @@ Respond with EXACTLY ONE WORD (lowercase): independent, support, or opposition
 
 No explanation, no punctuation, just the mode name."""
 
+# Gatekeeper + mode classification in one request (see IntentClassifier.route)
+ROUTE_PROMPT = (
+    GATEKEEPER_PROMPT.rsplit("Return EXACTLY", 1)[0]
+    + "If AI generation is needed, also pick the orchestration mode for the message.\n\n"
+    + CLASSIFIER_PROMPT[CLASSIFIER_PROMPT.index("## THREE ORCHESTRATION MODES"):CLASSIFIER_PROMPT.index("## RESPONSE FORMAT")]
+    + "## RESPONSE FORMAT:\n"
+    "Respond with EXACTLY ONE WORD (lowercase): none (no AI generation needed), "
+    "independent, support, or opposition.\n\n"
+    "No explanation, no punctuation, just that word."
+)
+
+
+# Human-to-human chatter, extra NO examples for the local gatekeeper
+CHATTER_EXAMPLES = [
+    "hey guys", "hi all", "good night everyone", "see you tomorrow", "thanks!",
+    "thank you so much", "haha", "lmao", "yes", "no", "nope", "sure", "okay cool",
+    "nice", "great job", "brb", "on my way", "me too", "same here", "agreed",
+    "sounds like a plan", "what time are we meeting?", "where should we meet?",
+    "did you get my message?", "call me later", "can you send me the file?",
+    "I'll be late", "let's meet at 5", "who's coming tonight?", "congrats!",
+    # questions meant for the other humans in the room
+    "are you coming tonight?", "when are you free?", "who has the keys?",
+    "what time does it start?", "is everyone here?", "did anyone see my charger?",
+    "are we still on for lunch?", "how was your weekend?", "where are you guys?",
+    "when do you land?", "did you finish your part?", "can someone grab snacks?",
+]
+
+
+# ---------------------------------------------------------------------------
+# Local models + decision log
+# ---------------------------------------------------------------------------
+_models      = None
+_models_lock = threading.Lock()
+_log_lock    = threading.Lock()
+_log_lines   = 0      # entries in the decision log; counted at replay, bumped per write
+_learned     = 0      # LLM labels learned online by this process, capped at ONLINE_LEARNING_MAX
+_decisions   = {
+    "gate": {"fast_lane": 0, "local": 0, "llm": 0},
+    "mode": {"local": 0, "llm": 0},
+}
+
+
+def _gatekeeper_seed():
+    yes_block = GATEKEEPER_PROMPT.split('Reply "YES" if:', 1)[1].split('Reply "NO" if:', 1)[0]
+    no_block  = GATEKEEPER_PROMPT.split('Reply "NO" if:', 1)[1].split("Return EXACTLY", 1)[0]
+    pairs  = [(text, "yes") for text in quoted_examples(yes_block)]
+    pairs += [(text, "yes") for text, _ in mode_examples(CLASSIFIER_PROMPT, VALID_MODES)]
+    pairs += [(text, "no") for text in quoted_examples(no_block) + CHATTER_EXAMPLES]
+    return pairs
+
+
+def _logged_decisions():
+    """Newest LLM decisions from the log as (kind, query, label)."""
+    global _log_lines
+    if not DECISION_LOG_ENABLED:
+        return []
+    try:
+        with open(DECISION_LOG_PATH, encoding="utf-8") as f:
+            _log_lines = 0
+            lines = deque(maxlen=DECISION_LOG_REPLAY)
+            for line in f:
+                _log_lines += 1
+                lines.append(line)
+    except FileNotFoundError:
+        return []
+    decisions = []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if entry.get("source") == "llm" and entry.get("query"):
+            decisions.append((entry["kind"], entry["query"], entry["label"]))
+    return decisions
+
+
+def _compact_decision_log():
+    """Must hold _log_lock. Rewrites the log with its newest DECISION_LOG_REPLAY entries."""
+    global _log_lines
+    with open(DECISION_LOG_PATH, encoding="utf-8") as f:
+        lines = deque(f, maxlen=DECISION_LOG_REPLAY)
+    tmp_path = DECISION_LOG_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(tmp_path, DECISION_LOG_PATH)
+    _log_lines = len(lines)
+
+
+def _local_models():
+    """(gatekeeper, mode router), trained once per process."""
+    global _models
+    with _models_lock:
+        if _models is None:
+            started = time.perf_counter()
+            gate   = LocalClassifier(["yes", "no"]).fit(_gatekeeper_seed())
+            router = LocalClassifier(VALID_MODES).fit(mode_examples(CLASSIFIER_PROMPT, VALID_MODES))
+            if ONLINE_LEARNING_ENABLED:
+                for kind, query, label in _logged_decisions():
+                    (gate if kind == "gate" else router).learn(query, label)
+            _models = (gate, router)
+            print(f"🧠 Local classifier trained on {gate.examples} gate + {router.examples} mode "
+                  f"examples in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return _models
+
+
+def _record_decision(kind: str, query: str, label: str, source: str, confidence: float = None,
+                     logged: bool = True):
+    global _log_lines
+    with _log_lock:
+        _decisions[kind][source] += 1
+        # Only LLM labels teach the local models anything on replay
+        if source != "llm" or not logged or not DECISION_LOG_ENABLED:
+            return
+        try:
+            with open(DECISION_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "ts": time.time(), "kind": kind, "query": query, "label": label, "source": source,
+                }, ensure_ascii=False) + "\n")
+            _log_lines += 1
+            if _log_lines > DECISION_LOG_REPLAY + DECISION_LOG_SLACK:
+                _compact_decision_log()
+        except OSError as e:
+            print(f"⚠️ Could not write classifier decision log: {e}")
+
+
+def _learn_decision(model: LocalClassifier, kind: str, query: str, label: str, context_free: bool):
+    """
+    Records an LLM decision and, when online learning is on, teaches it to the
+    local model. Labels that depended on the chat context are neither learned
+    nor logged for replay.
+    """
+    global _learned
+    _record_decision(kind, query, label, "llm", logged=context_free)
+    if not (ONLINE_LEARNING_ENABLED and context_free):
+        return
+    with _log_lock:
+        if _learned >= ONLINE_LEARNING_MAX:
+            return
+        _learned += 1
+    model.learn(query, label)
+
+
+def context_free(user_query: str, follows_ai: bool = False) -> bool:
+    """True when the message can be judged without the chat context."""
+    return not follows_ai and len(user_query.split()) >= LOCAL_MIN_WORDS
+
+
+def normalize_query(user_query: str) -> str:
+    return " ".join(user_query.lower().split()).rstrip("?!. ")
+
+
+def context_fingerprint(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+
+
+class RouteMemo:
+    """Bounded LRU of routing decisions keyed by (normalized query, context fingerprint)."""
+
+    def __init__(self, max_entries: int = ROUTE_MEMO_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock   = threading.Lock()
+        self.hits    = 0
+        self.misses  = 0
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            decision = self._entries.get(key)
+            if decision is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(decision)
+
+    def put(self, key: tuple, decision: dict):
+        with self._lock:
+            self._entries[key] = dict(decision)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+route_memo = RouteMemo()
+
+
+def classifier_stats() -> dict:
+    gate, router = _local_models()
+    with _log_lock:
+        decisions = {kind: dict(counts) for kind, counts in _decisions.items()}
+        log_entries = _log_lines
+        learned     = _learned
+    return {
+        "gate_examples": gate.examples,
+        "mode_examples": router.examples,
+        "thresholds":    {"gate": LOCAL_GATE_THRESHOLD, "gate_no": LOCAL_GATE_NO_THRESHOLD,
+                          "mode": LOCAL_MODE_THRESHOLD},
+        "online_learning": {"enabled": ONLINE_LEARNING_ENABLED, "learned": learned,
+                            "max": ONLINE_LEARNING_MAX},
+        "decisions":     decisions,
+        "decision_log":  {"enabled": DECISION_LOG_ENABLED, "entries": log_entries},
+        "route_memo":    route_memo.stats(),
+    }
+
+
+class IntentClassifier:
+    def __init__(self):
+        # GROQ_API_KEY first, agent keys as overflow (see app/utils/key_pool.py)
+        self.key_pool = get_key_pool("classifier")
+        self.model = "llama-3.3-70b-versatile"
+        self.gate, self.router = _local_models()
+
+    def _fast_lane(self, user_query: str):
+        """
+        Keyword fast lane that decides obvious cases without an API call.
+        Returns True/False when decided, None when the LLM must be asked.
+        """
+        _q = user_query.strip().lower()
+        if len(_q) < 3:
+            return False
+            
+        # Hardcoded action keywords that instantly trigger AI response without wasting tokens on 8B Gatekeeper
+        action_keywords = ["@ai", "@agent", "ai?", "debate", "explain", "compare", "write", "list", "summarize"]
+        if any(_q.startswith(kw) for kw in action_keywords):
+            return True
+
+        return None
+
+    def _local_gate(self, user_query: str, follows_ai: bool = False) -> Optional[bool]:
+        """Local gatekeeper decision, or None when the LLM must judge it in context."""
+        if not context_free(user_query, follows_ai):
+            return None
+        label, confidence = self.gate.predict(user_query)
+        if confidence < (LOCAL_GATE_NO_THRESHOLD if label == "no" else LOCAL_GATE_THRESHOLD):
+            return None
+        _record_decision("gate", user_query, label, "local", confidence)
+        return label == "yes"
+
+    def _learn_gate(self, user_query: str, invoke: bool, follows_ai: bool = False):
+        _learn_decision(self.gate, "gate", user_query, "yes" if invoke else "no",
+                        context_free(user_query, follows_ai))
+
+    def _complete(self, request: dict) -> str:
+        """Runs a temperature-0 classifier request through the completion cache."""
+        cached, cache_key = cache_lookup(
+            "classifier", request["model"], request["messages"], request["temperature"], request["max_tokens"]
+        )
+        if cached is not None:
+            return cached
+        response = self.key_pool.call(lambda key: get_groq_client(key.api_key).chat.completions.create(**request))
+        content = response.choices[0].message.content.strip()
+        cache_store(cache_key, request["model"], content)
+        return content
+
+    async def _complete_async(self, request: dict) -> str:
+        cached, cache_key = cache_lookup(
+            "classifier", request["model"], request["messages"], request["temperature"], request["max_tokens"]
+        )
+        if cached is not None:
+            return cached
+        response = await self.key_pool.call_async(
+            lambda key: get_async_groq_client(key.api_key).chat.completions.create(**request)
+        )
+        content = response.choices[0].message.content.strip()
+        cache_store(cache_key, request["model"], content)
+        return content
+
+    def _gatekeeper_request(self, user_query: str, context: str = "") -> dict:
+        context_prefix = f"Recent Chat History:\n{context}\n\n" if context else ""
+        return {
+            # We use an ultra-fast model or our default fast model for this gatekeeper
+            "model": self.model, # using versatile model due to 8b rate limits
+            "messages": [
+                {"role": "system", "content": GATEKEEPER_PROMPT},
+                {"role": "user", "content": f"{context_prefix}Decide if this LAST message needs AI generation: '{user_query}'"}
+            ],
+            "temperature": 0.0,
+            "max_tokens": 5,
+        }
+    
+    def should_invoke_ai(self, user_query: str, context: str = "", follows_ai: bool = False) -> bool:
+        """
+        Acts as a zero-latency Gatekeeper.
+        Analyzes the human group chat message to decide if AI orchestration is needed.
+        """
+        # Fast-lane bypass to save API tokens
+        decided = self._fast_lane(user_query)
+        if decided is not None:
+            _record_decision("gate", user_query, "yes" if decided else "no", "fast_lane")
+            return decided
+
+        decided = self._local_gate(user_query, follows_ai)
+        if decided is not None:
+            return decided
+
+        try:
+            answer = self._complete(self._gatekeeper_request(user_query, context)).upper()
+            self._learn_gate(user_query, "YES" in answer, follows_ai)
+            return "YES" in answer
+        except Exception as e:
+            print(f"❌ Gatekeeper Error: {e}")
+            return True  # If gatekeeper fails, default to YES so we don't accidentally ignore real queries
+
+    async def should_invoke_ai_async(self, user_query: str, context: str = "", follows_ai: bool = False) -> bool:
+        """Same as should_invoke_ai, awaited on the event loop over the shared async pool."""
+        decided = self._fast_lane(user_query)
+        if decided is not None:
+            _record_decision("gate", user_query, "yes" if decided else "no", "fast_lane")
+            return decided
+
+        decided = self._local_gate(user_query, follows_ai)
+        if decided is not None:
+            return decided
+
+        try:
+            answer = (await self._complete_async(self._gatekeeper_request(user_query, context))).upper()
+            self._learn_gate(user_query, "YES" in answer, follows_ai)
+            return "YES" in answer
+        except Exception as e:
+            print(f"❌ Gatekeeper Error: {e}")
+            return True
+
+    # -------------------------------------------------
+    # Combined routing: gatekeeper + mode in (at most) one request
+    # -------------------------------------------------
+    def _route_locally(self, user_query: str, follows_ai: bool = False) -> dict:
+        """
+        Everything decidable without the LLM. invoke / mode stay None when the
+        local models are not confident enough or the message needs its chat
+        context; "confidence" is the weakest local decision used (LLM answers
+        count as certain).
+        """
+        decision = {"invoke": None, "mode": None, "confidence": 1.0, "source": "local"}
+
+        invoke = self._fast_lane(user_query)
+        if invoke is not None:
+            _record_decision("gate", user_query, "yes" if invoke else "no", "fast_lane")
+            decision["invoke"], decision["source"] = invoke, "fast_lane"
+        elif not context_free(user_query, follows_ai):
+            return decision
+        else:
+            label, confidence = self.gate.predict(user_query)
+            if confidence >= (LOCAL_GATE_NO_THRESHOLD if label == "no" else LOCAL_GATE_THRESHOLD):
+                _record_decision("gate", user_query, label, "local", confidence)
+                decision["invoke"]     = label == "yes"
+                decision["confidence"] = confidence
+
+        if decision["invoke"] is False:
+            return decision
+
+        mode, confidence = self.router.predict(user_query)
+        if confidence >= LOCAL_MODE_THRESHOLD:
+            _record_decision("mode", user_query, mode, "local", confidence)
+            decision["mode"]       = mode
+            decision["confidence"] = min(decision["confidence"], confidence)
+        return decision
+
+    def _route_request(self, user_query: str, context: str = "") -> dict:
+        context_prefix = f"Recent Chat History:\n{context}\n\n" if context else ""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": ROUTE_PROMPT},
+                {"role": "user", "content": f"{context_prefix}Route this LAST message: '{user_query}'"}
+            ],
+            "temperature": 0.0,
+            "max_tokens": 5,
+        }
+
+    def _apply_route_answer(self, user_query: str, decision: dict, answer: str, follows_ai: bool = False) -> dict:
+        """Fills the undecided parts from the LLM's one-word answer and learns from it."""
+        word = answer.strip().lower().strip(".\"' ")
+        if decision["invoke"] is None:
+            decision["invoke"] = word != "none"
+            self._learn_gate(user_query, decision["invoke"], follows_ai)
+        if decision["invoke"] and decision["mode"] is None:
+            if word in VALID_MODES:
+                decision["mode"] = word
+                _learn_decision(self.router, "mode", user_query, word, context_free(user_query, follows_ai))
+            else:
+                decision["mode"] = "independent"
+        decision["source"] = "llm"
+        return decision
+
+    def _route_failed(self, decision: dict, error: Exception) -> dict:
+        # Same defaults as the separate calls: answer rather than ignore, independent mode
+        print(f"❌ Router Error: {error}")
+        if decision["invoke"] is None:
+            decision["invoke"] = True
+        if decision["invoke"] and decision["mode"] is None:
+            decision["mode"] = "independent"
+        decision["confidence"] = 0.0
+        decision["source"]     = "default"
+        return decision
+
+    def route(self, user_query: str, context: str = "", fingerprint: str = None,
+              follows_ai: bool = False) -> dict:
+        """
+        One routing decision per message: {"invoke", "mode", "confidence", "source"}.
+        Memoized by normalized query + context fingerprint, so retries and
+        duplicate sends reuse it. The LLM is asked once, and only for the parts
+        the local classifier could not decide. follows_ai marks a reply to the
+        AI, which only the LLM (seeing the context) may judge.
+        """
+        key = (normalize_query(user_query), fingerprint or context_fingerprint(context))
+        cached = route_memo.get(key)
+        if cached is not None:
+            cached["source"] = "memo"
+            return cached
+
+        decision = self._route_locally(user_query, follows_ai)
+        if decision["invoke"] is None or (decision["invoke"] and decision["mode"] is None):
+            try:
+                decision = self._apply_route_answer(
+                    user_query, decision, self._complete(self._route_request(user_query, context)), follows_ai
+                )
+            except Exception as e:
+                return self._route_failed(decision, e)
+
+        route_memo.put(key, decision)
+        return decision
+
+    async def route_async(self, user_query: str, context: str = "", fingerprint: str = None,
+                          follows_ai: bool = False) -> dict:
+        """Same as route, awaited on the event loop over the shared async pool."""
+        key = (normalize_query(user_query), fingerprint or context_fingerprint(context))
+        cached = route_memo.get(key)
+        if cached is not None:
+            cached["source"] = "memo"
+            return cached
+
+        decision = self._route_locally(user_query, follows_ai)
+        if decision["invoke"] is None or (decision["invoke"] and decision["mode"] is None):
+            try:
+                decision = self._apply_route_answer(
+                    user_query, decision, await self._complete_async(self._route_request(user_query, context)),
+                    follows_ai
+                )
+            except Exception as e:
+                return self._route_failed(decision, e)
+
+        route_memo.put(key, decision)
+        return decision
+
+    def classify(self, user_query: str, context: str = "") -> str:
+        """
+        Classifies user intent into one of three multi-agent orchestration modes:
+        - independent (Comparison Mode): Parallel diverse perspectives
+        - support (Supplement Mode): Sequential verification and enrichment
+        - opposition (Debate Mode): Adversarial fact-checking and critique
+        """
+        
+        mode, confidence = self.router.predict(user_query)
+        if confidence >= LOCAL_MODE_THRESHOLD and context_free(user_query):
+            _record_decision("mode", user_query, mode, "local", confidence)
+            return mode
+
+        system_prompt = CLASSIFIER_PROMPT
+
         try:
             context_prefix = ("Previous context:\n" + context + "\n\n") if context else ""
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            mode = self._complete({
+                "model": self.model,
+                "messages": [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"{context_prefix}Classify this query: {user_query}"}
                 ],
-                temperature=0.0,
-                max_tokens=10
-            )
-            
-            mode = response.choices[0].message.content.strip().lower()
+                "temperature": 0.0,
+                "max_tokens": 10,
+            }).lower()
             
             # Validate response
-            valid_modes = ["independent", "support", "opposition"]
-            if mode not in valid_modes:
+            if mode not in VALID_MODES:
                 print(f"⚠️  Invalid classification '{mode}', defaulting to 'independent'")
                 return "independent"
-            
+
+            _learn_decision(self.router, "mode", user_query, mode, context_free(user_query))
             return mode
             
         except Exception as e:
@@ -269,17 +720,15 @@ CONFIDENCE: [0.0-1.0]
 REASONING: [brief explanation]"""
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            content = self._complete({
+                "model": self.model,
+                "messages": [
                     {"role": "system", "content": "You are an intent classifier. Follow the format exactly."},
                     {"role": "user", "content": detailed_prompt}
                 ],
-                temperature=0.0,
-                max_tokens=100
-            )
-            
-            content = response.choices[0].message.content.strip()
+                "temperature": 0.0,
+                "max_tokens": 100,
+            })
             
             # Parse response
             lines = content.split('\n')
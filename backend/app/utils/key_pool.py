@@ -0,0 +1,219 @@
+# backend/app/utils/key_pool.py
+"""
+Groq API Key Pool
+─────────────────
+One reusable component for every place that talks to Groq with an API key.
+
+  pool "agents"      →  GROQ_API_KEY_1, GROQ_API_KEY_2, ...      (LLMAgentClient)
+  pool "classifier"  →  GROQ_API_KEY, then the agent keys        (IntentClassifier)
+  pool "evaluation"  →  consensus_test_1, consensus_test_2, ...  (app/Evaluation)
+
+Extra keys can be added per pool without code changes:
+  GROQ_KEY_POOL_AGENTS="gsk_a,gsk_b"
+
+  • Selection : least in-flight requests, then best health score, then least
+                recently used (round-robin among equals). Keys on cooldown are
+                skipped while any other key is available.
+  • Failover  : a 429 puts the key on cooldown for the provider's retry-after
+                hint and the call is retried on the next key.
+  • Stats     : per-key requests / failures / 429s / health, labelled by env
+                var name — the key itself is never exposed.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app.utils.rate_limiter import retry_after_seconds, is_rate_limit_error
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+# "NAME_*" matches NAME_1, NAME_2, ... in numeric order
+KEY_POOL_SOURCES = {
+    "agents":     ["GROQ_API_KEY_*"],
+    "classifier": ["GROQ_API_KEY", "GROQ_API_KEY_*"],
+    "evaluation": ["consensus_test_*"],
+}
+DEFAULT_COOLDOWN_SECONDS = 20.0   # used when a 429 carries no retry-after hint
+HEALTH_DECAY             = 0.8    # EWMA weight of the previous health score
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class NoKeysConfigured(ValueError):
+    pass
+
+
+class PooledKey:
+    def __init__(self, label: str, api_key: str):
+        self.label          = label
+        self.api_key        = api_key
+        self.in_flight      = 0
+        self.requests       = 0
+        self.failures       = 0
+        self.rate_limited   = 0
+        self.health         = 1.0
+        self.cooldown_until = 0.0
+        self.last_used      = 0.0
+
+    def is_cooling(self, now: float) -> bool:
+        return self.cooldown_until > now
+
+
+class KeyPool:
+    def __init__(self, name: str, keys: List[Tuple[str, str]]):
+        self.name  = name
+        self.keys  = [PooledKey(label, key) for label, key in keys]
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self.keys)
+
+    # -------------------------------------------------
+    # Selection
+    # -------------------------------------------------
+    def acquire(self, exclude: set = None) -> PooledKey:
+        """Picks the least-loaded healthy key and marks it in flight."""
+        if not self.keys:
+            raise NoKeysConfigured(f"❌ No Groq API keys configured for pool '{self.name}'")
+
+        with self._lock:
+            now        = time.monotonic()
+            candidates = [k for k in self.keys if not exclude or k.label not in exclude] or self.keys
+            ready      = [k for k in candidates if not k.is_cooling(now)]
+            if ready:
+                key = min(ready, key=lambda k: (k.in_flight, -round(k.health, 1), k.last_used))
+            else:
+                key = min(candidates, key=lambda k: k.cooldown_until)
+
+            key.in_flight += 1
+            key.requests  += 1
+            key.last_used  = now
+            return key
+
+    def release(self, key: PooledKey, error: Exception = None):
+        with self._lock:
+            key.in_flight -= 1
+            if error is None:
+                key.health = key.health * HEALTH_DECAY + (1 - HEALTH_DECAY)
+                return
+
+            key.failures += 1
+            key.health    = key.health * HEALTH_DECAY
+            if is_rate_limit_error(error):
+                key.rate_limited  += 1
+                cooldown           = retry_after_seconds(error) or DEFAULT_COOLDOWN_SECONDS
+                key.cooldown_until = max(key.cooldown_until, time.monotonic() + cooldown)
+                print(f"🧊 [{self.name}] {key.label} rate limited — cooling down for {cooldown:.0f}s")
+
+    # -------------------------------------------------
+    # Call with automatic failover on 429
+    # -------------------------------------------------
+    def call(self, fn: Callable[[PooledKey], object], on_rate_limit: Callable = None):
+        """
+        Runs fn(key). On a 429 the key is put on cooldown and fn is retried
+        with the next key, at most once per key. Any other error is raised.
+        """
+        tried = set()
+        while True:
+            key = self.acquire(exclude=tried)
+            try:
+                result = fn(key)
+            except Exception as e:
+                self.release(key, e)
+                if not is_rate_limit_error(e):
+                    raise
+                if on_rate_limit:
+                    on_rate_limit(key, e)
+                tried.add(key.label)
+                if len(tried) >= self.size:
+                    raise
+                print(f"🔁 [{self.name}] Failing over from {key.label} to the next key...")
+                continue
+            self.release(key)
+            return result
+
+    async def call_async(self, fn: Callable, on_rate_limit: Callable = None):
+        """Async variant of call(): fn(key) must return an awaitable."""
+        tried = set()
+        while True:
+            key = self.acquire(exclude=tried)
+            try:
+                result = await fn(key)
+            except Exception as e:
+                self.release(key, e)
+                if not is_rate_limit_error(e):
+                    raise
+                if on_rate_limit:
+                    on_rate_limit(key, e)
+                tried.add(key.label)
+                if len(tried) >= self.size:
+                    raise
+                print(f"🔁 [{self.name}] Failing over from {key.label} to the next key...")
+                continue
+            self.release(key)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key.label: {
+                    "in_flight":    key.in_flight,
+                    "requests":     key.requests,
+                    "failures":     key.failures,
+                    "rate_limited": key.rate_limited,
+                    "health":       round(key.health, 3),
+                    "cooldown_for": round(max(key.cooldown_until - now, 0.0), 1),
+                }
+                for key in self.keys
+            }
+
+
+# ── Pool registry ───────────────────────────────────────────────────────────────
+
+def _keys_from_env(name: str) -> List[Tuple[str, str]]:
+    found: List[Tuple[str, str]] = []
+    for source in KEY_POOL_SOURCES.get(name, []):
+        if source.endswith("*"):
+            prefix  = source[:-1]
+            pattern = re.compile(re.escape(prefix) + r"(\d+)$")
+            numbered = sorted(
+                (int(m.group(1)), env_name)
+                for env_name in os.environ
+                if (m := pattern.match(env_name))
+            )
+            found.extend((env_name, os.environ[env_name]) for _, env_name in numbered)
+        elif os.getenv(source):
+            found.append((source, os.environ[source]))
+
+    extra = os.getenv(f"GROQ_KEY_POOL_{name.upper()}", "")
+    for index, api_key in enumerate(filter(None, (k.strip() for k in extra.split(","))), start=1):
+        found.append((f"GROQ_KEY_POOL_{name.upper()}[{index}]", api_key))
+
+    # Same key listed under several env vars → one pool entry
+    unique, seen = [], set()
+    for label, api_key in found:
+        if api_key and api_key not in seen:
+            seen.add(api_key)
+            unique.append((label, api_key))
+    return unique
+
+
+_pools: Dict[str, KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_key_pool(name: str) -> KeyPool:
+    """Returns the process-wide pool `name`, built from the environment on first use."""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = KeyPool(name, _keys_from_env(name))
+        return _pools[name]
+
+
+def key_pool_stats() -> dict:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
@@ -0,0 +1,145 @@
+# backend/app/utils/local_classifier.py
+"""
+Local Intent Classifier
+───────────────────────
+In-process text classifier used in front of the LLM gatekeeper / mode router.
+
+  features = hashed word unigrams + bigrams + leading words (crc32 buckets)
+  model    = multinomial Naive Bayes, Laplace smoothed
+
+  • Trains in milliseconds from the example queries in the classifier prompts
+    plus the decision log; predicts in well under a millisecond
+  • predict() returns (label, confidence); callers fall back to the LLM when
+    the confidence is below their threshold
+  • learn() adds one example online, so every LLM fallback teaches the model
+
+Features never seen in training are ignored, so an unfamiliar query scores
+close to the class priors and naturally falls back to the LLM.
+"""
+
+import math
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+HASH_BUCKETS    = 1 << 18
+SMOOTHING_ALPHA = 0.5
+LEADING_WORDS   = 3      # "is it true", "how to", "compare" carry most of the signal
+# Naive Bayes treats overlapping n-grams as independent evidence and is wildly
+# overconfident; the log-likelihood is averaged per feature and scaled by this
+EVIDENCE_WEIGHT = float(os.getenv("LOCAL_CLASSIFIER_EVIDENCE_WEIGHT", "3"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+_WORD_RE = re.compile(r"[a-z0-9@']+")
+
+
+def _features(text: str) -> Dict[int, int]:
+    words = _WORD_RE.findall(text.lower())
+    names = [f"w:{w}" for w in words]
+    names += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    names += [f"l{i}:{w}" for i, w in enumerate(words[:LEADING_WORDS])]
+    if len(words) <= 2:
+        names.append("short")
+    if text.rstrip().endswith("?"):
+        names.append("question")
+
+    counts: Dict[int, int] = defaultdict(int)
+    for name in names:
+        counts[zlib.crc32(name.encode()) & (HASH_BUCKETS - 1)] += 1
+    return counts
+
+
+class LocalClassifier:
+    def __init__(self, labels: List[str]):
+        self.labels  = list(labels)
+        self._counts = {label: defaultdict(float) for label in self.labels}
+        self._totals = {label: 0.0 for label in self.labels}
+        self._docs   = {label: 0 for label in self.labels}
+        self._vocab  = set()
+        self._lock   = threading.Lock()
+
+    @property
+    def examples(self) -> int:
+        return sum(self._docs.values())
+
+    def learn(self, text: str, label: str):
+        if label not in self._counts:
+            return
+        features = _features(text)
+        with self._lock:
+            self._docs[label] += 1
+            for bucket, count in features.items():
+                self._counts[label][bucket] += count
+                self._totals[label]         += count
+                self._vocab.add(bucket)
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "LocalClassifier":
+        for text, label in examples:
+            self.learn(text, label)
+        return self
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(best label, posterior probability of that label)."""
+        features = _features(text)
+        with self._lock:
+            total_docs = sum(self._docs.values())
+            if not total_docs:
+                return self.labels[0], 0.0
+            vocab  = len(self._vocab) or 1
+            known  = [(b, c) for b, c in features.items() if b in self._vocab]
+            n_known = sum(c for _, c in known)
+            scores = {}
+            for label in self.labels:
+                denom      = self._totals[label] + SMOOTHING_ALPHA * vocab
+                likelihood = sum(
+                    count * math.log((self._counts[label].get(bucket, 0.0) + SMOOTHING_ALPHA) / denom)
+                    for bucket, count in known
+                )
+                prior = math.log((self._docs[label] + 1) / (total_docs + len(self.labels)))
+                scores[label] = prior + likelihood * EVIDENCE_WEIGHT / max(1, n_known)
+
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+
+# ---------------------------------------------------------------------------
+# Seed data from the LLM prompts
+# ---------------------------------------------------------------------------
+_QUOTED_RE   = re.compile(r'"([^"]+)"')
+_NUMBERED_RE = re.compile(r"^\s*\d+\.\s+(.+?)\s*$")
+
+
+def _clean_phrase(phrase: str) -> str:
+    return re.sub(r"\[[^\]]*\]|\.\.\.", " ", phrase).strip(" .")
+
+
+def quoted_examples(section: str) -> List[str]:
+    """Every "quoted" example phrase in a block of prompt text."""
+    return [p for p in (_clean_phrase(q) for q in _QUOTED_RE.findall(section)) if p]
+
+
+def mode_examples(prompt: str, modes: List[str]) -> List[Tuple[str, str]]:
+    """
+    (text, mode) pairs from a prompt laid out as `### n. MODE` sections, each
+    with numbered example queries and quoted trigger phrases.
+    """
+    pairs = []
+    sections = re.split(r"^###\s+\d+\.\s+", prompt, flags=re.MULTILINE)[1:]
+    for section in sections:
+        mode = section.split(None, 1)[0].lower()
+        if mode not in modes:
+            continue
+        section = section.split("\n## ", 1)[0]
+        if "**Trigger Phrases:**" in section:
+            triggers = section.split("**Trigger Phrases:**", 1)[1].split("**Example Queries:**", 1)[0]
+            pairs += [(phrase, mode) for phrase in quoted_examples(triggers)]
+        for line in section.split("**Example Queries:**", 1)[-1].splitlines():
+            match = _NUMBERED_RE.match(line)
+            if match:
+                pairs.append((match.group(1), mode))
+    return pairs
@@ -0,0 +1,252 @@
+# backend/app/utils/rate_limiter.py
+"""
+Groq Rate Limit Scheduler
+─────────────────────────
+Client-side token buckets that keep us under Groq's per-model limits instead
+of finding out from a 429 exception string.
+
+  per (API key, model)  →  RPM bucket (requests)  +  TPM bucket (prompt + max completion tokens)
+
+  • Calls estimate their prompt size BEFORE sending and wait until both
+    buckets can cover it.
+  • Waiters are served by priority: interactive websocket queries
+    (PRIORITY_INTERACTIVE) always go ahead of background work such as
+    summarization and evaluation (PRIORITY_BACKGROUND).
+  • After a response the reservation is corrected with the real usage,
+    and a 429 pauses the model for the provider's retry-after hint.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND  = 1
+
+# Groq free-tier limits per model (requests / tokens per minute)
+MODEL_LIMITS = {
+    "openai/gpt-oss-120b":                       {"rpm": 30, "tpm": 8000},
+    "llama-3.1-8b-instant":                      {"rpm": 30, "tpm": 6000},
+    "llama-3.3-70b-versatile":                   {"rpm": 30, "tpm": 12000},
+    "meta-llama/llama-4-scout-17b-16e-instruct": {"rpm": 30, "tpm": 30000},
+}
+DEFAULT_LIMITS = {"rpm": 30, "tpm": 6000}
+
+CHARS_PER_TOKEN     = 4     # rough estimate used everywhere in this codebase
+MESSAGE_OVERHEAD    = 4     # role/formatting tokens per chat message
+MAX_WAIT_SECONDS    = 90.0  # give up waiting and send anyway after this long
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Token estimate for a piece of text (~4 chars/token)."""
+    return len(text or "") // CHARS_PER_TOKEN
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: int = 0) -> int:
+    """Prompt token estimate (~4 chars/token) plus the requested completion budget."""
+    prompt = sum(estimate_text_tokens(m.get("content")) + MESSAGE_OVERHEAD for m in messages)
+    return prompt + max_tokens
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity    = float(per_minute)
+        self.refill_rate = per_minute / 60.0
+        self.tokens      = float(per_minute)
+        self.updated_at  = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens     = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self, now: float):
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _ModelState:
+    def __init__(self, limits: dict):
+        self.requests     = TokenBucket(limits["rpm"])
+        self.tokens       = TokenBucket(limits["tpm"])
+        self.paused_until = 0.0
+        self.waiters      = []   # heap of (priority, seq)
+        self.sent         = 0
+        self.waited_total = 0.0
+        self.rate_limited = 0
+
+    def delay(self, tokens: int, now: float) -> float:
+        return max(
+            self.paused_until - now,
+            self.requests.time_until(1, now),
+            self.tokens.time_until(tokens, now),
+        )
+
+
+class RateLimitScheduler:
+    def __init__(self, limits: Dict[str, dict] = None):
+        self.limits  = limits or MODEL_LIMITS
+        self.default_priority = PRIORITY_INTERACTIVE
+        self._cond   = threading.Condition()
+        self._models: Dict[tuple, _ModelState] = {}
+        self._seq    = itertools.count()
+
+    def _state(self, model: str, scope: str) -> _ModelState:
+        # Groq limits apply per API key, so each key gets its own buckets
+        if (scope, model) not in self._models:
+            self._models[(scope, model)] = _ModelState(self.limits.get(model, DEFAULT_LIMITS))
+        return self._models[(scope, model)]
+
+    def _try_acquire(self, state: _ModelState, ticket: tuple, tokens: int, now: float) -> float:
+        """Must hold self._cond. Returns 0 once admitted, else seconds to wait."""
+        if state.waiters[0] != ticket:
+            return 0.05
+        delay = state.delay(tokens, now)
+        if delay > 0:
+            return delay
+        heapq.heappop(state.waiters)
+        state.requests.consume(1)
+        state.tokens.consume(tokens)
+        state.sent += 1
+        self._cond.notify_all()
+        return 0.0
+
+    def _enqueue(self, model: str, priority: Optional[int], scope: str):
+        state  = self._state(model, scope)
+        ticket = (self.default_priority if priority is None else priority, next(self._seq))
+        heapq.heappush(state.waiters, ticket)
+        return state, ticket
+
+    def _give_up(self, state: _ModelState, ticket: tuple, tokens: int):
+        """Must hold self._cond. Admit a waiter that exceeded MAX_WAIT_SECONDS."""
+        state.waiters.remove(ticket)
+        heapq.heapify(state.waiters)
+        state.requests.consume(1)
+        state.tokens.consume(tokens)
+        state.sent += 1
+        self._cond.notify_all()
+
+    def acquire(self, model: str, tokens: int, priority: Optional[int] = None, scope: str = "default") -> float:
+        """Blocks the calling thread until `model` can take the request. Returns seconds waited."""
+        start = time.monotonic()
+        with self._cond:
+            state, ticket = self._enqueue(model, priority, scope)
+            while True:
+                now   = time.monotonic()
+                delay = self._try_acquire(state, ticket, tokens, now)
+                if delay == 0:
+                    break
+                if now - start > MAX_WAIT_SECONDS:
+                    self._give_up(state, ticket, tokens)
+                    break
+                self._cond.wait(timeout=min(delay, 1.0))
+            waited = time.monotonic() - start
+            state.waited_total += waited
+
+        if waited > 0.05:
+            print(f"⏳ Rate limiter held {model} for {waited:.2f}s")
+        return waited
+
+    async def acquire_async(self, model: str, tokens: int, priority: Optional[int] = None, scope: str = "default") -> float:
+        """Event-loop friendly acquire: sleeps with asyncio instead of blocking a thread."""
+        start = time.monotonic()
+        with self._cond:
+            state, ticket = self._enqueue(model, priority, scope)
+        try:
+            while True:
+                with self._cond:
+                    now   = time.monotonic()
+                    delay = self._try_acquire(state, ticket, tokens, now)
+                    if delay == 0:
+                        break
+                    if now - start > MAX_WAIT_SECONDS:
+                        self._give_up(state, ticket, tokens)
+                        break
+                await asyncio.sleep(min(delay, 0.25))
+        except BaseException:
+            # Cancelled while queued: leave the line so we don't block everyone behind us
+            with self._cond:
+                if ticket in state.waiters:
+                    state.waiters.remove(ticket)
+                    heapq.heapify(state.waiters)
+                    self._cond.notify_all()
+            raise
+        waited = time.monotonic() - start
+        with self._cond:
+            state.waited_total += waited
+        return waited
+
+    def record_usage(self, model: str, reserved: int, actual: Optional[int], scope: str = "default"):
+        """Corrects the TPM reservation with the real token usage reported by Groq."""
+        if actual is None:
+            return
+        with self._cond:
+            state = self._state(model, scope)
+            if actual < reserved:
+                state.tokens.refund(reserved - actual)
+            else:
+                state.tokens.consume(actual - reserved)
+            self._cond.notify_all()
+
+    def penalize(self, model: str, retry_after: Optional[float], scope: str = "default"):
+        """Called on a 429: hold every call for `model` until retry-after has passed."""
+        with self._cond:
+            state = self._state(model, scope)
+            now   = time.monotonic()
+            state.requests.drain(now)
+            state.tokens.drain(now)
+            state.paused_until = max(state.paused_until, now + (retry_after or 10.0))
+            state.rate_limited += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                f"{model} [{scope}]": {
+                    "sent":              state.sent,
+                    "rate_limited":      state.rate_limited,
+                    "queued":            len(state.waiters),
+                    "waited_seconds":    round(state.waited_total, 2),
+                    "requests_left":     int(max(state.requests.tokens, 0)),
+                    "tokens_left":       int(max(state.tokens.tokens, 0)),
+                    "paused_for":        round(max(state.paused_until - now, 0.0), 2),
+                }
+                for (scope, model), state in self._models.items()
+            }
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Reads the retry-after hint from a Groq APIStatusError, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+# Process-wide scheduler shared by every LLMAgentClient instance
+scheduler = RateLimitScheduler()
@@ -0,0 +1,175 @@
+# backend/app/utils/retry_policy.py
+"""
+Retry Policy + Circuit Breaker
+──────────────────────────────
+  RetryPolicy     exponential backoff with jitter, per error class:
+                    transport   → connection reset / timeout      → retry
+                    rate_limit  → 429 on every key in the pool    → retry after hint
+                    server      → 5xx                             → retry
+                    fatal       → other 4xx, bad request, etc.    → fail immediately
+
+  CircuitBreaker  one per model. After N consecutive transport/server failures
+                  the circuit opens and calls fail fast (CircuitOpenError) so the
+                  caller can fall back to another model key. After a cool-off a
+                  single trial call is let through (half-open).
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Dict
+
+import groq
+
+from app.utils.rate_limiter import retry_after_seconds, is_rate_limit_error
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+RETRY_MAX_ATTEMPTS      = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY        = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY         = float(os.getenv("LLM_RETRY_MAX_DELAY", "8.0"))
+RETRY_JITTER            = 0.5    # delay is drawn from [(1 - jitter) × d, d]
+BREAKER_FAILURES        = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+BREAKER_RESET_SECONDS   = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+TRANSPORT  = "transport"
+RATE_LIMIT = "rate_limit"
+SERVER     = "server"
+FATAL      = "fatal"
+
+
+def classify_error(error: Exception) -> str:
+    if isinstance(error, CircuitOpenError):
+        return FATAL
+    if isinstance(error, groq.APIConnectionError):      # includes APITimeoutError
+        return TRANSPORT
+    if is_rate_limit_error(error):
+        return RATE_LIMIT
+    status = getattr(error, "status_code", None)
+    if status is not None and status >= 500:
+        return SERVER
+    return FATAL
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        jitter: float = RETRY_JITTER,
+        retry_on: tuple = (TRANSPORT, RATE_LIMIT, SERVER),
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay   = base_delay
+        self.max_delay    = max_delay
+        self.jitter       = jitter
+        self.retry_on     = retry_on
+
+    def should_retry(self, kind: str, attempt: int) -> bool:
+        return kind in self.retry_on and attempt < self.max_attempts
+
+    def backoff(self, attempt: int, error: Exception = None) -> float:
+        """Seconds to wait before attempt `attempt + 1`."""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = delay * random.uniform(1 - self.jitter, 1)
+        if error is not None and is_rate_limit_error(error):
+            delay = max(delay, retry_after_seconds(error) or 0.0)
+        return delay
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED    = "closed"
+    OPEN      = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.name              = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout     = reset_timeout
+        self.state             = self.CLOSED
+        self.failures          = 0
+        self.opened_at         = 0.0
+        self.trips             = 0
+        self._lock             = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # Let exactly one trial call through per reset window
+                self.state     = self.HALF_OPEN
+                self.opened_at = now
+                return True
+            return False
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit open for {self.name} — failing fast")
+
+    def record_success(self):
+        with self._lock:
+            self.state    = self.CLOSED
+            self.failures = 0
+
+    def record_neutral(self):
+        """
+        A call that got an answer from the provider but failed for a reason that
+        says nothing about the model's health (429, bad request). A half-open
+        probe that ends this way proved the model reachable, so it closes the
+        circuit instead of leaving it half-open.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state    = self.CLOSED
+                self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    print(f"🔌 Circuit opened for {self.name} after {self.failures} failures")
+                self.state     = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "trips": self.trips}
+
+
+# ── Registry ────────────────────────────────────────────────────────────────────
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(model_name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker(model_name)
+        return _breakers[model_name]
+
+
+def record_error(breaker: CircuitBreaker, kind: str):
+    """Only transport and server errors say something about the model's health."""
+    if kind in (TRANSPORT, SERVER):
+        breaker.record_failure()
+    else:
+        breaker.record_neutral()
+
+
+def circuit_breaker_stats() -> Dict[str, dict]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.stats() for b in breakers}
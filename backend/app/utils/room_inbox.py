@@ -0,0 +1,87 @@
+# backend/app/utils/room_inbox.py
+"""
+Per-Room Inbound Work Queue
+───────────────────────────
+Keeps the websocket read loop free: the receive loop only parses a frame and
+put()s it here, and one processor task per room does the slow part (save,
+broadcast, build context, route, hand off to the RoomScheduler).
+
+  put()    →  non-blocking; False when the room already has INBOX_SIZE items
+              waiting (backpressure: the sender is told to slow down)
+  handler  →  awaited once per item, in arrival order for the room
+
+Because the read loop never awaits processing, pings, "stop" and further
+messages are received while a message is still being routed.
+The processor task exits when its queue is empty and is restarted on the
+next put(). Must be used from the event loop.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+INBOX_SIZE = int(os.getenv("ROOM_INBOX_SIZE", "32"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+
+class RoomInbox:
+    def __init__(self, size: int):
+        self.items: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.processor: Optional[asyncio.Task] = None
+
+
+class RoomInboxes:
+    def __init__(self, handler: Callable[[str, Any], Awaitable[None]], size: int = INBOX_SIZE):
+        self.handler = handler
+        self.size    = size
+        self.rooms: Dict[str, RoomInbox] = {}
+        self.accepted  = 0
+        self.rejected  = 0
+        self.processed = 0
+        self.failed    = 0
+
+    def put(self, room_id: str, item: Any) -> bool:
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = RoomInbox(self.size)
+
+        try:
+            room.items.put_nowait(item)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            print(f"🚧 Inbox full in room {room_id} ({self.size} messages waiting)")
+            return False
+
+        self.accepted += 1
+        if room.processor is None or room.processor.done():
+            room.processor = asyncio.create_task(self._process(room_id, room))
+        return True
+
+    def depth(self, room_id: str) -> int:
+        room = self.rooms.get(room_id)
+        return room.items.qsize() if room else 0
+
+    def stats(self) -> dict:
+        return {
+            "rooms":     len(self.rooms),
+            "waiting":   sum(r.items.qsize() for r in self.rooms.values()),
+            "size":      self.size,
+            "accepted":  self.accepted,
+            "rejected":  self.rejected,
+            "processed": self.processed,
+            "failed":    self.failed,
+        }
+
+    async def _process(self, room_id: str, room: RoomInbox):
+        while not room.items.empty():
+            item = room.items.get_nowait()
+            try:
+                await self.handler(room_id, item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Processing inbound message in room {room_id} failed: {e}")
+
+        if self.rooms.get(room_id) is room:
+            del self.rooms[room_id]
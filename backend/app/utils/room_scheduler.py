@@ -0,0 +1,299 @@
+# backend/app/utils/room_scheduler.py
+"""
+Per-Room Orchestration Scheduler
+────────────────────────────────
+Every room gets a bounded FIFO of pending orchestrations and a dispatcher
+task that starts at most ROOM_MAX_CONCURRENT of them at a time, so three
+people asking at once queue up instead of launching three pipelines that
+fight over the same rate limit.
+
+  submit()  →  coalesce into the user's queued job if it is still collecting
+               (last message < COALESCE_SECONDS ago), otherwise enqueue a new
+               job; None when the room's queue is full
+  cancel()  →  drops a queued job (e.g. superseded); a running job has its
+               cancel token tripped (see app/utils/cancellation.py)
+  cancel_room() → everything queued or running in a room (last viewer left),
+               or only one user's jobs (their "stop")
+  on_change →  called with (room_id, snapshot) whenever the queue changes,
+               so positions can be pushed to the room
+
+A job only becomes runnable COALESCE_SECONDS after its last message arrived,
+which is what lets a burst of messages from one user become one orchestration.
+The window is measured from arrival, not from when routing finished:
+  arrived() →  called as soon as a message is received; until it is submitted
+               or settled, it holds that user's collecting job if it arrived
+               inside the job's window (routing latency never splits a burst)
+  settle()  →  an arrival that will not be submitted (gatekeeper said no)
+Must be used from the event loop.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.utils.cancellation import CancelToken, OrchestrationCancelled
+
+# ── Config ──────────────────────────────────────────────────────────────────────
+ROOM_QUEUE_SIZE     = int(os.getenv("ROOM_QUEUE_SIZE", "8"))
+ROOM_MAX_CONCURRENT = int(os.getenv("ROOM_MAX_CONCURRENT", "1"))
+COALESCE_SECONDS    = float(os.getenv("ROOM_COALESCE_SECONDS", "1.5"))
+# ────────────────────────────────────────────────────────────────────────────────
+
+_job_ids = itertools.count(1)
+
+
+class OrchestrationJob:
+    def __init__(self, room_id: str, user_id: str, user_name: str, text: str, mode: Optional[str],
+                 received_at: float = None):
+        self.id        = f"job-{next(_job_ids)}"
+        self.room_id   = room_id
+        self.user_id   = user_id
+        self.user_name = user_name
+        self.messages  = [text]
+        self.mode      = mode          # routed mode of the first message; None once coalesced
+        self.state     = "queued"      # queued → running → done | cancelled
+        self.last_at   = received_at or time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self.cancel_token = CancelToken()
+
+    @property
+    def query(self) -> str:
+        return "\n".join(self.messages)
+
+    @property
+    def ready_at(self) -> float:
+        return self.last_at + COALESCE_SECONDS
+
+    def add(self, text: str, mode: Optional[str], received_at: float = None):
+        self.messages.append(text)
+        if mode != self.mode:
+            self.mode = None           # mixed burst: re-route the combined query
+        self.last_at = max(self.last_at, received_at or time.monotonic())
+
+
+class RoomQueue:
+    def __init__(self):
+        self.pending: deque = deque()
+        self.running: List[OrchestrationJob] = []
+        self.arriving: List[tuple] = []     # (user_id, received_at) received but not yet submitted
+        self.wakeup  = asyncio.Event()
+        self.dispatcher: Optional[asyncio.Task] = None
+
+
+class RoomScheduler:
+    def __init__(
+        self,
+        run_job: Callable[[OrchestrationJob], Awaitable[None]],
+        on_change: Callable[[str, dict], Awaitable[None]] = None,
+        queue_size: int = ROOM_QUEUE_SIZE,
+        max_concurrent: int = ROOM_MAX_CONCURRENT,
+    ):
+        self.run_job        = run_job
+        self.on_change      = on_change
+        self.queue_size     = queue_size
+        self.max_concurrent = max_concurrent
+        self.rooms: Dict[str, RoomQueue] = {}
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected  = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.cancelled_tokens = 0      # tokens already spent by jobs cancelled mid-run
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def arrived(self, room_id: str, user_id: str) -> float:
+        """Registers a just-received message; returns its arrival time for submit()/settle()."""
+        received_at = time.monotonic()
+        self.rooms.setdefault(room_id, RoomQueue()).arriving.append((user_id, received_at))
+        return received_at
+
+    def settle(self, room_id: str, user_id: str, received_at: float):
+        """Forgets an arrival (no-op once submitted) and releases any job it was holding."""
+        room = self.rooms.get(room_id)
+        if room is None or (user_id, received_at) not in room.arriving:
+            return
+        room.arriving.remove((user_id, received_at))
+        room.wakeup.set()
+        if not (room.pending or room.running or room.arriving) and self.rooms.get(room_id) is room:
+            del self.rooms[room_id]
+
+    async def submit(self, room_id: str, user_id: str, user_name: str, text: str,
+                     mode: Optional[str] = None, received_at: float = None) -> Optional[OrchestrationJob]:
+        room = self.rooms.setdefault(room_id, RoomQueue())
+        if received_at is not None and (user_id, received_at) in room.arriving:
+            room.arriving.remove((user_id, received_at))
+        arrived_at = received_at or time.monotonic()
+
+        for job in room.pending:
+            if job.user_id == user_id and arrived_at < job.ready_at:
+                job.add(text, mode, received_at)
+                self.coalesced += 1
+                print(f"🧺 Coalesced message into {job.id} ({len(job.messages)} messages) in room {room_id}")
+                room.wakeup.set()
+                await self._changed(room_id)
+                return job
+
+        if len(room.pending) >= self.queue_size:
+            self.rejected += 1
+            print(f"🚧 Orchestration queue full in room {room_id} ({self.queue_size} pending)")
+            return None
+
+        job = OrchestrationJob(room_id, user_id, user_name, text, mode, received_at)
+        room.pending.append(job)
+        self.submitted += 1
+        if room.dispatcher is None or room.dispatcher.done():
+            room.dispatcher = asyncio.create_task(self._dispatch(room_id, room))
+        room.wakeup.set()
+        await self._changed(room_id)
+        return job
+
+    async def cancel(self, room_id: str, job_id: str, user_id: str = None, reason: str = "cancelled") -> bool:
+        """
+        Removes a queued job, or trips the cancel token of a running one.
+        With user_id, only that user's job is touched.
+        """
+        room = self.rooms.get(room_id)
+        if room is None:
+            return False
+        for job in list(room.pending):
+            if job.id == job_id and (user_id is None or job.user_id == user_id):
+                room.pending.remove(job)
+                job.state = "cancelled"
+                job.cancel_token.cancel(reason)
+                self.cancelled += 1
+                room.wakeup.set()
+                await self._changed(room_id)
+                return True
+        for job in room.running:
+            if job.id == job_id and (user_id is None or job.user_id == user_id):
+                return job.cancel_token.cancel(reason)
+        return False
+
+    async def cancel_room(self, room_id: str, reason: str = "cancelled", user_id: str = None) -> int:
+        """
+        Drops every queued job and cancels every running one. With user_id, only
+        that user's jobs are touched. Returns how many were hit.
+        """
+        room = self.rooms.get(room_id)
+        if room is None:
+            return 0
+        dropped = [job for job in room.pending if user_id is None or job.user_id == user_id]
+        for job in dropped:
+            room.pending.remove(job)
+            job.state = "cancelled"
+            job.cancel_token.cancel(reason)
+        self.cancelled += len(dropped)
+        stopped = sum(
+            1 for job in room.running
+            if (user_id is None or job.user_id == user_id) and job.cancel_token.cancel(reason)
+        )
+        if dropped or stopped:
+            print(f"🛑 Cancelled {stopped} running / {len(dropped)} queued orchestrations in room {room_id}: {reason}")
+            room.wakeup.set()
+            await self._changed(room_id)
+        return len(dropped) + stopped
+
+    def snapshot(self, room_id: str) -> dict:
+        room = self.rooms.get(room_id)
+        if room is None:
+            return {"running": [], "queued": []}
+        return {
+            "running": [self._describe(job) for job in room.running],
+            "queued":  [dict(self._describe(job), position=i + 1) for i, job in enumerate(room.pending)],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "rooms":          len(self.rooms),
+            "queued":         sum(len(r.pending) for r in self.rooms.values()),
+            "running":        sum(len(r.running) for r in self.rooms.values()),
+            "queue_size":     self.queue_size,
+            "max_concurrent": self.max_concurrent,
+            "submitted":      self.submitted,
+            "coalesced":      self.coalesced,
+            "rejected":       self.rejected,
+            "cancelled":      self.cancelled,
+            "completed":      self.completed,
+            "cancelled_tokens": self.cancelled_tokens,
+        }
+
+    # -------------------------------------------------
+    # Dispatch
+    # -------------------------------------------------
+    async def _dispatch(self, room_id: str, room: RoomQueue):
+        while room.pending or room.running:
+            room.wakeup.clear()
+            timeout = None
+            if room.pending and len(room.running) < self.max_concurrent:
+                head = room.pending[0]
+                wait = head.ready_at - time.monotonic()
+                if wait <= 0 and not self._held(room, head):
+                    room.pending.popleft()
+                    self._start(room_id, room, head)
+                    await self._changed(room_id)
+                    continue
+                timeout = wait if wait > 0 else None    # held: settle()/submit() wakes us
+            try:
+                await asyncio.wait_for(room.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        if self.rooms.get(room_id) is room and not room.arriving:
+            del self.rooms[room_id]
+
+    @staticmethod
+    def _held(room: RoomQueue, job: OrchestrationJob) -> bool:
+        """A message from the job's user arrived inside its window and is still being routed."""
+        return any(user_id == job.user_id and at < job.ready_at for user_id, at in room.arriving)
+
+    def _start(self, room_id: str, room: RoomQueue, job: OrchestrationJob):
+        job.state = "running"
+        room.running.append(job)
+        job.task = asyncio.create_task(self._run(room_id, room, job))
+
+    async def _run(self, room_id: str, room: RoomQueue, job: OrchestrationJob):
+        try:
+            await self.run_job(job)
+        except OrchestrationCancelled as e:
+            job.state = "cancelled"
+            print(f"🛑 Orchestration {job.id} cancelled in room {room_id} ({e.reason}), "
+                  f"~{job.cancel_token.tokens_spent} tokens already spent")
+        except Exception as e:
+            print(f"❌ Orchestration {job.id} failed in room {room_id}: {e}")
+        finally:
+            if job.state == "running":
+                job.state = "done"
+            room.running.remove(job)
+            if job.state == "cancelled":
+                self.cancelled        += 1
+                self.cancelled_tokens += job.cancel_token.tokens_spent
+            else:
+                self.completed += 1
+            room.wakeup.set()
+            await self._changed(room_id)
+
+    # -------------------------------------------------
+    # Helpers
+    # -------------------------------------------------
+    @staticmethod
+    def _describe(job: OrchestrationJob) -> dict:
+        return {
+            "job_id":    job.id,
+            "user_id":   job.user_id,
+            "user_name": job.user_name,
+            "messages":  len(job.messages),
+            "preview":   job.messages[-1][:80],
+        }
+
+    async def _changed(self, room_id: str):
+        if self.on_change is None:
+            return
+        try:
+            await self.on_change(room_id, self.snapshot(room_id))
+        except Exception as e:
+            print(f"⚠️ Queue update for room {room_id} failed: {e}")
@@ -12,6 +12,7 @@ from app.Evaluation.support_evaluator import evaluate_support
 from app.Evaluation.opposition_evaluator import evaluate_opposition
 from app.agents.orchestrator import Orchestrator
 import app.utils.Evaluator as legacy_eval
+from app.utils.rate_limiter import scheduler, PRIORITY_BACKGROUND
 import groq
 
 QUERIES = {
@@ -60,6 +61,8 @@ def print_banner(text):
 
 def main():
     print_banner("INITIALIZING CAPSTONE EVALUATION SUITE")
+    # Batch evaluation is background work: never starve live websocket queries
+    scheduler.default_priority = PRIORITY_BACKGROUND
     orchestrator = Orchestrator()
     reports = []
     
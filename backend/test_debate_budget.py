@@ -0,0 +1,55 @@
+"""
+Debate budget check: with a realistic room context (~2.4k tokens) and judges
+that never reach a verdict, the opposition debate must still run every round
+instead of spending its token budget on the repeated context.
+
+No API keys needed; the LLM client is replaced by a canned one.
+
+    python test_debate_budget.py      # or: python -m pytest test_debate_budget.py
+"""
+
+from app.agents.opposition_mode import OppositionMode, DebateBudget, MAX_ROUNDS
+from app.utils.rate_limiter import estimate_text_tokens
+
+CONTEXT_TOKENS = 2400
+
+
+class _CannedClient:
+    """Answers every agent call with a short reply that never converges or concludes."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_completion(self, model_key, messages, **kwargs):
+        self.calls += 1
+        return f"Reply {self.calls} from {model_key}: point {self.calls} differs, keep going. " * 3
+
+
+def _make_mode():
+    mode = OppositionMode.__new__(OppositionMode)
+    mode.client = _CannedClient()
+    return mode
+
+
+def _room_context():
+    line = "alice: we are comparing postgres and sqlite for the chat backend, what about writes?\n"
+    context = ""
+    while estimate_text_tokens(context) < CONTEXT_TOKENS:
+        context += line
+    return context
+
+
+def test_realistic_context_gets_every_round():
+    mode    = _make_mode()
+    budget  = DebateBudget()
+    result  = mode.run("Which database should we use?", _room_context(), budget=budget)
+
+    judges = [r for r in result["responses"] if r["agent_name"].startswith("Chief Judge")]
+    print(f"⚖️ {len(judges)} rounds, ~{budget.tokens_used}/{budget.max_tokens} budget tokens")
+    assert len(judges) == MAX_ROUNDS, f"debate stopped after {len(judges)} of {MAX_ROUNDS} rounds"
+    assert budget.tokens_used < budget.max_tokens
+
+
+if __name__ == "__main__":
+    test_realistic_context_gets_every_round()
+    print("✅ Debate budget allows every round")
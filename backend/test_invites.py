@@ -0,0 +1,59 @@
+"""
+Invite check: every email given to _invite_members gets exactly one result,
+in the order given. Repeats are reported as "Duplicate" instead of being
+dropped silently, and each user is inserted once.
+
+No API keys needed; runs on an in-memory SQLite database.
+
+    python test_invites.py      # or: python -m pytest test_invites.py
+"""
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.database import Base
+from app.db.models import User, Group, GroupMember
+from app.groups.group_routes import _invite_members
+
+
+def _make_session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+
+    db.add(User(id="u1", email="owner@example.com"))
+    db.add(User(id="u2", email="bob@example.com"))
+    db.add(User(id="u3", email="carol@example.com"))
+    db.add(Group(id="g1", name="g1"))
+    db.add(GroupMember(group_id="g1", user_id="u1"))
+    db.add(GroupMember(group_id="g1", user_id="u3"))
+    db.commit()
+    return db
+
+
+def test_duplicates_are_reported():
+    db = _make_session()
+    emails = ["bob@example.com", " BOB@example.com", "carol@example.com",
+              "nobody@example.com", "carol@example.com", "owner@example.com"]
+    added, failed = _invite_members(db, "g1", emails, skip_email="owner@example.com")
+    db.commit()
+
+    print(f"📨 added={added} failed={failed}")
+    assert added == [{"email": "bob@example.com", "user_id": "u2"}]
+    assert failed == [
+        {"email": "bob@example.com",    "reason": "Duplicate"},
+        {"email": "carol@example.com",  "reason": "Already a member"},
+        {"email": "nobody@example.com", "reason": "User not found"},
+        {"email": "carol@example.com",  "reason": "Duplicate"},
+    ]
+    assert db.query(GroupMember).filter_by(group_id="g1", user_id="u2").count() == 1
+
+
+if __name__ == "__main__":
+    test_duplicates_are_reported()
+    print("✅ Duplicate invites are reported")
@@ -0,0 +1,59 @@
+"""
+Local gatekeeper check: messages whose meaning depends on the chat context
+("yes", "go ahead", a reply right after the AI answered, a question to a
+named human) must reach the LLM instead of getting a confident local NO, and
+LLM labels for them must not be learned.
+
+No API keys needed; the LLM call is replaced by a canned one.
+
+    python test_local_gate.py      # or: python -m pytest test_local_gate.py
+"""
+
+from app.agents.orchestrator import Orchestrator
+from app.utils.intent_classifier import IntentClassifier
+
+
+class _CannedClassifier(IntentClassifier):
+    """Records every LLM request and answers "independent"."""
+
+    def __init__(self):
+        super().__init__()
+        self.asked = []
+
+    def _complete(self, request: dict) -> str:
+        self.asked.append(request["messages"][-1]["content"])
+        return "independent"
+
+
+def _make_orchestrator():
+    orch = Orchestrator.__new__(Orchestrator)
+    orch.intent_classifier = _CannedClassifier()
+    return orch
+
+
+def test_context_dependent_messages_reach_the_llm():
+    orch    = _make_orchestrator()
+    history = [
+        {"role": "user",      "name": "alice",        "content": "should we debate postgres vs sqlite?"},
+        {"role": "assistant", "name": "AI Consensus", "content": "Want me to run a full debate on it?"},
+    ]
+    for query in ["yes", "go ahead", "john what do you think about rust?"]:
+        decision = orch.route(query, history + [{"role": "user", "name": "bob", "content": query}])
+        print(f"🚦 {query!r}: {decision}")
+        assert decision["source"] == "llm", f"{query!r} was decided without the chat context"
+    assert len(orch.intent_classifier.asked) == 3
+
+
+def test_replies_to_the_ai_are_not_learned():
+    orch   = _make_orchestrator()
+    gate   = orch.intent_classifier.gate
+    before = gate.examples
+    orch.route("please do that for the whole team then",
+               [{"role": "assistant", "name": "AI Consensus", "content": "Shall I summarize it?"}])
+    assert gate.examples == before
+
+
+if __name__ == "__main__":
+    test_context_dependent_messages_reach_the_llm()
+    test_replies_to_the_ai_are_not_learned()
+    print("✅ Context-dependent messages are left to the LLM")
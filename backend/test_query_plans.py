@@ -0,0 +1,128 @@
+"""
+Query plan audit: runs the hot chat queries against an in-memory SQLite schema
+built from the models and fails if any of them scans a whole table (or sorts
+messages in a temp b-tree) instead of using an index.
+
+    python test_query_plans.py      # or: python -m pytest test_query_plans.py
+"""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.models import Base, Group, GroupMember, Message, User
+from app.db.message_service import load_message_page, encode_cursor
+from app.db.room_cache import _query_recent_messages
+from app.utils.context_builder import _get_messages_after, _count_messages_after
+from app.groups.group_routes import load_my_groups
+
+HOT_TABLES = ("messages", "group_members")
+
+
+def _make_session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+
+    db.add(User(id="u1", email="a@example.com"))
+    db.add(Group(id="g1", name="g1"))
+    db.add(GroupMember(group_id="g1", user_id="u1"))
+    db.add(Message(id="m1", group_id="g1", sender_name="a", sender_type="user",
+                   content="hi", timestamp=datetime(2026, 1, 1)))
+    db.commit()
+    return engine, db
+
+
+def _capture_selects(engine):
+    """Records every SELECT / DELETE statement executed, with its parameters."""
+    captured = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "DELETE")):
+            captured.append((statement, parameters))
+
+    return captured
+
+
+def _bad_steps(engine, statement, parameters):
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    bad = []
+    for row in plan:
+        detail = row[-1]
+        for table in HOT_TABLES:
+            if detail.startswith(f"SCAN {table}"):
+                bad.append(detail)
+        if detail.startswith("USE TEMP B-TREE") and "FROM messages" in statement:
+            bad.append(detail)
+    return bad
+
+
+def _run_hot_queries(db):
+    """Every query the chat hot paths issue against messages / group_members."""
+    load_message_page(db, "g1")
+    anchor = db.get(Message, "m1")
+    cursor = encode_cursor(anchor)
+
+    load_message_page(db, "g1", before=cursor)
+    load_message_page(db, "g1", after=cursor)
+    _query_recent_messages(db, "g1", 50)
+    _get_messages_after(db, "g1", "m1", 60)
+    _count_messages_after(db, "g1", "m1", 25)
+
+    # membership checks (send, history, add-members, members list)
+    db.query(GroupMember).filter_by(group_id="g1", user_id="u1").first()
+    db.query(GroupMember).filter(GroupMember.group_id == "g1").all()
+    # my groups: memberships + last message + unread count in one query
+    load_my_groups(db, "u1")
+    # group delete
+    db.query(Message).filter(Message.group_id == "g1").delete()
+    db.rollback()
+
+
+def test_hot_queries_use_indexes():
+    engine, db = _make_session()
+    captured = _capture_selects(engine)
+    try:
+        _run_hot_queries(db)
+    finally:
+        db.close()
+
+    hot = [(s, p) for s, p in captured if any(t in s for t in HOT_TABLES)]
+    assert hot, "no hot queries were captured"
+
+    failures = []
+    for statement, parameters in hot:
+        bad = _bad_steps(engine, statement, parameters)
+        if bad:
+            failures.append(f"{' '.join(statement.split())}\n    → {', '.join(bad)}")
+
+    print(f"🔎 Checked {len(hot)} hot queries, {len(failures)} without an index")
+    assert not failures, "Full scans in hot queries:\n" + "\n".join(failures)
+
+
+def test_membership_is_unique():
+    engine, db = _make_session()
+    try:
+        db.add(GroupMember(group_id="g1", user_id="u1"))
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+        else:
+            raise AssertionError("duplicate (group_id, user_id) membership was accepted")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_hot_queries_use_indexes()
+    test_membership_is_unique()
+    print("✅ All hot queries use indexes")
@@ -0,0 +1,51 @@
+"""
+Synthesis input check: agents whose model failed return the client's failure
+text instead of an answer; none of it may reach the synthesizer as an opinion.
+
+No API keys needed; the consensus client is replaced by a recording one.
+
+    python test_synthesis_inputs.py      # or: python -m pytest test_synthesis_inputs.py
+"""
+
+from app.agents.orchestrator import Orchestrator
+
+
+class _RecordingClient:
+    def __init__(self):
+        self.messages = None
+
+    def get_completion(self, model_key, messages, **kwargs):
+        self.messages = messages
+        return "final answer"
+
+
+def _synthesis_prompt(responses):
+    orchestrator = Orchestrator.__new__(Orchestrator)
+    orchestrator.consensus_client = _RecordingClient()
+    orchestrator.synthesize_consensus("Which database?", {"responses": responses}, mode="independent")
+    return orchestrator.consensus_client.messages[-1]["content"]
+
+
+def test_failed_agents_are_not_synthesized():
+    prompt = _synthesis_prompt([
+        {"agent_name": "Agent 1", "content": "Use Postgres for concurrent writes."},
+        {"agent_name": "Agent 2", "content": "Error: Error with agent2 (llama-3.1-8b-instant): timeout"},
+        {"agent_name": "Agent 3", "content": "⚠️ Agent did not respond properly after 3 attempts. Please try again."},
+    ])
+    assert "Use Postgres" in prompt
+    assert "Agent 2:" not in prompt and "Agent 3:" not in prompt, prompt
+
+
+def test_answers_mentioning_errors_are_kept():
+    prompt = _synthesis_prompt([
+        {"agent_name": "Agent 1", "content": "Errors in SQLite usually mean a locked database."},
+        {"agent_name": "Agent 2", "content": "⚠️ Agent did not respond properly. Please try again."},
+    ])
+    assert "Agent 1: Errors in SQLite" in prompt
+    assert "Agent 2:" not in prompt
+
+
+if __name__ == "__main__":
+    test_failed_agents_are_not_synthesized()
+    test_answers_mentioning_errors_are_kept()
+    print("✅ Failed agent replies never reach synthesis")
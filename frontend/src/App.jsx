@@ -45,9 +45,10 @@ export default function App() {
     let interval;
     if (user) {
       loadGroups();
+      // Unread badges are pushed over the websocket; polling only picks up new groups
       interval = setInterval(() => {
         loadGroups(true);
-      }, 5000);
+      }, 30000);
     }
     return () => clearInterval(interval);
   }, [user]);
@@ -60,6 +61,24 @@ export default function App() {
     setActiveGroup((prev) => (prev?.id === deletedGroupId ? null : prev));
   }
 
+  // Pushed by the backend when a message lands in another of the user's rooms
+  function handleUnreadUpdate(update) {
+    setGroups((prev) =>
+      prev
+        .map((g) =>
+          g.id === update.group_id
+            ? {
+                ...g,
+                unread_count: update.unread_count,
+                last_message_content: update.last_message_content,
+                last_message_time: update.last_message_time,
+              }
+            : g,
+        )
+        .sort((a, b) => (a.last_message_time < b.last_message_time ? 1 : -1)),
+    );
+  }
+
   function logout() {
     localStorage.clear();
     window.location.reload();
@@ -92,6 +111,7 @@ export default function App() {
           group={activeGroup}
           user={user}
           onGroupDeleted={handleGroupDeleted}
+          onUnreadUpdate={handleUnreadUpdate}
           isSidebarOpen={isSidebarOpen}
           setIsSidebarOpen={setIsSidebarOpen}
         />
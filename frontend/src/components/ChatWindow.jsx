@@ -5,13 +5,15 @@ import TypingIndicator from "./TypingIndicator";
 import ChatInput from "./ChatInput";
 import { getWsUrl, markGroupRead } from "../api/chatApi";
 
-export default function ChatWindow({ group, user, onGroupDeleted, isSidebarOpen, setIsSidebarOpen }) {
+export default function ChatWindow({ group, user, onGroupDeleted, onUnreadUpdate, isSidebarOpen, setIsSidebarOpen }) {
   const [messages, setMessages] = useState([]);
   const [connected, setConnected] = useState(false);
   const [currentUserId, setCurrentUserId] = useState(null);
   const [isAiTyping, setIsAiTyping] = useState(false);
   const [typingStatus, setTypingStatus] = useState("AI is thinking...");
   const [streamingMsg, setStreamingMsg] = useState(null);
+  const [history, setHistory] = useState({ before: null, has_more: false, loading: false });
+  const [myJobId, setMyJobId] = useState(null);
 
   const socketRef = useRef(null);
   const messagesEndRef = useRef(null);
@@ -28,8 +30,10 @@ export default function ChatWindow({ group, user, onGroupDeleted, isSidebarOpen,
     if (!group) return;
 
     setMessages([]);
+    setHistory({ before: null, has_more: false, loading: false });
     setConnected(false);
     setIsAiTyping(false);
+    setMyJobId(null);
 
     const token = localStorage.getItem("token");
     if (!token) return;
@@ -49,6 +53,11 @@ export default function ChatWindow({ group, user, onGroupDeleted, isSidebarOpen,
 
     socket.onopen = () => setConnected(true);
 
+    // Heartbeat: the server answers pings even while an orchestration is running
+    const heartbeat = setInterval(() => {
+      if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ type: "ping" }));
+    }, 25000);
+
     socket.onmessage = (event) => {
       const msg = JSON.parse(event.data);
 
@@ -62,7 +71,81 @@ export default function ChatWindow({ group, user, onGroupDeleted, isSidebarOpen,
         return;
       }
 
-      if (msg.type === "user_joined" || msg.type === "user_left") return;
+      if (msg.type === "user_joined" || msg.type === "user_left" || msg.type === "pong") return;
+
+      if (msg.type === "queue_update") {
+        // Room-wide orchestration queue; show our own position while we wait
+        const me = JSON.parse(localStorage.getItem("user") || "{}").id;
+        const mine = msg.queued.find((job) => job.user_id === me);
+        const ownJob = msg.running.find((job) => job.user_id === me) || mine;
+        setMyJobId(ownJob ? ownJob.job_id : null);
+        if (mine) {
+          setIsAiTyping(true);
+          setTypingStatus(
+            mine.position === 1 && msg.running.length === 0
+              ? "Collecting your messages..."
+              : `Queued — #${mine.position} in line`,
+          );
+        }
+        return;
+      }
+
+      if (msg.type === "cancelled") {
+        // Orchestration stopped ("stop" button, or everyone left); nothing was saved
+        setIsAiTyping(false);
+        setStreamingMsg(null);
+        setMessages((prev) => [
+          ...prev,
+          { type: "system", content: `AI response stopped (${msg.reason}).`, timestamp: msg.timestamp },
+        ]);
+        return;
+      }
+
+      if (msg.type === "queue_full" || msg.type === "inbox_full") {
+        setMessages((prev) => [...prev, { ...msg, type: "system" }]);
+        return;
+      }
+
+      if (msg.type === "unread_update") {
+        // Badge change for another room this user belongs to
+        onUnreadUpdate?.(msg);
+        return;
+      }
+
+      if (msg.type === "history_cursor") {
+        setHistory({ before: msg.before, has_more: msg.has_more, loading: false });
+        return;
+      }
+
+      if (msg.type === "history_page") {
+        // Older page requested via loadOlderMessages(); prepend above what is shown
+        setMessages((prev) => [...msg.messages, ...prev]);
+        setHistory({ before: msg.before, has_more: msg.has_more, loading: false });
+        return;
+      }
+
+      if (msg.type === "agent_stream") {
+        // Live agent drafts fill the "See all responses" dropdown while synthesis is pending
+        setStreamingMsg((prev) => {
+          const base = prev || {
+            type: "consensus",
+            sender_name: "Consensus Synthesis Agent",
+            content: "",
+            timestamp: new Date().toISOString(),
+            agent_responses: [],
+            _streaming: true
+          };
+          const responses = [...base.agent_responses];
+          const index = responses.findIndex((r) => r.agent_name === msg.agent_name);
+          if (index === -1) {
+            responses.push({ agent_name: msg.agent_name, content: msg.content });
+          } else {
+            responses[index] = { ...responses[index], content: responses[index].content + msg.content };
+          }
+          return { ...base, agent_responses: responses };
+        });
+        return;
+      }
 
       if (msg.type === "consensus_stream") {
         setStreamingMsg((prev) => {
@@ -116,7 +199,10 @@ export default function ChatWindow({ group, user, onGroupDeleted, isSidebarOpen,
 
     socket.onerror = () => setConnected(false);
 
-    return () => socket.close();
+    return () => {
+      clearInterval(heartbeat);
+      socket.close();
+    };
   }, [group?.id]);
 
   function sendMessage(text) {
@@ -139,6 +225,20 @@ export default function ChatWindow({ group, user, onGroupDeleted, isSidebarOpen,
     socketRef.current.send(JSON.stringify({ message: text }));
   }
 
+  function stopAi() {
+    if (!socketRef.current || socketRef.current.readyState !== WebSocket.OPEN) return;
+    if (!myJobId) return;
+    // Only our own job; the server ignores job ids submitted by someone else
+    socketRef.current.send(JSON.stringify({ type: "stop", job_id: myJobId }));
+  }
+
+  function loadOlderMessages() {
+    if (!socketRef.current || socketRef.current.readyState !== WebSocket.OPEN) return;
+    if (!history.has_more || history.loading) return;
+    setHistory((prev) => ({ ...prev, loading: true }));
+    socketRef.current.send(JSON.stringify({ type: "load_history", before: history.before }));
+  }
+
   function handleGroupDeleted() {
     socketRef.current?.close();
     onGroupDeleted?.(group.id);
@@ -163,11 +263,34 @@ export default function ChatWindow({ group, user, onGroupDeleted, isSidebarOpen,
         className="flex-1 overflow-y-auto py-6 relative z-10"
       >
         <div className="px-8 space-y-4">
+          {history.has_more && (
+            <div className="flex justify-center">
+              <button
+                data-testid="load-older-messages"
+                onClick={loadOlderMessages}
+                disabled={history.loading}
+                className="text-xs text-gray-400 hover:text-gray-200 disabled:opacity-50"
+              >
+                {history.loading ? "Loading..." : "Load older messages"}
+              </button>
+            </div>
+          )}
           {messages.map((msg, i) => (
             <MessageBubble key={i} msg={msg} currentUserId={currentUserId} />
           ))}
           {streamingMsg && <MessageBubble msg={streamingMsg} currentUserId={currentUserId} />}
-          {isAiTyping && !streamingMsg && <TypingIndicator status={typingStatus} />}
+          {isAiTyping && !streamingMsg?.content && <TypingIndicator status={typingStatus} />}
+          {myJobId && (
+            <div className="flex justify-center">
+              <button
+                data-testid="stop-ai"
+                onClick={stopAi}
+                className="text-xs text-gray-400 hover:text-gray-200"
+              >
+                Stop generating
+              </button>
+            </div>
+          )}
           <div ref={messagesEndRef} />
         </div>
       </div>